@@ -1,19 +1,33 @@
 import json
+import time
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
-from models import Opportunity, Schedule, Task, Lead
+from models import Opportunity, Schedule, Task, Lead, Email, AnalysisJob
 from extensions import db
-from anthropic import Anthropic, APIError, APIConnectionError, AuthenticationError
+from anthropic import APIError, APIConnectionError, AuthenticationError, __version__ as ANTHROPIC_SDK_VERSION
 from flask import current_app
 from models import UserSettings
 from flask_login import current_user
 from sqlalchemy.exc import SQLAlchemyError
+from ai_cache import build_cache_key, get_cached_response, store_cached_response
+from anthropic_client import get_anthropic_client
 
 # 現在の日時を日本時間で取得
 jst_datetime = datetime.now(ZoneInfo("Asia/Tokyo"))
 # 日付をフォーマット
 formatted_date = jst_datetime.strftime("%Y-%m-%d")
 
+# メール分析に使用するモデル
+EMAIL_ANALYSIS_MODEL = "claude-3-haiku-20240307"
+
+# プロンプトテンプレートのバージョン（変更時に更新するとキャッシュが無効になる）
+PROMPT_VERSIONS = {
+    'summarize_email_content': '1',
+    'analyze_data': '1',
+    'analyze_leads_custom': '1',
+    'analyze_email': '1',
+}
+
 def handle_ai_error(func_name, error):
     """Handle AI analysis errors with proper logging and localized messages"""
     error_msg = None
@@ -38,7 +52,15 @@ def summarize_email_content(subject: str, content: str, user_id=None):
         if not user_settings or not user_settings.claude_api_key:
             return '<p>要約を生成するにはAPIキーの設定が必要です。</p>'
 
-        client = Anthropic(api_key=user_settings.claude_api_key)
+        cache_key = build_cache_key(
+            'summarize_email_content', "claude-3-haiku-20240307",
+            PROMPT_VERSIONS['summarize_email_content'], formatted_date, subject, content
+        )
+        cached = get_cached_response(cache_key)
+        if cached:
+            return cached
+
+        client = get_anthropic_client(user_settings.claude_api_key)
         prompt = f"""今は日本時間の{formatted_date}です。以下のメールを要約してください。要点を簡潔にまとめ、重要な情報を漏らさないようにしてください。
 件名: {subject}
 本文:
@@ -59,6 +81,10 @@ HTMLの段落タグ（<p>）を使用してフォーマットしてください
                 response_text = message.content[0].text
                 if not response_text.startswith('<p>'):
                     response_text = '<p>' + response_text.replace('\n\n', '</p><p>') + '</p>'
+                store_cached_response(
+                    cache_key, 'summarize_email_content', "claude-3-haiku-20240307",
+                    PROMPT_VERSIONS['summarize_email_content'], response_text
+                )
                 return response_text
             except AttributeError:
                 current_app.logger.error("Failed to access message content text")
@@ -78,7 +104,15 @@ def analyze_data(data_type, data):
         if not user_settings or not user_settings.claude_api_key:
             return '<p class="error-message">AI分析を実行するにはAPIキーの設定が必要です。</p>'
 
-        client = Anthropic(api_key=user_settings.claude_api_key)
+        cache_key = build_cache_key(
+            'analyze_data', "claude-3-haiku-20240307",
+            PROMPT_VERSIONS['analyze_data'], formatted_date, data_type, data
+        )
+        cached = get_cached_response(cache_key)
+        if cached:
+            return cached
+
+        client = get_anthropic_client(user_settings.claude_api_key)
 
         prompt = f"""今は日本時間の{formatted_date}です。以下の{data_type}データを分析してください:\n{data}\n
         以下の項目について簡潔に分析してください:
@@ -98,6 +132,10 @@ def analyze_data(data_type, data):
             content = message.content[0].text
             if not content.startswith('<p>'):
                 content = '<p>' + content.replace('\n\n', '</p><p>') + '</p>'
+            store_cached_response(
+                cache_key, 'analyze_data', "claude-3-haiku-20240307",
+                PROMPT_VERSIONS['analyze_data'], content
+            )
             return content
         return '<p>AI分析の結果を取得できませんでした。</p>'
 
@@ -154,7 +192,15 @@ def analyze_leads(leads, custom_params=None):
             if not user_settings or not user_settings.claude_api_key:
                 return '<p class="error-message">AI分析を実行するにはAPIキーの設定が必要です。</p>'
 
-            client = Anthropic(api_key=user_settings.claude_api_key)
+            cache_key = build_cache_key(
+                'analyze_leads_custom', "claude-3-haiku-20240307",
+                PROMPT_VERSIONS['analyze_leads_custom'], analysis_prompt
+            )
+            cached = get_cached_response(cache_key)
+            if cached:
+                return cached
+
+            client = get_anthropic_client(user_settings.claude_api_key)
             message = client.messages.create(
                 model="claude-3-haiku-20240307",
                 max_tokens=4000,
@@ -165,6 +211,10 @@ def analyze_leads(leads, custom_params=None):
                 content = message.content[0].text
                 if not content.startswith('<p>'):
                     content = '<p>' + content.replace('\n\n', '</p><p>') + '</p>'
+                store_cached_response(
+                    cache_key, 'analyze_leads_custom', "claude-3-haiku-20240307",
+                    PROMPT_VERSIONS['analyze_leads_custom'], content
+                )
                 return content
             return '<p>カスタムAI分析の結果を取得できませんでした。</p>'
 
@@ -173,24 +223,18 @@ def analyze_leads(leads, custom_params=None):
             
     return analyze_data("リード", lead_data)
 
-def analyze_email(subject, content, user_id=None):
-    """Analyze email content using Claude AI"""
-    try:
-        user_settings = UserSettings.query.filter_by(user_id=user_id if user_id else current_user.id).first()
-        if not user_settings or not user_settings.claude_api_key:
-            return json.dumps({
-                "Opportunities": [],
-                "Schedules": [],
-                "Tasks": []
-            })
+def build_email_analysis_params(subject, content):
+    """
+    Build the messages.create parameters for email analysis
 
-        client = Anthropic(api_key=user_settings.claude_api_key)
-
-        system_message = """
+    Shared by the synchronous and batch analysis paths so both send
+    identical prompts.
+    """
+    system_message = """
             You are an AI assistant that analyzes emails and provides suggestions for opportunities, schedules, and tasks.
             Be concise and direct in your responses.
             """
-        prompt = f"""
+    prompt = f"""
         今は日本時間の{formatted_date}です。以下のメールを分析し、機会、スケジュール、タスクを簡潔にJSON形式で提案してください。
 
         Subject: {subject}
@@ -215,18 +259,52 @@ def analyze_email(subject, content, user_id=None):
           }}]
         }}
         """
+    return {
+        "model": EMAIL_ANALYSIS_MODEL,
+        "max_tokens": 4000,
+        "temperature": 0.7,
+        "system": system_message,
+        "messages": [{"role": "user", "content": prompt}]
+    }
+
+def analyze_email(subject, content, user_id=None, raise_errors=False):
+    """
+    Analyze email content using Claude AI
+
+    Args:
+        subject: Email subject
+        content: Email content
+        user_id: User whose API key is used (defaults to current_user)
+        raise_errors: Re-raise API errors instead of returning an empty result,
+            so that queued analysis jobs can be retried
+    """
+    try:
+        user_settings = UserSettings.query.filter_by(user_id=user_id if user_id else current_user.id).first()
+        if not user_settings or not user_settings.claude_api_key:
+            return json.dumps({
+                "Opportunities": [],
+                "Schedules": [],
+                "Tasks": []
+            })
 
-        message = client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=4000,
-            temperature=0.7,
-            system=system_message,
-            messages=[{"role": "user", "content": prompt}]
+        cache_key = build_cache_key(
+            'analyze_email', EMAIL_ANALYSIS_MODEL,
+            PROMPT_VERSIONS['analyze_email'], formatted_date, subject, content
         )
+        cached = get_cached_response(cache_key)
+        if cached:
+            return cached
+
+        client = get_anthropic_client(user_settings.claude_api_key)
+        message = client.messages.create(**build_email_analysis_params(subject, content))
 
         if message and hasattr(message.content[0], 'text'):
             content = message.content[0].text
             if content.startswith('{'):
+                store_cached_response(
+                    cache_key, 'analyze_email', EMAIL_ANALYSIS_MODEL,
+                    PROMPT_VERSIONS['analyze_email'], content
+                )
                 return content
             return json.dumps({
                 "Opportunities": [],
@@ -241,12 +319,150 @@ def analyze_email(subject, content, user_id=None):
 
     except Exception as e:
         current_app.logger.error(f"AI analysis error: {str(e)}")
+        if raise_errors:
+            raise
         return json.dumps({
             "Opportunities": [],
             "Schedules": [],
             "Tasks": []
         })
 
+def apply_email_analysis_result(email_record, ai_response, app):
+    """Store an analysis result on the email and create the suggested records"""
+    email_record.ai_analysis = ai_response
+    email_record.ai_analysis_date = datetime.utcnow()
+    email_record.ai_model_used = EMAIL_ANALYSIS_MODEL
+    email_record.ai_analysis_status = 'completed'
+    # キューに残っている同じメールの分析ジョブは不要になる
+    AnalysisJob.query\
+        .filter(AnalysisJob.email_id == email_record.id, AnalysisJob.status == 'pending')\
+        .update({AnalysisJob.status: 'completed'}, synchronize_session=False)
+    process_ai_response(ai_response, email_record, app)
+
+def _get_batches_resource(client):
+    """Return the Message Batches resource (beta namespace on older SDK versions)"""
+    batches = getattr(client.messages, 'batches', None)
+    if batches is None:
+        beta = getattr(client, 'beta', None)
+        batches = getattr(getattr(beta, 'messages', None), 'batches', None)
+    if batches is None:
+        raise RuntimeError(
+            f"The installed anthropic SDK ({ANTHROPIC_SDK_VERSION}) does not support "
+            f"Message Batches; anthropic>=0.42.0 is required"
+        )
+    return batches
+
+def _wait_for_batch(batches, batch_id, poll_interval, timeout, app):
+    """Poll a message batch until processing has ended"""
+    deadline = time.monotonic() + timeout
+    while True:
+        batch = batches.retrieve(batch_id)
+        if batch.processing_status == 'ended':
+            return batch
+        if time.monotonic() > deadline:
+            batches.cancel(batch_id)
+            raise TimeoutError(f"Message batch {batch_id} did not finish within {timeout}s")
+        app.logger.debug(
+            f"Message batch {batch_id} still {batch.processing_status}: {batch.request_counts}"
+        )
+        time.sleep(poll_interval)
+
+def analyze_emails_batch(email_ids, user_id, app, poll_interval=None, timeout=None):
+    """
+    Analyze many emails as asynchronous Message Batches jobs
+
+    Cached results are applied immediately; the remaining emails are
+    submitted in chunks of ANALYSIS_BATCH_MAX_REQUESTS, polled until the
+    batch has ended, and each result is applied through process_ai_response.
+    Set ANTHROPIC_BASE_URL to run against a local stub server.
+
+    Args:
+        email_ids: IDs of the emails to analyze
+        user_id: User whose API key is used; emails of other users are skipped
+        app: Flask app object
+        poll_interval: Seconds between status polls
+        timeout: Seconds to wait for each batch before cancelling it
+
+    Returns:
+        dict: Counts of submitted, cached, succeeded and failed emails
+    """
+    stats = {'submitted': 0, 'cached': 0, 'succeeded': 0, 'failed': 0}
+
+    user_settings = UserSettings.query.filter_by(user_id=user_id).first()
+    if not user_settings or not user_settings.claude_api_key:
+        raise ValueError(f"Claude API key is not configured for user {user_id}")
+
+    poll_interval = poll_interval or app.config.get('ANALYSIS_BATCH_POLL_INTERVAL', 30)
+    timeout = timeout or app.config.get('ANALYSIS_BATCH_TIMEOUT', 24 * 60 * 60)
+    chunk_size = max(1, app.config.get('ANALYSIS_BATCH_MAX_REQUESTS', 1000))
+
+    batches = _get_batches_resource(get_anthropic_client(user_settings.claude_api_key))
+
+    requests = []
+    cache_keys = {}
+    for email_id in email_ids:
+        email_record = db.session.get(Email, email_id)
+        if not email_record or email_record.user_id != user_id:
+            continue
+
+        cache_key = build_cache_key(
+            'analyze_email', EMAIL_ANALYSIS_MODEL,
+            PROMPT_VERSIONS['analyze_email'], formatted_date,
+            email_record.subject, email_record.content
+        )
+        cached = get_cached_response(cache_key)
+        if cached:
+            apply_email_analysis_result(email_record, cached, app)
+            stats['cached'] += 1
+            continue
+
+        cache_keys[email_record.id] = cache_key
+        requests.append({
+            "custom_id": f"email-{email_record.id}",
+            "params": build_email_analysis_params(email_record.subject, email_record.content)
+        })
+
+    for chunk_start in range(0, len(requests), chunk_size):
+        chunk = requests[chunk_start:chunk_start + chunk_size]
+        batch = batches.create(requests=chunk)
+        stats['submitted'] += len(chunk)
+        app.logger.info(f"Submitted message batch {batch.id} with {len(chunk)} emails")
+
+        batch = _wait_for_batch(batches, batch.id, poll_interval, timeout, app)
+
+        for entry in batches.results(batch.id):
+            email_id = int(entry.custom_id.split('-', 1)[1])
+            email_record = db.session.get(Email, email_id)
+            if not email_record:
+                continue
+
+            if entry.result.type != 'succeeded':
+                app.logger.error(f"Batch analysis of email {email_id} {entry.result.type}")
+                email_record.ai_analysis_status = 'failed'
+                db.session.commit()
+                stats['failed'] += 1
+                continue
+
+            message = entry.result.message
+            ai_response = message.content[0].text if message.content and hasattr(message.content[0], 'text') else ''
+            if ai_response.startswith('{'):
+                store_cached_response(
+                    cache_keys[email_id], 'analyze_email', EMAIL_ANALYSIS_MODEL,
+                    PROMPT_VERSIONS['analyze_email'], ai_response
+                )
+            else:
+                ai_response = json.dumps({
+                    "Opportunities": [],
+                    "Schedules": [],
+                    "Tasks": []
+                })
+            apply_email_analysis_result(email_record, ai_response, app)
+            stats['succeeded'] += 1
+
+        app.logger.info(f"Message batch {batch.id} applied: {batch.request_counts}")
+
+    return stats
+
 def create_or_get_lead(email_data, user_id):
     """Create a new lead if it doesn't exist or get existing lead"""
     try:
@@ -420,16 +636,29 @@ def normalize_json_response(response_text):
         current_app.logger.error(f"Error normalizing JSON response: {str(e)}")
         return '<p class="error-message">AI分析の結果を取得できませんでした。</p>'
 
-def process_ai_response(response, email_data, app):
-    """Process AI analysis response and create corresponding records"""
+def process_ai_response(response, email_data, app, raise_errors=False):
+    """
+    Process AI analysis response and create corresponding records
+
+    Args:
+        response: JSON string returned by analyze_email
+        email_data: Email record the response belongs to
+        app: Flask app object
+        raise_errors: Re-raise errors after rolling back instead of only logging
+            them, so a queued job can be retried or marked as failed
+    """
     try:
         if not isinstance(response, str):
             app.logger.error("Invalid response type")
+            if raise_errors:
+                raise ValueError("Invalid response type")
             return
 
         normalized_response = normalize_json_response(response)
         if not normalized_response:
             app.logger.error("Failed to normalize AI response")
+            if raise_errors:
+                raise ValueError("Failed to normalize AI response")
             return
 
         data = json.loads(normalized_response)
@@ -440,6 +669,8 @@ def process_ai_response(response, email_data, app):
                 create_opportunities_from_ai(data['Opportunities'], email_data.lead)
             except Exception as e:
                 app.logger.error(f"Error creating opportunities: {str(e)}")
+                if raise_errors:
+                    raise
 
         # Create schedules
         if data.get('Schedules'):
@@ -447,6 +678,8 @@ def process_ai_response(response, email_data, app):
                 create_schedules_from_ai(data['Schedules'], email_data.lead)
             except Exception as e:
                 app.logger.error(f"Error creating schedules: {str(e)}")
+                if raise_errors:
+                    raise
 
         # Create tasks
         if data.get('Tasks'):
@@ -454,6 +687,8 @@ def process_ai_response(response, email_data, app):
                 create_tasks_from_ai(data['Tasks'], email_data.lead)
             except Exception as e:
                 app.logger.error(f"Error creating tasks: {str(e)}")
+                if raise_errors:
+                    raise
 
         # Commit all changes
         try:
@@ -462,7 +697,11 @@ def process_ai_response(response, email_data, app):
         except SQLAlchemyError as e:
             app.logger.error(f"Error committing changes: {str(e)}")
             db.session.rollback()
+            if raise_errors:
+                raise
 
     except Exception as e:
         app.logger.error(f"Error processing AI response: {str(e)}")
-        db.session.rollback()
\ No newline at end of file
+        db.session.rollback()
+        if raise_errors:
+            raise
\ No newline at end of file
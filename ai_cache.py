@@ -0,0 +1,171 @@
+"""
+Persistent cache for Claude responses.
+
+Entries are keyed by function, model, prompt template version and a hash of
+the normalized prompt inputs, expire after a TTL and are evicted least
+recently used first once the table exceeds its size limit. The cache uses its
+own short-lived session so it never commits the caller's pending changes.
+"""
+import re
+import hashlib
+import unicodedata
+from datetime import datetime, timedelta
+from threading import Lock
+
+from flask import current_app
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import AIResponseCache
+from extensions import db
+
+# Constants
+DEFAULT_TTL_HOURS = 24 * 7
+DEFAULT_MAX_ENTRIES = 10000
+PRUNE_EVERY_N_STORES = 50
+
+_store_counter = 0
+_store_counter_lock = Lock()
+
+
+def normalize_cache_text(value):
+    """Normalize text so that formatting-only differences map to the same key"""
+    text = unicodedata.normalize('NFKC', str(value or ''))
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def build_cache_key(function, model, prompt_version, *parts):
+    """
+    Build the cache key for one AI call
+
+    Args:
+        function: Name of the calling analysis function
+        model: Claude model name
+        prompt_version: Version of the prompt template
+        *parts: Prompt inputs (content, date, parameters)
+
+    Returns:
+        str: SHA-256 hex digest
+    """
+    normalized = '\x1f'.join(normalize_cache_text(part) for part in parts)
+    raw = f"{function}\x1e{model}\x1e{prompt_version}\x1e{normalized}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _cache_enabled():
+    return current_app.config.get('AI_CACHE_ENABLED', True)
+
+
+def get_cached_response(cache_key):
+    """
+    Return a cached response, or None on a miss or expired entry
+    """
+    if not _cache_enabled():
+        return None
+
+    try:
+        now = datetime.utcnow()
+        with Session(db.engine) as session:
+            entry = session.query(AIResponseCache.id, AIResponseCache.response)\
+                .filter(
+                    AIResponseCache.cache_key == cache_key,
+                    AIResponseCache.expires_at > now
+                )\
+                .first()
+            if not entry:
+                return None
+
+            session.execute(
+                update(AIResponseCache)
+                .where(AIResponseCache.id == entry.id)
+                .values(
+                    hit_count=AIResponseCache.hit_count + 1,
+                    last_accessed_at=now
+                )
+            )
+            session.commit()
+            current_app.logger.debug(f"AI response cache hit: {cache_key[:12]}")
+            return entry.response
+
+    except Exception as e:
+        current_app.logger.warning(f"AI response cache lookup failed: {str(e)}")
+        return None
+
+
+def store_cached_response(cache_key, function, model, prompt_version, response):
+    """Store a successful response, replacing an expired entry with the same key"""
+    if not _cache_enabled() or not response:
+        return
+
+    try:
+        now = datetime.utcnow()
+        ttl = timedelta(hours=current_app.config.get('AI_CACHE_TTL_HOURS', DEFAULT_TTL_HOURS))
+        with Session(db.engine) as session:
+            entry = session.query(AIResponseCache)\
+                .filter(AIResponseCache.cache_key == cache_key)\
+                .first()
+            if entry is None:
+                entry = AIResponseCache(cache_key=cache_key, hit_count=0, created_at=now)
+                session.add(entry)
+            entry.function = function
+            entry.model = model
+            entry.prompt_version = prompt_version
+            entry.response = response
+            entry.last_accessed_at = now
+            entry.expires_at = now + ttl
+            session.commit()
+
+    except IntegrityError:
+        # 同じキーを別のワーカーが先に保存した
+        pass
+    except Exception as e:
+        current_app.logger.warning(f"AI response cache store failed: {str(e)}")
+        return
+
+    global _store_counter
+    with _store_counter_lock:
+        _store_counter += 1
+        should_prune = _store_counter % PRUNE_EVERY_N_STORES == 0
+    if should_prune:
+        prune_cache()
+
+
+def prune_cache(max_entries=None):
+    """
+    Delete expired entries and evict the least recently used ones above the size limit
+
+    Returns:
+        int: Number of deleted entries
+    """
+    if max_entries is None:
+        max_entries = current_app.config.get('AI_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+
+    try:
+        with Session(db.engine) as session:
+            deleted = session.execute(
+                delete(AIResponseCache)
+                .where(AIResponseCache.expires_at <= datetime.utcnow())
+            ).rowcount or 0
+
+            overflow = session.query(AIResponseCache).count() - max_entries
+            if overflow > 0:
+                evict_ids = [
+                    row.id for row in session.query(AIResponseCache.id)
+                    .order_by(AIResponseCache.last_accessed_at)
+                    .limit(overflow)
+                ]
+                deleted += session.execute(
+                    delete(AIResponseCache)
+                    .where(AIResponseCache.id.in_(evict_ids))
+                ).rowcount or 0
+
+            session.commit()
+
+        if deleted:
+            current_app.logger.info(f"Pruned {deleted} AI response cache entries")
+        return deleted
+
+    except Exception as e:
+        current_app.logger.warning(f"AI response cache prune failed: {str(e)}")
+        return 0
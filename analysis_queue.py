@@ -0,0 +1,314 @@
+"""
+DB-backed queue for AI email analysis.
+
+Ingestion only enqueues an AnalysisJob row in the same transaction as the
+email. A dispatcher thread claims due jobs and runs them on a bounded worker
+pool, so the Claude round trip happens outside any ingestion transaction and
+no Lead row locks are held while waiting for the API.
+"""
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, Lock, Event
+
+from sqlalchemy import and_, or_, insert
+
+from models import AnalysisJob, Email
+from extensions import db
+from ai_analysis import analyze_email, process_ai_response, EMAIL_ANALYSIS_MODEL
+from ingestion_metrics import ingestion_metrics
+
+# Constants
+DEFAULT_MAX_WORKERS = 2
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_POLL_INTERVAL = 10  # seconds
+DEFAULT_RETRY_BASE_DELAY = 60  # seconds
+STALE_JOB_TIMEOUT = timedelta(minutes=15)  # 処理中のままのジョブを再取得するまでの時間
+
+# 新しいジョブの登録をディスパッチャーに通知するイベント
+_wakeup = Event()
+_worker_pool = None
+_worker_pool_lock = Lock()
+
+
+def enqueue_analysis(email_record, session):
+    """
+    Enqueue AI analysis for an email in the caller's transaction
+
+    Args:
+        email_record: Flushed Email record
+        session: Database session of the ingestion transaction
+
+    Returns:
+        AnalysisJob: The queued job
+    """
+    job = AnalysisJob(
+        email_id=email_record.id,
+        user_id=email_record.user_id,
+        status='pending',
+        attempts=0,
+        next_attempt_at=datetime.utcnow()
+    )
+    session.add(job)
+    email_record.ai_analysis_status = 'pending'
+    return job
+
+
+def enqueue_analysis_bulk(email_ids, user_id, session):
+    """
+    Enqueue AI analysis for inserted emails with one multi-row insert
+
+    The emails must already have been inserted with ai_analysis_status
+    'pending'.
+
+    Args:
+        email_ids: IDs of the inserted Email rows
+        user_id: Owner of the emails
+        session: Database session of the ingestion transaction
+    """
+    if not email_ids:
+        return
+    now = datetime.utcnow()
+    session.execute(insert(AnalysisJob), [
+        {
+            'email_id': email_id,
+            'user_id': user_id,
+            'status': 'pending',
+            'attempts': 0,
+            'next_attempt_at': now,
+            'created_at': now,
+            'updated_at': now
+        }
+        for email_id in email_ids
+    ])
+
+
+def notify_analysis_workers():
+    """Wake up the dispatcher after newly enqueued jobs have been committed"""
+    _wakeup.set()
+
+
+def claim_analysis_jobs(app, limit, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Claim up to `limit` due jobs and mark them as processing
+
+    Jobs left in 'processing' by a crashed worker are reclaimed after
+    STALE_JOB_TIMEOUT, or marked as failed once they have used up
+    `max_attempts`.
+
+    Returns:
+        list: Claimed job IDs
+    """
+    if limit <= 0:
+        return []
+
+    with app.app_context():
+        try:
+            now = datetime.utcnow()
+            jobs = db.session.query(AnalysisJob)\
+                .filter(or_(
+                    and_(AnalysisJob.status == 'pending', AnalysisJob.next_attempt_at <= now),
+                    and_(AnalysisJob.status == 'processing', AnalysisJob.updated_at < now - STALE_JOB_TIMEOUT)
+                ))\
+                .order_by(AnalysisJob.next_attempt_at, AnalysisJob.id)\
+                .limit(limit)\
+                .with_for_update(skip_locked=True)\
+                .all()
+
+            if not jobs:
+                db.session.commit()
+                return []
+
+            claimed = []
+            exhausted = []
+            for job in jobs:
+                job.updated_at = now
+                if job.status == 'processing' and job.attempts >= max_attempts:
+                    # 試行回数を使い切ったまま停止したジョブは再実行しない
+                    job.status = 'failed'
+                    job.last_error = 'Worker stopped before the job finished'
+                    exhausted.append(job)
+                    continue
+                job.status = 'processing'
+                job.attempts += 1
+                claimed.append(job)
+
+            for email_status, status_jobs in (('processing', claimed), ('failed', exhausted)):
+                if status_jobs:
+                    db.session.query(Email)\
+                        .filter(Email.id.in_([job.email_id for job in status_jobs]))\
+                        .update({Email.ai_analysis_status: email_status}, synchronize_session=False)
+
+            job_ids = [job.id for job in claimed]
+            db.session.commit()
+            if exhausted:
+                app.logger.warning(
+                    f"Marked {len(exhausted)} stale analysis jobs as failed after {max_attempts} attempts"
+                )
+            return job_ids
+
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+def run_analysis_job(app, job_id, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                     retry_base_delay=DEFAULT_RETRY_BASE_DELAY):
+    """Run one claimed analysis job and record its outcome"""
+    with app.app_context():
+        try:
+            job = db.session.get(AnalysisJob, job_id)
+            if not job:
+                return
+
+            email_record = job.email
+            if not email_record:
+                job.status = 'failed'
+                job.last_error = 'Email not found'
+                db.session.commit()
+                return
+
+            if email_record.lead and email_record.lead.status == 'Spam':
+                job.status = 'completed'
+                email_record.ai_analysis_status = 'skipped'
+                db.session.commit()
+                return
+
+            email_id = email_record.id
+            subject = email_record.subject
+            content = email_record.content
+            user_id = email_record.user_id
+            # APIの応答待ちの間はトランザクションを保持しない
+            db.session.commit()
+
+            with ingestion_metrics.time('claude_api', user_id):
+                ai_response = analyze_email(subject, content, user_id, raise_errors=True)
+
+            job = db.session.get(AnalysisJob, job_id)
+            email_record = db.session.get(Email, email_id)
+            job.status = 'completed'
+            job.last_error = None
+            email_record.ai_analysis_status = 'completed'
+            if ai_response:
+                email_record.ai_analysis = ai_response
+                email_record.ai_analysis_date = datetime.utcnow()
+                email_record.ai_model_used = EMAIL_ANALYSIS_MODEL
+                # 生成されたレコードとジョブ状態をまとめてコミットし、失敗時はリトライに回す
+                process_ai_response(ai_response, email_record, app, raise_errors=True)
+            db.session.commit()
+
+            app.logger.info(f"Analysis job {job_id} completed for email {email_id}")
+
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Analysis job {job_id} failed: {str(e)}", exc_info=True)
+            _record_job_failure(app, job_id, e, max_attempts, retry_base_delay)
+
+
+def _record_job_failure(app, job_id, error, max_attempts, retry_base_delay):
+    """Schedule a retry with exponential backoff, or mark the job as failed"""
+    try:
+        job = db.session.get(AnalysisJob, job_id)
+        if not job:
+            return
+
+        job.last_error = str(error)[:2000]
+        if job.attempts >= max_attempts:
+            job.status = 'failed'
+            email_status = 'failed'
+        else:
+            job.status = 'pending'
+            job.next_attempt_at = datetime.utcnow() + timedelta(
+                seconds=retry_base_delay * (2 ** max(job.attempts - 1, 0))
+            )
+            email_status = 'pending'
+
+        db.session.query(Email)\
+            .filter(Email.id == job.email_id)\
+            .update({Email.ai_analysis_status: email_status}, synchronize_session=False)
+        db.session.commit()
+
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Failed to record failure of analysis job {job_id}: {str(e)}")
+
+
+class AnalysisWorkerPool:
+    """Dispatcher thread plus a bounded thread pool draining the analysis queue"""
+
+    def __init__(self, app):
+        self.app = app
+        self.max_workers = max(1, int(app.config.get('ANALYSIS_MAX_WORKERS', DEFAULT_MAX_WORKERS)))
+        self.max_attempts = int(app.config.get('ANALYSIS_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS))
+        self.poll_interval = app.config.get('ANALYSIS_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)
+        self.retry_base_delay = app.config.get('ANALYSIS_RETRY_BASE_DELAY', DEFAULT_RETRY_BASE_DELAY)
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="AIAnalysis"
+        )
+        self._in_flight = 0
+        self._lock = Lock()
+        self._stop_event = Event()
+        self._thread = Thread(target=self._run, name="AnalysisDispatcher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        self.app.logger.info(f"Analysis worker pool started with {self.max_workers} workers")
+
+    def stop(self):
+        self._stop_event.set()
+        _wakeup.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def _job_done(self, future):
+        with self._lock:
+            self._in_flight -= 1
+        _wakeup.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            with self._lock:
+                free_slots = self.max_workers - self._in_flight
+
+            claimed = []
+            if free_slots > 0:
+                try:
+                    claimed = claim_analysis_jobs(self.app, free_slots, self.max_attempts)
+                except Exception as e:
+                    self.app.logger.error(f"Failed to claim analysis jobs: {str(e)}", exc_info=True)
+
+            for job_id in claimed:
+                with self._lock:
+                    self._in_flight += 1
+                future = self._executor.submit(
+                    run_analysis_job, self.app, job_id,
+                    self.max_attempts, self.retry_base_delay
+                )
+                future.add_done_callback(self._job_done)
+
+            if not claimed:
+                _wakeup.wait(self.poll_interval)
+                _wakeup.clear()
+
+
+def start_analysis_worker(app):
+    """Start the process-wide analysis worker pool if it is not running"""
+    global _worker_pool
+    with _worker_pool_lock:
+        if _worker_pool and _worker_pool.is_alive():
+            return _worker_pool
+        _worker_pool = AnalysisWorkerPool(app)
+        _worker_pool.start()
+        return _worker_pool
+
+
+def stop_analysis_worker():
+    """Stop the process-wide analysis worker pool, letting running jobs finish"""
+    global _worker_pool
+    with _worker_pool_lock:
+        if _worker_pool:
+            _worker_pool.stop()
+            _worker_pool = None
@@ -1,20 +1,21 @@
 from datetime import datetime, timedelta
 from flask_login import current_user
-from sqlalchemy import func, or_, and_
-from models import Opportunity, Lead, Task, Schedule
+from sqlalchemy import func, or_, and_, case, literal_column
+from models import Opportunity, Lead, Task, Schedule, MetricsRollup
 from extensions import db
 
+def _rollup_totals(*columns):
+    """Sum rollup columns over all days of the current user"""
+    return db.session.query(
+        *[func.coalesce(func.sum(column), 0) for column in columns]
+    ).filter(
+        MetricsRollup.user_id == current_user.id
+    ).one()
+
 def get_sales_pipeline_value():
     """Get total value of open opportunities with null handling"""
-    pipeline_value = db.session.query(
-        func.coalesce(func.sum(Opportunity.amount), 0.0)
-    ).filter(
-        and_(
-            Opportunity.user_id == current_user.id,
-            Opportunity.stage.in_(['Initial Contact', 'Qualification', 'Proposal', 'Negotiation'])
-        )
-    ).scalar()
-    
+    pipeline_value, = _rollup_totals(MetricsRollup.pipeline_amount)
+
     return float(pipeline_value or 0.0)
 
 def get_sales_pipeline_by_stage():
@@ -31,39 +32,38 @@ def get_sales_pipeline_by_stage():
 
 def get_conversion_rate():
     """Get lead conversion rate with null handling"""
-    total_leads = Lead.query.filter_by(user_id=current_user.id).count()
-    converted_leads = Opportunity.query.filter(
-        and_(
-            Opportunity.user_id == current_user.id,
-            Opportunity.stage == 'Closed Won'
-        )
-    ).count()
-    
+    total_leads, converted_leads = _rollup_totals(MetricsRollup.lead_count, MetricsRollup.won_count)
+
     if total_leads > 0:
         return (converted_leads / total_leads) * 100
     return 0
 
 def get_average_deal_size():
     """Get average deal size with null handling"""
-    result = db.session.query(
-        func.coalesce(func.avg(Opportunity.amount), 0.0)
-    ).filter(
-        and_(
-            Opportunity.user_id == current_user.id,
-            Opportunity.stage == 'Closed Won',
-            Opportunity.amount != None
-        )
-    ).scalar()
-    
-    return float(result or 0)
+    won_amount, won_amount_count = _rollup_totals(MetricsRollup.won_amount, MetricsRollup.won_amount_count)
+
+    if won_amount_count > 0:
+        return float(won_amount / won_amount_count)
+    return 0.0
 
 def get_lead_score_distribution():
     """Get distribution of lead scores"""
-    leads = Lead.query.filter_by(user_id=current_user.id).all()
+    # バケット境界は従来の Python 集計と同じ（30〜31、70〜71 の間の小数は含めない）
+    low = and_(Lead.score >= 0, Lead.score <= 30)
+    medium = and_(Lead.score >= 31, Lead.score <= 70)
+    high = and_(Lead.score >= 71, Lead.score <= 100)
+    counts = db.session.query(
+        func.count(case((low, 1))),
+        func.count(case((medium, 1))),
+        func.count(case((high, 1)))
+    ).filter(
+        Lead.user_id == current_user.id
+    ).one()
+
     score_ranges = {
-        'Low (0-30)': len([l for l in leads if l.score is not None and 0 <= l.score <= 30]),
-        'Medium (31-70)': len([l for l in leads if l.score is not None and 31 <= l.score <= 70]),
-        'High (71-100)': len([l for l in leads if l.score is not None and 71 <= l.score <= 100])
+        'Low (0-30)': counts[0] or 0,
+        'Medium (31-70)': counts[1] or 0,
+        'High (71-100)': counts[2] or 0
     }
     return score_ranges
 
@@ -79,23 +79,27 @@ def get_monthly_revenue(date=None):
         end_date = date.replace(month=date.month + 1, day=1) - timedelta(microseconds=1)
     
     revenue = db.session.query(
-        func.coalesce(func.sum(Opportunity.amount), 0.0)
+        func.coalesce(func.sum(MetricsRollup.revenue), 0.0)
     ).filter(
-        Opportunity.user_id == current_user.id,
-        Opportunity.stage == 'Closed Won',
-        Opportunity.close_date >= start_date,
-        Opportunity.close_date <= end_date
+        MetricsRollup.user_id == current_user.id,
+        MetricsRollup.day >= start_date.date(),
+        MetricsRollup.day <= end_date.date()
     ).scalar()
     
     return float(revenue or 0.0)
 
 def get_task_status_distribution():
     """Get distribution of task statuses"""
-    tasks = Task.query.filter_by(user_id=current_user.id).all()
+    new_count, in_progress_count, completed_count = _rollup_totals(
+        MetricsRollup.task_new_count,
+        MetricsRollup.task_in_progress_count,
+        MetricsRollup.task_completed_count
+    )
+
     status_counts = {
-        'New': len([t for t in tasks if t.status == 'New']),
-        'In Progress': len([t for t in tasks if t.status == 'In Progress']),
-        'Completed': len([t for t in tasks if t.status == 'Completed'])
+        'New': new_count,
+        'In Progress': in_progress_count,
+        'Completed': completed_count
     }
     return status_counts
 
@@ -112,17 +116,44 @@ def get_upcoming_schedules(days=7):
     
     return schedules
 
+def _month_key(column):
+    """SQL expression formatting a date or datetime column as 'YYYY-MM'"""
+    # 書式はリテラルで埋め込む（バインド変数だと SELECT と GROUP BY が別の式として扱われる）
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return func.to_char(func.date_trunc(literal_column("'month'"), column), literal_column("'YYYY-MM'"))
+    return func.strftime(literal_column("'%Y-%m'"), column)
+
+
 def get_revenue_trend(months=6):
     """Get revenue trend for the last N months with null handling"""
     today = datetime.utcnow()
+    dates = [today - timedelta(days=i*30) for i in range(months-1, -1, -1)]
+    if not dates:
+        return []
+
+    # 対象期間の月別売上を1回のクエリで集計する
+    start_date = dates[0].replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if today.month == 12:
+        end_date = today.replace(year=today.year + 1, month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    else:
+        end_date = today.replace(month=today.month + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    month = _month_key(MetricsRollup.day).label('month')
+    revenue_by_month = dict(db.session.query(
+        month,
+        func.coalesce(func.sum(MetricsRollup.revenue), 0.0)
+    ).filter(
+        MetricsRollup.user_id == current_user.id,
+        MetricsRollup.day >= start_date.date(),
+        MetricsRollup.day < end_date.date()
+    ).group_by(month).all())
+
     trend = []
-    
-    for i in range(months-1, -1, -1):
-        date = today - timedelta(days=i*30)
-        revenue = get_monthly_revenue(date)
+    for date in dates:
+        label = date.strftime('%Y-%m')
         trend.append({
-            'month': date.strftime('%Y-%m'),
-            'revenue': float(revenue)
+            'month': label,
+            'revenue': float(revenue_by_month.get(label) or 0.0)
         })
-    
+
     return trend
@@ -0,0 +1,121 @@
+"""
+Process-wide registry of Anthropic clients keyed by API key.
+
+Each client owns an httpx connection pool, so sharing one client per key
+lets keep-alive connections (HTTP/2 when the optional h2 package is
+installed) be reused across requests instead of opening a new pool on
+every call.
+"""
+import hashlib
+import importlib.util
+from collections import OrderedDict
+from threading import Lock
+
+import httpx
+from anthropic import Anthropic, DefaultHttpxClient
+from flask import current_app, has_app_context
+
+# Constants
+DEFAULT_CLIENT_CACHE_SIZE = 64
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 10
+DEFAULT_KEEPALIVE_EXPIRY = 60  # seconds
+
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+
+def _config(name, default):
+    if has_app_context():
+        return current_app.config.get(name, default)
+    return default
+
+
+class AnthropicClientRegistry:
+    """LRU registry of Anthropic clients with hit/miss instrumentation"""
+
+    def __init__(self):
+        self._clients = OrderedDict()
+        self._lock = Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def _build_client(self, api_key, base_url):
+        use_http2 = HTTP2_AVAILABLE and _config('ANTHROPIC_HTTP2', True)
+        # SDK既定のタイムアウト・リダイレクト設定を保ったまま接続プールのみ変更する
+        http_client = DefaultHttpxClient(
+            http2=use_http2,
+            limits=httpx.Limits(
+                max_connections=_config('ANTHROPIC_MAX_CONNECTIONS', DEFAULT_MAX_CONNECTIONS),
+                max_keepalive_connections=_config(
+                    'ANTHROPIC_MAX_KEEPALIVE_CONNECTIONS', DEFAULT_MAX_KEEPALIVE_CONNECTIONS
+                ),
+                keepalive_expiry=DEFAULT_KEEPALIVE_EXPIRY
+            )
+        )
+        return Anthropic(api_key=api_key, base_url=base_url, http_client=http_client)
+
+    def get(self, api_key, base_url=None):
+        """
+        Return the shared client for an API key, creating it on first use
+
+        Args:
+            api_key: Decrypted Claude API key. None falls back to the SDK's
+                environment lookup and is not cached.
+            base_url: API endpoint, e.g. a local stub server. Defaults to
+                ANTHROPIC_BASE_URL, or the SDK default when unset.
+
+        Returns:
+            Anthropic: Client instance
+        """
+        base_url = base_url or _config('ANTHROPIC_BASE_URL', None)
+        if not api_key:
+            return Anthropic(api_key=api_key, base_url=base_url)
+
+        key = hashlib.sha256(f"{base_url or ''}|{api_key}".encode('utf-8')).hexdigest()
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                self.stats['hits'] += 1
+                return client
+
+            self.stats['misses'] += 1
+            client = self._build_client(api_key, base_url)
+            self._clients[key] = client
+
+            max_size = _config('ANTHROPIC_CLIENT_CACHE_SIZE', DEFAULT_CLIENT_CACHE_SIZE)
+            while len(self._clients) > max_size:
+                # 使用中の可能性があるため、追い出したクライアントは明示的に閉じない
+                self._clients.popitem(last=False)
+                self.stats['evictions'] += 1
+
+            return client
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats['clients'] = len(self._clients)
+            stats['http2'] = HTTP2_AVAILABLE and _config('ANTHROPIC_HTTP2', True)
+            return stats
+
+    def clear(self):
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            try:
+                client.close()
+            except Exception:
+                pass
+
+
+client_registry = AnthropicClientRegistry()
+
+
+def get_anthropic_client(api_key, base_url=None):
+    """Return the shared Anthropic client for an API key"""
+    return client_registry.get(api_key, base_url)
+
+
+def get_client_stats():
+    """Return pool hit/miss counters of the client registry"""
+    return client_registry.get_stats()
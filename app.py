@@ -3,12 +3,14 @@ import socket
 from flask import Flask, render_template, current_app
 from config import config
 from extensions import db, migrate, login_manager, mail, limiter
-from email_receiver import setup_email_scheduler
 import logging
 from sqlalchemy import text
 from db_utils import init_database
 from sqlalchemy.exc import SQLAlchemyError
-from commands import reset_db_command
+from commands import (
+    reset_db_command, analyze_emails_batch_command, run_ingestion_worker_command,
+    rebuild_metrics_rollup_command, backfill_email_content_hash_command
+)
 from datetime import datetime
 
 # モデルのインポート
@@ -60,9 +62,12 @@ def _initialize_components(app: Flask) -> None:
     
     # ブループリントの登録
     _register_blueprints(app)
+
+    # 集計ロールアップを更新するマッパーイベントの登録
+    import metrics_rollup  # noqa: F401
     
-    # メールスケジューラーの設定
-    ###setup_email_scheduler(app)
+    # メール取り込みとAI分析キューはWebプロセスでは起動しない
+    # （flask run-ingestion-worker で専用プロセスとして実行する）
 
 def _initialize_database_components(app: Flask) -> None:
     """データベース関連コンポーネントの初期化"""
@@ -93,6 +98,10 @@ def _initialize_extensions(app: Flask) -> None:
     mail.init_app(app)
     limiter.init_app(app)
     app.cli.add_command(reset_db_command)
+    app.cli.add_command(analyze_emails_batch_command)
+    app.cli.add_command(run_ingestion_worker_command)
+    app.cli.add_command(rebuild_metrics_rollup_command)
+    app.cli.add_command(backfill_email_content_hash_command)
 
 def _register_blueprints(app: Flask) -> None:
     """ブループリントの登録"""
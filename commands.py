@@ -40,4 +40,113 @@ def reset_db_command():
 
         except Exception as e:
             db.session.rollback()
-            click.echo(f'Error resetting database: {str(e)}', err=True)
\ No newline at end of file
+            click.echo(f'Error resetting database: {str(e)}', err=True)
+
+@click.command('analyze-emails-batch')
+@click.option('--user-id', type=int, required=True, help='User whose emails are analyzed.')
+@click.option('--lead-id', type=int, default=None, help='Only analyze emails of this lead.')
+@click.option('--reanalyze', is_flag=True, help='Also re-analyze emails that already have a result.')
+@click.option('--limit', type=int, default=None, help='Maximum number of emails to submit.')
+@with_appcontext
+def analyze_emails_batch_command(user_id, lead_id, reanalyze, limit):
+    """Analyze emails in bulk through the Message Batches API."""
+    from flask import current_app
+    from models import Email
+    from ai_analysis import analyze_emails_batch
+
+    query = db.session.query(Email.id).filter(Email.user_id == user_id)
+    if lead_id:
+        query = query.filter(Email.lead_id == lead_id)
+    if not reanalyze:
+        query = query.filter(Email.ai_analysis.is_(None))
+    query = query.order_by(Email.received_date)
+    if limit:
+        query = query.limit(limit)
+
+    email_ids = [row.id for row in query]
+    if not email_ids:
+        click.echo('No emails to analyze.')
+        return
+
+    click.echo(f'Analyzing {len(email_ids)} emails in batch mode...')
+    try:
+        stats = analyze_emails_batch(email_ids, user_id, current_app._get_current_object())
+        click.echo(
+            f"Done. Submitted: {stats['submitted']}, Cached: {stats['cached']}, "
+            f"Succeeded: {stats['succeeded']}, Failed: {stats['failed']}"
+        )
+    except Exception as e:
+        db.session.rollback()
+        click.echo(f'Error in batch analysis: {str(e)}', err=True)
+
+@click.command('rebuild-metrics-rollup')
+@click.option('--user-id', type=int, default=None, help='Only rebuild this user (default: all users).')
+@with_appcontext
+def rebuild_metrics_rollup_command(user_id):
+    """Recompute the report metrics rollup from the raw tables."""
+    from metrics_rollup import rebuild_metrics_rollup
+
+    try:
+        rows = rebuild_metrics_rollup(user_id)
+        db.session.commit()
+        click.echo(f'Metrics rollup rebuilt ({rows} rows).')
+    except Exception as e:
+        db.session.rollback()
+        click.echo(f'Error rebuilding metrics rollup: {str(e)}', err=True)
+
+@click.command('backfill-email-content-hash')
+@click.option('--batch-size', type=int, default=1000, help='Rows hashed per transaction.')
+@with_appcontext
+def backfill_email_content_hash_command(batch_size):
+    """Fill in the duplicate-detection hash of emails stored without one."""
+    from email_receiver import backfill_content_hashes
+
+    try:
+        updated = backfill_content_hashes(db.session, batch_size)
+        click.echo(f'Content hashes backfilled ({updated} emails).')
+    except Exception as e:
+        db.session.rollback()
+        click.echo(f'Error backfilling content hashes: {str(e)}', err=True)
+
+@click.command('run-ingestion-worker')
+@click.option('--metrics-port', type=int, default=None,
+              help='Serve Prometheus metrics of this worker on the given port.')
+@with_appcontext
+def run_ingestion_worker_command(metrics_port):
+    """Run email ingestion and the AI analysis queue without the web server."""
+    import signal
+    import threading
+    from flask import current_app
+    # 取り込み関連のモジュールはワーカープロセスでのみ読み込む
+    from email_receiver import setup_email_scheduler, stop_idle_watchers
+    from analysis_queue import stop_analysis_worker
+    from ingestion_metrics import start_metrics_server
+
+    app = current_app._get_current_object()
+    stop_event = threading.Event()
+
+    def handle_signal(signum, frame):
+        click.echo(f'Received signal {signum}, shutting down ingestion worker...')
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    metrics_server = None
+    if metrics_port:
+        metrics_server = start_metrics_server(metrics_port)
+        click.echo(f'Serving ingestion metrics on port {metrics_port}.')
+
+    scheduler = setup_email_scheduler(app)
+    click.echo('Ingestion worker started.')
+
+    try:
+        while not stop_event.wait(1):
+            pass
+    finally:
+        scheduler.shutdown(wait=False)
+        stop_idle_watchers()
+        stop_analysis_worker()
+        if metrics_server:
+            metrics_server.shutdown()
+        click.echo('Ingestion worker stopped.')
@@ -28,7 +28,54 @@ class Config:
     SCHEDULER_API_ENABLED = True
     FOLLOW_UP_INTERVAL_DAYS = int(os.environ.get('FOLLOW_UP_INTERVAL_DAYS', 7))
     FOLLOW_UP_HOUR = int(os.environ.get('FOLLOW_UP_HOUR', 9))  # 9 AM by default
-    
+
+    # Email ingestion configuration
+    EMAIL_CHECK_MAX_WORKERS = int(os.environ.get('EMAIL_CHECK_MAX_WORKERS', 4))
+    EMAIL_MAILBOX_TIMEOUT = int(os.environ.get('EMAIL_MAILBOX_TIMEOUT', 240))  # seconds per mailbox
+    EMAIL_HEADER_PREFILTER = os.environ.get('EMAIL_HEADER_PREFILTER', 'true').lower() in ['true', 'on', '1']
+    EMAIL_HEADER_FETCH_BATCH = int(os.environ.get('EMAIL_HEADER_FETCH_BATCH', 200))
+    EMAIL_BODY_FETCH_BATCH = int(os.environ.get('EMAIL_BODY_FETCH_BATCH', 20))
+    EMAIL_BODY_FETCH_MAX_BYTES = int(os.environ.get('EMAIL_BODY_FETCH_MAX_BYTES', 10 * 1024 * 1024))
+    EMAIL_STREAMING_PARSER = os.environ.get('EMAIL_STREAMING_PARSER', 'true').lower() in ['true', 'on', '1']
+    EMAIL_MAX_TEXT_PART_BYTES = int(os.environ.get('EMAIL_MAX_TEXT_PART_BYTES', 1024 * 1024))
+    EMAIL_PARSE_PROCESSES = int(os.environ.get('EMAIL_PARSE_PROCESSES', 0))  # 0 = decode in-thread, -1 = one per CPU
+    EMAIL_BULK_INSERT = os.environ.get('EMAIL_BULK_INSERT', 'true').lower() in ['true', 'on', '1']
+    EMAIL_BULK_INSERT_BATCH = int(os.environ.get('EMAIL_BULK_INSERT_BATCH', 100))
+    EMAIL_CATCHUP_ENABLED = os.environ.get('EMAIL_CATCHUP_ENABLED', 'true').lower() in ['true', 'on', '1']
+    EMAIL_CATCHUP_LIVE_LIMIT = int(os.environ.get('EMAIL_CATCHUP_LIVE_LIMIT', 200))
+    EMAIL_CATCHUP_CHUNK_SIZE = int(os.environ.get('EMAIL_CATCHUP_CHUNK_SIZE', 500))
+    EMAIL_CATCHUP_CHUNKS_PER_CYCLE = int(os.environ.get('EMAIL_CATCHUP_CHUNKS_PER_CYCLE', 4))
+    EMAIL_CATCHUP_MAX_DAYS = int(os.environ.get('EMAIL_CATCHUP_MAX_DAYS', 30))
+    EMAIL_KEEPALIVE_INTERVAL = int(os.environ.get('EMAIL_KEEPALIVE_INTERVAL', 120))  # seconds
+    EMAIL_IDLE_ENABLED = os.environ.get('EMAIL_IDLE_ENABLED', 'false').lower() in ['true', 'on', '1']
+    EMAIL_IDLE_TIMEOUT = int(os.environ.get('EMAIL_IDLE_TIMEOUT', 25 * 60))  # seconds
+    MESSAGE_ID_CACHE_CAPACITY = int(os.environ.get('MESSAGE_ID_CACHE_CAPACITY', 200000))
+    MESSAGE_ID_CACHE_ERROR_RATE = float(os.environ.get('MESSAGE_ID_CACHE_ERROR_RATE', 0.001))
+    MESSAGE_ID_CACHE_LRU_SIZE = int(os.environ.get('MESSAGE_ID_CACHE_LRU_SIZE', 50000))
+    MESSAGE_ID_CACHE_WARM_DAYS = int(os.environ.get('MESSAGE_ID_CACHE_WARM_DAYS', 30))
+    DOMAIN_REPUTATION_ENABLED = os.environ.get('DOMAIN_REPUTATION_ENABLED', 'true').lower() in ['true', 'on', '1']
+    DOMAIN_REPUTATION_MIN_SPAM = int(os.environ.get('DOMAIN_REPUTATION_MIN_SPAM', 5))
+    DOMAIN_REPUTATION_SPAM_RATIO = float(os.environ.get('DOMAIN_REPUTATION_SPAM_RATIO', 0.9))
+    DOMAIN_REPUTATION_RECHECK_EVERY = int(os.environ.get('DOMAIN_REPUTATION_RECHECK_EVERY', 20))
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # Bearer token for /system/metrics and /system/api/ai-clients/stats (all-tenant metrics)
+
+    # Scheduler leader election (only the lease holder runs ingestion)
+    SCHEDULER_LEADER_ELECTION = os.environ.get('SCHEDULER_LEADER_ELECTION', 'true').lower() in ['true', 'on', '1']
+    SCHEDULER_LEASE_BACKEND = os.environ.get('SCHEDULER_LEASE_BACKEND', 'auto')  # auto / lease / advisory
+    SCHEDULER_LEASE_TTL = int(os.environ.get('SCHEDULER_LEASE_TTL', 60))  # seconds
+
+    # AI analysis queue configuration
+    ANALYSIS_MAX_WORKERS = int(os.environ.get('ANALYSIS_MAX_WORKERS', 2))
+    ANALYSIS_MAX_ATTEMPTS = int(os.environ.get('ANALYSIS_MAX_ATTEMPTS', 3))
+    ANALYSIS_POLL_INTERVAL = int(os.environ.get('ANALYSIS_POLL_INTERVAL', 10))  # seconds
+    ANALYSIS_RETRY_BASE_DELAY = int(os.environ.get('ANALYSIS_RETRY_BASE_DELAY', 60))  # seconds
+
+    # List view configuration
+    LIST_COUNT_CAP = int(os.environ.get('LIST_COUNT_CAP', 1000))  # rows counted for ?count=approx outside PostgreSQL
+
+    # Dashboard configuration
+    DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', 30))  # seconds, 0 disables the cache
+
     # Lead scoring configuration
     LEAD_SCORE_THRESHOLD = float(os.environ.get('LEAD_SCORE_THRESHOLD', 50))
     
@@ -66,6 +113,17 @@ class Config:
     
     # Claude AI Configuration
     CLAUDE_API_KEY = os.environ.get('CLAUDE_API_KEY')
+    AI_CACHE_ENABLED = os.environ.get('AI_CACHE_ENABLED', 'true').lower() in ['true', 'on', '1']
+    AI_CACHE_TTL_HOURS = int(os.environ.get('AI_CACHE_TTL_HOURS', 24 * 7))
+    AI_CACHE_MAX_ENTRIES = int(os.environ.get('AI_CACHE_MAX_ENTRIES', 10000))
+    ANTHROPIC_BASE_URL = os.environ.get('ANTHROPIC_BASE_URL')  # e.g. a local stub server
+    ANTHROPIC_HTTP2 = os.environ.get('ANTHROPIC_HTTP2', 'true').lower() in ['true', 'on', '1']  # requires h2
+    ANTHROPIC_MAX_CONNECTIONS = int(os.environ.get('ANTHROPIC_MAX_CONNECTIONS', 20))
+    ANTHROPIC_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get('ANTHROPIC_MAX_KEEPALIVE_CONNECTIONS', 10))
+    ANTHROPIC_CLIENT_CACHE_SIZE = int(os.environ.get('ANTHROPIC_CLIENT_CACHE_SIZE', 64))
+    ANALYSIS_BATCH_MAX_REQUESTS = int(os.environ.get('ANALYSIS_BATCH_MAX_REQUESTS', 1000))
+    ANALYSIS_BATCH_POLL_INTERVAL = int(os.environ.get('ANALYSIS_BATCH_POLL_INTERVAL', 30))  # seconds
+    ANALYSIS_BATCH_TIMEOUT = int(os.environ.get('ANALYSIS_BATCH_TIMEOUT', 24 * 60 * 60))  # seconds
 
     @staticmethod
     def init_app(app):
@@ -0,0 +1,124 @@
+"""
+Short-lived per-user cache for the dashboard payload.
+
+The dashboard is the most requested page, so its query results are kept in
+process for DASHBOARD_CACHE_TTL seconds. Committed changes to the rows it
+shows (leads, opportunities, tasks, schedules, emails) drop the owner's
+entries right away; bulk statements on those tables drop every entry.
+Changes made by another process (e.g. the ingestion worker) are only picked
+up when the TTL runs out, which is why the TTL is kept short.
+"""
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import Lead, Opportunity, Task, Schedule, Email
+
+# Constants
+DEFAULT_TTL = 30  # seconds
+DEFAULT_MAX_USERS = 1000
+DEFAULT_MAX_KEYS_PER_USER = 20  # ページ番号の組み合わせごとにキーが増えるため上限を設ける
+TRACKED_MODELS = (Lead, Opportunity, Task, Schedule, Email)
+ALL_USERS = '*'
+
+_SESSION_KEY = 'dashboard_cache_dirty_users'
+
+
+class DashboardCache:
+    """Thread-safe TTL cache of dashboard payloads, grouped by user"""
+
+    def __init__(self, max_users=DEFAULT_MAX_USERS, max_keys_per_user=DEFAULT_MAX_KEYS_PER_USER):
+        self.max_users = max_users
+        self.max_keys_per_user = max_keys_per_user
+        self._lock = Lock()
+        self._entries = OrderedDict()  # user_id -> {key: (expires_at, payload)}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id, {}).get(key)
+            if entry is None or entry[0] <= now:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, user_id, key, payload, ttl):
+        if ttl <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            user_entries = self._entries.setdefault(user_id, {})
+            # 期限切れのキーを削除し、上限を超えた分は古いものから削除する
+            for expired_key in [k for k, (expires_at, _) in user_entries.items() if expires_at <= now]:
+                del user_entries[expired_key]
+            user_entries.pop(key, None)
+            user_entries[key] = (now + ttl, payload)
+            while len(user_entries) > self.max_keys_per_user:
+                del user_entries[next(iter(user_entries))]
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'users': len(self._entries),
+                'entries': sum(len(entries) for entries in self._entries.values()),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+dashboard_cache = DashboardCache()
+
+
+def _dirty_users(session):
+    return session.info.setdefault(_SESSION_KEY, set())
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_users(session, flush_context):
+    dirty = _dirty_users(session)
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, TRACKED_MODELS):
+            dirty.add(getattr(instance, 'user_id', None) or ALL_USERS)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk_statements(orm_execute_state):
+    # 一括 INSERT / UPDATE / DELETE は対象ユーザーを特定できないため全体を無効化する
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and issubclass(mapper.class_, TRACKED_MODELS):
+        _dirty_users(orm_execute_state.session).add(ALL_USERS)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed(session):
+    # after_commit はセーブポイントの解放でも発火するため、最上位のコミットまで保留する
+    if session.get_nested_transaction() is not None:
+        return
+    dirty = session.info.pop(_SESSION_KEY, None)
+    if not dirty:
+        return
+    if ALL_USERS in dirty:
+        dashboard_cache.clear()
+        return
+    for user_id in dirty:
+        dashboard_cache.invalidate(user_id)
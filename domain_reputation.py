@@ -0,0 +1,221 @@
+"""
+Per-user sender domain reputation for bulk mail decisions.
+
+Every mass mail verdict is counted per (user, sender domain) in memory and in
+the sender_domain_reputation table. Domains with an established spam record
+are classified from the From header alone, before the body is fetched or
+decoded and before any AI analysis is queued.
+"""
+from datetime import datetime
+from email.utils import parseaddr
+from threading import Lock
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import SenderDomainReputation
+
+# Constants
+DEFAULT_MIN_SPAM_VERDICTS = 5
+DEFAULT_MIN_SPAM_RATIO = 0.9
+DEFAULT_RECHECK_EVERY = 20  # 判定結果の見直しのため、N通ごとに通常の判定を行う
+
+# 個人も利用する共有ドメインは送信元単位の評価ができないため対象外とする
+SHARED_MAILBOX_DOMAINS = {
+    'gmail.com', 'googlemail.com', 'yahoo.com', 'yahoo.co.jp', 'ymail.ne.jp',
+    'outlook.com', 'outlook.jp', 'hotmail.com', 'hotmail.co.jp', 'live.com', 'live.jp',
+    'msn.com', 'icloud.com', 'me.com', 'mac.com', 'aol.com', 'protonmail.com', 'proton.me',
+    'docomo.ne.jp', 'ezweb.ne.jp', 'au.com', 'softbank.ne.jp', 'i.softbank.jp',
+    'nifty.com', 'biglobe.ne.jp', 'ocn.ne.jp', 'so-net.ne.jp',
+    'qq.com', '163.com', '126.com', 'sina.com', 'sohu.com',
+}
+
+_SESSION_KEY = 'domain_reputation_pending'
+
+
+def get_sender_domain(msg):
+    """Return the lowercased domain of the From address, or None"""
+    _, address = parseaddr(str(msg.get('from', '')))
+    if '@' not in address:
+        return None
+    return address.rsplit('@', 1)[-1].strip().lower() or None
+
+
+class DomainReputationStore:
+    """In-memory view of sender_domain_reputation, loaded per user on first use"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._loaded_users = set()
+        # (user_id, domain) -> [spam_count, ham_count, last_seen_at]
+        self._entries = {}
+
+    def _ensure_loaded(self, user_id, session):
+        with self._lock:
+            if user_id in self._loaded_users:
+                return
+
+        rows = session.query(
+            SenderDomainReputation.domain,
+            SenderDomainReputation.spam_count,
+            SenderDomainReputation.ham_count,
+            SenderDomainReputation.last_seen_at
+        ).filter(SenderDomainReputation.user_id == user_id).all()
+
+        with self._lock:
+            if user_id in self._loaded_users:
+                return
+            for row in rows:
+                self._entries[(user_id, row.domain)] = [row.spam_count, row.ham_count, row.last_seen_at]
+            self._loaded_users.add(user_id)
+
+    def get(self, user_id, domain, session):
+        """Return (spam_count, ham_count, last_seen_at) or None"""
+        self._ensure_loaded(user_id, session)
+        with self._lock:
+            entry = self._entries.get((user_id, domain))
+            return tuple(entry) if entry else None
+
+    def record(self, user_id, domain, is_spam, session):
+        """
+        Count one verdict for a sender domain
+
+        The row is updated in a savepoint of the caller's transaction with an
+        SQL increment, so concurrent workers do not lose counts and a failure
+        does not abort the caller's transaction. The in-memory counters follow
+        once that transaction commits; a rolled back verdict is not counted.
+        """
+        self._ensure_loaded(user_id, session)
+        now = datetime.utcnow()
+        column = 'spam_count' if is_spam else 'ham_count'
+
+        with session.begin_nested():
+            updated = session.query(SenderDomainReputation)\
+                .filter_by(user_id=user_id, domain=domain)\
+                .update({
+                    column: getattr(SenderDomainReputation, column) + 1,
+                    'last_seen_at': now
+                }, synchronize_session=False)
+
+            if not updated:
+                session.add(SenderDomainReputation(
+                    user_id=user_id,
+                    domain=domain,
+                    spam_count=1 if is_spam else 0,
+                    ham_count=0 if is_spam else 1,
+                    last_seen_at=now,
+                    created_at=now
+                ))
+
+        # ロールバック後の再処理で二重に数えないよう、メモリ上の件数はコミット後に反映する
+        # （呼び出し元のセーブポイントがロールバックされた場合はその分のみ破棄する）
+        transaction = session.get_nested_transaction() or session.get_transaction()
+        session.info.setdefault(_SESSION_KEY, []).append(
+            (transaction, (user_id, domain, is_spam, now))
+        )
+
+    def apply(self, verdicts):
+        """Add committed verdicts from record() to the in-memory counters"""
+        with self._lock:
+            for user_id, domain, is_spam, seen_at in verdicts:
+                entry = self._entries.setdefault((user_id, domain), [0, 0, seen_at])
+                entry[0 if is_spam else 1] += 1
+                entry[2] = seen_at
+
+
+reputation_store = DomainReputationStore()
+
+
+def _within(transaction, ancestor):
+    while transaction is not None:
+        if transaction is ancestor:
+            return True
+        transaction = transaction.parent
+    return False
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_committed_verdicts(session):
+    # after_commit はセーブポイントの解放でも発火するため、最上位のコミットのみ反映する
+    if session.get_nested_transaction() is not None:
+        return
+    # ロールバックされたトランザクションの判定は after_soft_rollback で除外済み
+    pending = session.info.pop(_SESSION_KEY, None)
+    if pending:
+        reputation_store.apply([verdict for _, verdict in pending])
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_rolled_back_verdicts(session, previous_transaction):
+    # セーブポイントのロールバックでも発火するため、そのトランザクション内の判定のみ破棄する
+    pending = session.info.get(_SESSION_KEY)
+    if pending:
+        pending[:] = [
+            (transaction, verdict) for transaction, verdict in pending
+            if not _within(transaction, previous_transaction)
+        ]
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _discard_uncommitted_verdicts(session, transaction):
+    # コミットされずに閉じられた最上位トランザクションの判定を残さない
+    if transaction.parent is None:
+        session.info.pop(_SESSION_KEY, None)
+
+
+def _reputation_enabled(app):
+    return app.config.get('DOMAIN_REPUTATION_ENABLED', True)
+
+
+def check_established_bulk_sender(msg, user_id, session, app):
+    """
+    Check whether the sender's domain has an established bulk mail record
+
+    Args:
+        msg: Email message object (headers only is enough)
+        user_id: User ID from UserSettings
+        session: Database session
+        app: Flask app object
+
+    Returns:
+        tuple: (is_bulk_sender: bool, reason: str or None)
+    """
+    if not _reputation_enabled(app):
+        return False, None
+
+    domain = get_sender_domain(msg)
+    if not domain or domain in SHARED_MAILBOX_DOMAINS:
+        return False, None
+
+    entry = reputation_store.get(user_id, domain, session)
+    if not entry:
+        return False, None
+
+    spam_count, ham_count, _ = entry
+    recheck_every = app.config.get('DOMAIN_REPUTATION_RECHECK_EVERY', DEFAULT_RECHECK_EVERY)
+    if recheck_every and (spam_count + ham_count) % recheck_every == 0:
+        return False, None
+
+    min_spam = app.config.get('DOMAIN_REPUTATION_MIN_SPAM', DEFAULT_MIN_SPAM_VERDICTS)
+    min_ratio = app.config.get('DOMAIN_REPUTATION_SPAM_RATIO', DEFAULT_MIN_SPAM_RATIO)
+    if spam_count >= min_spam and spam_count / (spam_count + ham_count) >= min_ratio:
+        return True, (
+            f'Established bulk sender domain: {domain} '
+            f'({spam_count} spam / {ham_count} ham verdicts)'
+        )
+    return False, None
+
+
+def record_sender_verdict(msg, user_id, is_spam, session, app):
+    """Count a mass mail verdict for the sender's domain"""
+    if not _reputation_enabled(app):
+        return
+
+    domain = get_sender_domain(msg)
+    if not domain or domain in SHARED_MAILBOX_DOMAINS:
+        return
+
+    try:
+        reputation_store.record(user_id, domain, is_spam, session)
+    except Exception as e:
+        app.logger.warning(f"Failed to record reputation for {domain}: {str(e)}")
@@ -13,10 +13,13 @@ import codecs
 import unicodedata
 from email import message_from_bytes, utils
 from email.header import decode_header
-from email.utils import parsedate_tz, parsedate_to_datetime
+from email.utils import parsedate_to_datetime
 from datetime import datetime, timedelta, timezone
 from contextlib import contextmanager
-from threading import Thread
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from threading import Thread, Lock
 from typing import Tuple, Union, Optional, List, Dict
 
 # Third-party imports
@@ -25,6 +28,8 @@ import chardet
 
 # Flask and extensions
 from flask import current_app
+from sqlalchemy import select, update, bindparam
+from sqlalchemy.dialects import postgresql, sqlite
 from apscheduler.schedulers.background import BackgroundScheduler
 from anthropic import APIError, APIConnectionError, AuthenticationError
 
@@ -38,7 +43,22 @@ from models import (
     UserSettings
 )
 from extensions import db
-from ai_analysis import analyze_email, process_ai_response
+from message_id_cache import known_message_ids, warm_message_id_cache
+from analysis_queue import (
+    enqueue_analysis,
+    enqueue_analysis_bulk,
+    notify_analysis_workers,
+    start_analysis_worker,
+    stop_analysis_worker
+)
+from scheduler_lease import start_leader_election, is_ingestion_leader
+from imap_connection_pool import IMAPConnectionPool, IdleWatcher
+from mass_mail_classifier import mass_mail_classifier
+from domain_reputation import check_established_bulk_sender, record_sender_verdict
+from streaming_mime import parse_message_streaming, DEFAULT_MAX_TEXT_PART_BYTES
+from mime_decoding_pool import get_mime_decoding_pool, decode_messages
+from ingestion_metrics import ingestion_metrics
+from metrics_rollup import record_bulk_inserts
 from email_encoding import (
     convert_encoding,
     clean_email_content,
@@ -50,6 +70,30 @@ RETRY_MAX_ATTEMPTS = 3
 RETRY_BASE_DELAY = 5  # seconds
 DEFAULT_TIMEOUT = 30  # seconds
 JAPANESE_TZ = timezone(timedelta(hours=9))  # JST
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_MAILBOX_TIMEOUT = 240  # seconds
+INBOX_FOLDER = 'INBOX'
+DEFAULT_HEADER_FETCH_BATCH = 200
+DEFAULT_BODY_FETCH_BATCH = 20
+DEFAULT_BODY_FETCH_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BULK_INSERT_BATCH = 100
+DEFAULT_CATCHUP_LIVE_LIMIT = 200  # これを超える新着はバックログとして分割処理する
+DEFAULT_CATCHUP_CHUNK_SIZE = 500  # UIDs per backlog chunk
+DEFAULT_CATCHUP_CHUNKS_PER_CYCLE = 4
+DEFAULT_CATCHUP_MAX_DAYS = 30
+
+# 処理中のメールボックス（前回サイクルの処理が残っている場合の重複実行防止）
+_active_mailboxes = set()
+_active_mailboxes_lock = Lock()
+
+# IDLEモードの監視スレッド（UserSettings ID -> IdleWatcher）
+_idle_watchers = {}
+
+# 文字コード検出結果のキャッシュ（(送信元ドメイン, 宣言文字コード) -> 文字コード）
+ENCODING_CACHE_SIZE = 4096
+CHARSET_DETECTION_SAMPLE_BYTES = 32 * 1024
+_encoding_cache = OrderedDict()
+_encoding_cache_lock = Lock()
 
 # Initialize logger
 logger = logging.getLogger(__name__)
@@ -59,6 +103,10 @@ def get_email_content(msg):
     content_parts = []
     current_app.logger.debug("Starting email content processing")
 
+    # 文字コード検出キャッシュのキーに使う送信元ドメイン
+    _, sender_address = utils.parseaddr(str(msg.get('from', '')))
+    sender_domain = sender_address.rsplit('@', 1)[-1] if '@' in sender_address else None
+
     def process_content(raw_content, charset=None):
         if not raw_content:
             current_app.logger.debug("Empty raw content received")
@@ -76,7 +124,7 @@ def get_email_content(msg):
                     return str(raw_content)
 
             # エンコーディング検出と変換
-            detected_encoding = detect_encoding(raw_content)
+            detected_encoding = detect_encoding(raw_content, charset, sender_domain)
             if detected_encoding:
                 try:
                     decoded = raw_content.decode(detected_encoding)
@@ -153,12 +201,56 @@ def get_email_content(msg):
         current_app.logger.error(f"Error in get_email_content: {str(e)}", exc_info=True)
         return "（メール内容の処理中にエラーが発生しました）"
 
-def detect_encoding(raw_content: bytes) -> Optional[str]:
+def _round_trips(raw_content: bytes, encoding: str) -> bool:
+    """Check that content decodes strictly and re-encodes to the same bytes"""
+    try:
+        return raw_content.decode(encoding).encode(encoding) == raw_content
+    except (UnicodeError, LookupError):
+        return False
+
+def _is_iso2022jp_codec(encoding: Optional[str]) -> bool:
+    """Whether an encoding name resolves to ISO-2022-JP or one of its extensions"""
+    if not encoding:
+        return False
+    try:
+        # iso_2022_jp_2, ISO-2022-JP-EXT などの表記揺れは codec 名で比較する
+        return codecs.lookup(encoding).name.startswith('iso2022_jp')
+    except LookupError:
+        return False
+
+def _get_cached_encoding(cache_key):
+    with _encoding_cache_lock:
+        encoding = _encoding_cache.get(cache_key)
+        if encoding:
+            _encoding_cache.move_to_end(cache_key)
+        return encoding
+
+def _cache_encoding(cache_key, encoding):
+    if not cache_key or not encoding:
+        return
+    with _encoding_cache_lock:
+        _encoding_cache[cache_key] = encoding
+        _encoding_cache.move_to_end(cache_key)
+        while len(_encoding_cache) > ENCODING_CACHE_SIZE:
+            _encoding_cache.popitem(last=False)
+
+def detect_encoding(raw_content: bytes, declared_charset: Optional[str] = None,
+                    sender_domain: Optional[str] = None) -> Optional[str]:
     """
-    Detect the encoding of content with improved accuracy and fallback mechanisms
+    Detect the encoding of content with a tiered strategy, cheapest first
+
+    1. BOM
+    2. ISO-2022-JP escape sequences (7-bit, so ascii, utf-8 or single-byte
+       declarations would otherwise round-trip and hide them)
+    3. Declared MIME charset, if the content round-trips through it
+    4. Strict UTF-8
+    5. Encoding previously detected for the same (sender domain, declared charset)
+    6. chardet on a bounded sample, then the Japanese byte heuristics
 
     Args:
         raw_content: Raw bytes content to analyze
+        declared_charset: Charset from the part's Content-Type (optional)
+        sender_domain: Domain of the sender, used as detection cache key (optional)
 
     Returns:
         Optional[str]: Detected encoding name or None if detection fails
@@ -179,7 +271,10 @@ def detect_encoding(raw_content: bytes) -> Optional[str]:
             current_app.logger.debug("UTF-16 BE BOM detected")
             return 'utf-16-be'
 
+        declared = normalize_encoding_name(declared_charset)
+
         # ISO-2022-JPの検出（エスケープシーケンスによる）
+        # 7ビットのためASCII・UTF-8・1バイト文字コードの宣言でも往復変換できてしまうので、宣言より先に判定する
         iso_jp_markers = {
             b'\x1b$B': 'iso-2022-jp',  # JIS X 0208-1983
             b'\x1b$@': 'iso-2022-jp',  # JIS X 0208-1978
@@ -190,24 +285,50 @@ def detect_encoding(raw_content: bytes) -> Optional[str]:
         for marker, encoding in iso_jp_markers.items():
             if marker in raw_content:
                 current_app.logger.debug(f"ISO-2022-JP marker detected: {marker!r}")
+                # ISO-2022-JPの拡張（-2, -ext など）が宣言されていればそちらを優先する
+                if _is_iso2022jp_codec(declared) and _round_trips(raw_content, declared):
+                    return declared
                 return encoding
 
-        # chardetによる検出
-        result = chardet.detect(raw_content)
+        # 宣言された文字コードで正しく往復変換できればそれを信頼する
+        if declared and _round_trips(raw_content, declared):
+            current_app.logger.debug(f"Using declared charset {declared}")
+            return declared
+
+        # 厳密なUTF-8デコード（ASCIIのみの内容もここで確定する）
+        try:
+            raw_content.decode('utf-8')
+            return 'utf-8'
+        except UnicodeDecodeError:
+            pass
+
+        # 同じ送信元ドメイン・宣言文字コードで前回検出した結果を再利用
+        cache_key = (sender_domain.lower(), declared) if sender_domain else None
+        cached = _get_cached_encoding(cache_key) if cache_key else None
+        if cached and _round_trips(raw_content, cached):
+            current_app.logger.debug(f"Using cached encoding {cached} for {sender_domain}")
+            return cached
+
+        # chardetによる検出（先頭のサンプルのみ）
+        sample = raw_content[:CHARSET_DETECTION_SAMPLE_BYTES]
+        result = chardet.detect(sample)
         if result and result['confidence'] > 0.7:
             encoding = result['encoding']
             # エンコーディング名の正規化
             normalized_encoding = normalize_encoding_name(encoding)
-            if normalized_encoding:
+            if normalized_encoding and (
+                len(sample) == len(raw_content) or _round_trips(raw_content, normalized_encoding)
+            ):
                 current_app.logger.debug(
                     f"Detected {normalized_encoding} with "
                     f"confidence {result['confidence']:.2f}"
                 )
+                _cache_encoding(cache_key, normalized_encoding)
                 return normalized_encoding
 
         # ヒューリスティック検出
         # 日本語エンコーディングの特徴的なバイトパターンをチェック
-        if is_likely_japanese_encoding(raw_content):
+        if is_likely_japanese_encoding(sample):
             encodings_to_try = ['cp932', 'euc_jp', 'iso-2022-jp']
             for enc in encodings_to_try:
                 try:
@@ -216,19 +337,11 @@ def detect_encoding(raw_content: bytes) -> Optional[str]:
                         current_app.logger.debug(
                             f"Heuristically detected {enc} based on content"
                         )
+                        _cache_encoding(cache_key, enc)
                         return enc
                 except UnicodeDecodeError:
                     continue
 
-        # UTF-8の検証
-        try:
-            decoded = raw_content.decode('utf-8')
-            if any('\u0080' <= c <= '\uffff' for c in decoded):
-                current_app.logger.debug("Valid UTF-8 with non-ASCII chars detected")
-                return 'utf-8'
-        except UnicodeDecodeError:
-            pass
-
         current_app.logger.warning("Failed to detect encoding")
         return None
 
@@ -342,6 +455,9 @@ def is_mass_email(msg, content, app):
     """
     Enhanced spam detection with improved pattern matching and scoring system
 
+    Delegates to the precompiled MassMailClassifier, which also keeps
+    per-rule hit counters.
+
     Args:
         msg: Email message object
         content: Processed email content
@@ -350,172 +466,7 @@ def is_mass_email(msg, content, app):
     Returns:
         tuple: (is_spam: bool, reason: str)
     """
-    spam_score = 0
-    spam_indicators = []
-    try:
-        # スコアリング閾値の設定
-        SPAM_THRESHOLD = 2
-
-        # ドメインチェック（重み: 1）
-        spam_domains = [
-            # メール配信サービス
-            'mailout.', 'mailchimp.', 'sendgrid.', 'marketo.', 'salesforce.',
-            'campaign-', 'newsletter.', 'info.', 'amazonses.com', 'bounce.',
-            'mailer.', 'mta.', 'spark.',
-
-            # 日本のサービス
-            'mail.rakuten.com', 'cuenote.jp', 'mpse.jp', 'itmedia.co.jp',
-            'bizmkt.jp', 'hansoku.jp',
-
-            # 中国系サービス
-            '.qq.com', '.163.com', '.sina.com', '.sohu.com', 'edm.',
-            'mail.hk', '.alibaba.com', '.taobao.com', '.tmall.com',
-
-            # 一般的なメールサービス（追加の確認が必要）
-            'noreply', 'no-reply', 'donotreply', 'notifications.'
-        ]
-
-        sender = msg.get('from', '').lower()
-        if any(domain in sender for domain in spam_domains):
-            spam_score += 1
-            spam_indicators.append(f'Mass mail domain detected: {sender}')
-
-        # ヘッダーチェック（重み: 1）
-        bulk_headers = [
-            # 標準的なリストメールヘッダー
-            'List-Unsubscribe', 'List-Id', 'List-Post', 'List-Owner',
-            'List-Subscribe', 'List-Help', 'Precedence', 'X-Campaign',
-
-            # マーケティングメール関連
-            'X-Marketing', 'X-Campaign-ID', 'X-Newsletter',
-            'X-Mailer', 'Bulk-Sender', 'X-Report-Abuse',
-
-            # 自動送信関連
-            'Auto-Submitted', 'X-Auto-Response-Suppress',
-
-            # その他の判定用ヘッダー
-            'X-MC-User', 'Feedback-ID', 'X-SES-Outgoing',
-            'X-CSA-Complaints', 'X-EDM-Key', 'X-CNDM', 'X-CN-List'
-        ]
-
-        for header in bulk_headers:
-            if msg.get(header):
-                spam_score += 1
-                spam_indicators.append(f'Bulk mail header found: {header}')
-                break  # 1つのヘッダーの存在で十分
-
-        # Precedenceヘッダーの特別チェック（重み: 1）
-        precedence = msg.get('Precedence', '').lower()
-        if precedence in ['bulk', 'list', 'junk']:
-            spam_score += 1
-            spam_indicators.append(f'Bulk mail precedence: {precedence}')
-
-        # コンテンツ内のキーフレーズチェック（重み: 1）
-        unsubscribe_phrases = [
-            # 英語
-            'unsubscribe', 'opt-out', 'opt out', 'email preferences',
-            'notification settings', 'manage subscriptions',
-            'you received this email because',
-            'this is an automated message',
-            'do not reply to this email',
-
-            # 日本語
-            '配信停止', 'メール配信を停止', '退会',
-            'このメールの配信を停止',
-            '※本メールは自動送信されています',
-            'このメールに返信されても回答できません',
-            'このアドレスは送信専用です',
-            'お問い合わせはこちら',
-            'メールの変更・停止',
-            'メールマガジン',
-            'ニュースレター',
-
-            # 中国語（簡体字）
-            '取消订阅', '退订', '停止订阅',
-            '系统自动发送', '请勿直接回复',
-
-            # 中国語（繁体字）
-            '取消訂閱', '退訂', '停止訂閱',
-            '系統自動發送', '請勿直接回覆'
-        ]
-
-        if content:
-            content_lower = content.lower()
-            found_phrases = [
-                phrase for phrase in unsubscribe_phrases 
-                if phrase.lower() in content_lower
-            ]
-            if found_phrases:
-                spam_score += 1
-                spam_indicators.append(
-                    f'Unsubscribe phrases found: {", ".join(found_phrases[:3])}'
-                )
-
-        # 宛先数のチェック（重み: 1）
-        recipient_count = sum(
-            len(msg.get_all(field, [])) 
-            for field in ['to', 'cc', 'bcc']
-        )
-        if recipient_count > 2:
-            spam_score += 1
-            spam_indicators.append(f'Multiple recipients: {recipient_count}')
-
-        # HTMLコンテンツのチェック（重み: 0.5）
-        if msg.get_content_type() == 'text/html':
-            spam_score += 0.5
-            spam_indicators.append('HTML formatted email')
-
-        # 件名のパターンチェック
-        subject = msg.get('subject', '').lower()
-        newsletter_patterns = [
-            # 英語
-            'newsletter', 'bulletin', 'update', 'digest',
-            'notification', 'subscription', 'campaign',
-            'special offer', 'announcement', 'weekly',
-            'monthly', 'breaking news', 'alert',
-
-            # 日本語
-            'ニュース', 'マガジン', '配信', 'special',
-            'キャンペーン', 'セール', '[pr]', '(pr)',
-            'お知らせ', 'ご案内', 'まとめ', 'レポート',
-            '速報',
-
-            # 中国語
-            '电子报', '通讯', '快讯', '周报', '月报',
-            '公告', '通知', '优惠', '促销', '限时',
-            '電子報', '通訊', '快訊', '週報', '優惠'
-        ]
-
-        if any(pattern in subject for pattern in newsletter_patterns):
-            spam_score += 1
-            spam_indicators.append(f'Newsletter-like subject: {subject[:50]}')
-
-        # 送信時刻のチェック（深夜は自動送信の可能性が高い）
-        try:
-            date_tuple = parsedate_tz(msg.get('date'))
-            if date_tuple:
-                hour = date_tuple[3]
-                if 0 <= hour < 6:
-                    spam_score += 0.5
-                    spam_indicators.append(f'Sent during off-hours: {hour}:00')
-        except Exception as e:
-            app.logger.debug(f"Error checking send time: {str(e)}")
-
-        # 最終判定
-        is_spam = spam_score >= SPAM_THRESHOLD
-        reason = ' | '.join(spam_indicators) if spam_indicators else 'No spam indicators found'
-
-        # 詳細なログ記録
-        app.logger.debug(
-            f"Spam check result - Score: {spam_score}, "
-            f"Is spam: {is_spam}, Indicators: {len(spam_indicators)}"
-        )
-
-        return is_spam, reason
-
-    except Exception as e:
-        app.logger.error(f"Error in spam detection: {str(e)}", exc_info=True)
-        return False, "Error in spam detection"
+    return mass_mail_classifier.classify(msg, content, app)
 
 def connect_to_email_server(app, settings):
     """
@@ -539,7 +490,7 @@ def connect_to_email_server(app, settings):
         ssl_context.options |= ssl.OP_NO_SSLv2 | ssl.OP_NO_SSLv3
 
         # 接続タイムアウトの設定
-        timeout = 30  # seconds
+        timeout = DEFAULT_TIMEOUT
 
         app.logger.debug(f"Connecting to {settings.mail_server}")
 
@@ -557,11 +508,14 @@ def connect_to_email_server(app, settings):
             if status != 'OK':
                 app.logger.error(f"Failed to get server capabilities: {capabilities}")
                 return None
+            # imaplibはログイン前のCAPABILITYしか保持しないため、認証後の一覧（IDLEなど）で置き換える
+            if capabilities and capabilities[0]:
+                mail.capabilities = tuple(capabilities[0].decode('ascii', errors='ignore').upper().split())
 
             app.logger.debug(f"Connected successfully to {settings.mail_server}")
 
             # メールボックスの選択
-            status, messages = mail.select('inbox')
+            status, messages = mail.select(INBOX_FOLDER)
             if status != 'OK':
                 app.logger.error(f"Failed to select inbox: {messages}")
                 return None
@@ -609,6 +563,9 @@ def connect_to_email_server(app, settings):
         return None
 
 
+# メールボックスごとの永続IMAP接続
+connection_pool = IMAPConnectionPool(connect_to_email_server)
+
 def update_lead_status_for_mass_email(lead, is_spam, reason, session, app):
     """Update lead status if email is determined to be mass mail"""
     try:
@@ -795,6 +752,16 @@ def get_fetch_window(tracker, app):
     last_fetch = tracker.last_fetch_time
     now = datetime.utcnow()
 
+    if app.config.get('EMAIL_CATCHUP_ENABLED', True):
+        # キャッチアップモードでは取得漏れを防ぐため上限日数まで遡り、古い分はバックログとして分割処理する
+        max_days = int(app.config.get('EMAIL_CATCHUP_MAX_DAYS', DEFAULT_CATCHUP_MAX_DAYS))
+        if now - last_fetch > timedelta(days=max_days):
+            app.logger.warning(
+                f"Last fetch was more than {max_days} days ago. Limiting catch-up to last {max_days} days."
+            )
+            return now - timedelta(days=max_days)
+        return last_fetch
+
     # 最後の取得から24時間以上経過している場合は24時間前からに制限
     if now - last_fetch > timedelta(hours=24):
         app.logger.warning(f"Last fetch was more than 24 hours ago. Limiting to last 24 hours.")
@@ -803,48 +770,49 @@ def get_fetch_window(tracker, app):
     return last_fetch
 
 
-def check_duplicate_email(message_id, sender, received_date, content, user_id, session, app):
+def check_duplicate_email(message_id, sender, received_date, subject, content, user_id, session, app):
     """
     Comprehensive duplicate check combining message_id, time-based, and content-based approaches
+
+    The content-based check is a single lookup on the indexed
+    (user_id, sender, content_hash) columns, so stored bodies are never
+    loaded or rehashed.
+
+    Returns:
+        tuple: (is_duplicate, content_hash)
     """
     try:
         if message_id:
-            # Message ID based check
-            existing = session.query(Email.id, Email.lead_id)\
-                .filter(Email.message_id == message_id)\
-                .first()
-
-            if existing:
-                app.logger.info(
-                    f"Found existing email with message_id: {message_id}, "
-                    f"lead_id: {existing.lead_id}"
-                )
+            # Message ID based check (DB lookup only on a cache hit)
+            with ingestion_metrics.time('duplicate_check', user_id):
+                is_known = known_message_ids.is_known(message_id, session)
+            if is_known:
+                app.logger.info(f"Found existing email with message_id: {message_id}")
                 return True, None
 
         # Generate content hash
-        content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()[:12]
+        content_hash = generate_content_hash(subject, content)
 
-        # Time-window based check with content comparison
+        # Time-window based check with content hash comparison
         time_window = timedelta(minutes=5)
-        existing_emails = session.query(Email)\
-            .filter(
-                Email.sender == sender,
-                Email.user_id == user_id,
-                Email.received_date.between(
-                    received_date - time_window,
-                    received_date + time_window
-                )
-            ).all()
+        with ingestion_metrics.time('duplicate_check', user_id):
+            existing = session.query(Email.id)\
+                .filter(
+                    Email.user_id == user_id,
+                    Email.sender == sender,
+                    Email.content_hash == content_hash,
+                    Email.received_date.between(
+                        received_date - time_window,
+                        received_date + time_window
+                    )
+                ).first()
 
-        # Check content hash for each potential duplicate
-        for email in existing_emails:
-            existing_hash = hashlib.sha256(email.content.encode('utf-8')).hexdigest()[:12]
-            if existing_hash == content_hash:
-                app.logger.info(
-                    f"Found content-based duplicate from {sender} "
-                    f"around {received_date}"
-                )
-                return True, content_hash
+        if existing:
+            app.logger.info(
+                f"Found content-based duplicate from {sender} "
+                f"around {received_date}"
+            )
+            return True, content_hash
 
         return False, content_hash
 
@@ -1001,6 +969,71 @@ def generate_content_hash(subject, content):
             datetime.utcnow().isoformat().encode('utf-8')
         ).hexdigest()[:12]
 
+def backfill_content_hashes(session, batch_size=1000):
+    """
+    Fill in content_hash for emails stored before the column existed
+
+    Args:
+        session: Database session; each batch is committed
+        batch_size: Number of rows hashed per batch
+
+    Returns:
+        int: Number of rows updated
+    """
+    table = Email.__table__
+    updated = 0
+    last_id = 0
+    while True:
+        rows = session.execute(
+            select(table.c.id, table.c.subject, table.c.content)
+            .where(table.c.content_hash.is_(None), table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return updated
+
+        session.execute(
+            update(table)
+            .where(table.c.id == bindparam('row_id'))
+            .values(content_hash=bindparam('hash')),
+            [{'row_id': row.id, 'hash': generate_content_hash(row.subject, row.content)} for row in rows]
+        )
+        session.commit()
+        updated += len(rows)
+        last_id = rows[-1].id
+
+def extract_message_fields(msg):
+    """
+    Decode the header and body fields stored for a message
+
+    Messages decoded by the MIME decoding pool carry their fields already
+    (msg.parsed_fields) and are returned as is.
+
+    Args:
+        msg: Email message object
+
+    Returns:
+        dict: message_id, sender_email, sender_name, received_date, subject,
+        content and content_hash
+    """
+    parsed_fields = getattr(msg, 'parsed_fields', None)
+    if parsed_fields is not None:
+        return parsed_fields
+
+    sender = clean_string(decode_email_header(msg['from']))
+    subject = clean_string(decode_email_header(msg['subject']))
+    content = clean_string(get_email_content(msg))
+    return {
+        'message_id': clean_string(msg.get('Message-ID', '')),
+        'sender_email': clean_string(extract_email_address(sender)),
+        'sender_name': clean_string(extract_sender_name(sender)),
+        'received_date': parse_email_date(msg.get('date')) or datetime.utcnow(),
+        'subject': subject,
+        'content': content,
+        'content_hash': generate_content_hash(subject, content)
+    }
+
 def process_email_message(msg, user_id, session, app, processed_ids=None):
     """
     Process a single email message with enhanced duplicate detection and validation
@@ -1017,13 +1050,13 @@ def process_email_message(msg, user_id, session, app, processed_ids=None):
     """
     try:
         # Basic information extraction
-        message_id = clean_string(msg.get('Message-ID', ''))
-        sender = clean_string(decode_email_header(msg['from']))
-        sender_email = clean_string(extract_email_address(sender))
-        sender_name = clean_string(extract_sender_name(sender))
-        received_date = parse_email_date(msg.get('date')) or datetime.utcnow()
-        subject = clean_string(decode_email_header(msg['subject']))
-        content = clean_string(get_email_content(msg))
+        fields = extract_message_fields(msg)
+        message_id = fields['message_id']
+        sender_email = fields['sender_email']
+        sender_name = fields['sender_name']
+        received_date = fields['received_date']
+        subject = fields['subject']
+        content = fields['content']
 
         # Skip if already processed
         if processed_ids is not None and message_id and message_id in processed_ids:
@@ -1037,6 +1070,7 @@ def process_email_message(msg, user_id, session, app, processed_ids=None):
                 message_id=message_id,
                 sender=sender_email,
                 received_date=received_date,
+                subject=subject,
                 content=content,
                 user_id=user_id,
                 session=session,
@@ -1090,6 +1124,7 @@ def process_email_message(msg, user_id, session, app, processed_ids=None):
                 sender_name=sender_name,
                 subject=subject,
                 content=content,
+                content_hash=content_hash,
                 lead_id=lead.id,
                 user_id=user_id,
                 received_date=received_date
@@ -1120,83 +1155,686 @@ def process_email_message(msg, user_id, session, app, processed_ids=None):
         app.logger.error(f"Error processing email: {str(e)}", exc_info=True)
         raise
 
-def process_emails_for_user(settings, parent_session, app):
+def to_naive_utc(value):
+    """Convert an aware datetime to naive UTC, as stored in DateTime columns"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def get_upsert_insert(session):
+    """Return the dialect's insert() supporting ON CONFLICT, or None if unsupported"""
+    dialect_name = session.get_bind().dialect.name
+    if dialect_name == 'postgresql':
+        return postgresql.insert
+    if dialect_name == 'sqlite':
+        return sqlite.insert
+    return None
+
+def ingest_email_batch(messages, user_id, session, app, processed_ids=None):
+    """
+    Store a window of parsed messages with set-based statements
+
+    Applies the same duplicate rules as process_email_message (in-run
+    Message-ID set, stored Message-IDs, content hash within five minutes
+    per sender) with one lookup per rule for the whole window. Leads are
+    resolved with one IN query plus one INSERT ... ON CONFLICT DO NOTHING,
+    emails are inserted with one multi-row INSERT ... ON CONFLICT
+    (message_id) DO NOTHING and analysis jobs with one more insert. Rows
+    skipped by a conflict were stored concurrently and count as duplicates.
+
+    Args:
+        messages: Parsed email message objects, in mailbox order
+        user_id: User ID from UserSettings
+        session: Database session (the caller commits)
+        app: Flask application instance
+        processed_ids: Set of already processed message IDs (optional)
+
+    Returns:
+        dict: 'processed', 'duplicates', 'spam' counts and the stored 'message_ids',
+        or None if the database does not support ON CONFLICT
+    """
+    upsert_insert = get_upsert_insert(session)
+    if upsert_insert is None:
+        return None
+
+    stats = {'processed': 0, 'duplicates': 0, 'spam': 0, 'message_ids': []}
+    time_window = timedelta(minutes=5)
+
+    # 基本情報の抽出とウィンドウ内の重複除外
+    candidates = []
+    seen_ids = set()
+    seen_hashes = {}
+    for msg in messages:
+        fields = extract_message_fields(msg)
+        message_id = fields['message_id']
+        sender_email = fields['sender_email']
+        received_date = fields['received_date']
+        content_hash = fields['content_hash']
+        received_utc = to_naive_utc(received_date)
+
+        if message_id and (message_id in seen_ids or (processed_ids is not None and message_id in processed_ids)):
+            stats['duplicates'] += 1
+            continue
+
+        dates = seen_hashes.setdefault((sender_email, content_hash), [])
+        if any(abs(received_utc - date) <= time_window for date in dates):
+            stats['duplicates'] += 1
+            continue
+
+        if message_id:
+            seen_ids.add(message_id)
+        dates.append(received_utc)
+        candidates.append({
+            'msg': msg,
+            'message_id': message_id,
+            'sender_email': sender_email,
+            'sender_name': fields['sender_name'],
+            'received_date': received_date,
+            'received_utc': received_utc,
+            'subject': fields['subject'],
+            'content': fields['content'],
+            'content_hash': content_hash
+        })
+
+    if not candidates:
+        return stats
+
+    with ingestion_metrics.time('duplicate_check', user_id):
+        # 保存済みMessage-IDの一括確認
+        known_ids = known_message_ids.filter_known(
+            {c['message_id'] for c in candidates if c['message_id']}, session
+        )
+        senders = sorted({c['sender_email'] for c in candidates})
+        content_hashes = sorted({c['content_hash'] for c in candidates})
+
+        # コンテンツハッシュによる重複の一括確認（インデックス付きの1クエリ）
+        rows = session.query(Email.sender, Email.content_hash, Email.received_date)\
+            .filter(
+                Email.user_id == user_id,
+                Email.sender.in_(senders),
+                Email.content_hash.in_(content_hashes),
+                Email.received_date.between(
+                    min(c['received_utc'] for c in candidates) - time_window,
+                    max(c['received_utc'] for c in candidates) + time_window
+                )
+            ).all()
+
+    stored_dates = {}
+    for row in rows:
+        stored_dates.setdefault((row.sender, row.content_hash), []).append(to_naive_utc(row.received_date))
+
+    new_messages = []
+    for c in candidates:
+        dates = stored_dates.get((c['sender_email'], c['content_hash']), [])
+        if c['message_id'] in known_ids or any(abs(c['received_utc'] - date) <= time_window for date in dates):
+            app.logger.info(f"Duplicate email detected from {c['sender_email']}")
+            stats['duplicates'] += 1
+            continue
+
+        if not c['message_id']:
+            c['message_id'] = generate_message_id(
+                msg=c['msg'],
+                sender_email=c['sender_email'],
+                received_date=c['received_date'],
+                content_hash=c['content_hash'],
+                app=app
+            )
+        new_messages.append(c)
+
+    if not new_messages:
+        return stats
+
+    # 送信者アドレスをリードに一括で解決し、未登録分はアップサートで作成する
+    sender_emails = {c['sender_email'] for c in new_messages}
+    leads = {
+        lead.email: lead
+        for lead in session.query(Lead)
+            .filter(Lead.user_id == user_id, Lead.email.in_(sorted(sender_emails)))
+            .all()
+    }
+
+    new_leads = {}
+    for c in new_messages:
+        if c['sender_email'] not in leads and c['sender_email'] not in new_leads:
+            new_leads[c['sender_email']] = {
+                'name': c['sender_name'] or c['sender_email'].split('@')[0],
+                'email': c['sender_email'],
+                'status': 'New',
+                'score': 0.0,
+                'user_id': user_id,
+                'last_contact': c['received_date']
+            }
+
+    if new_leads:
+        stmt = upsert_insert(Lead)\
+            .values(list(new_leads.values()))\
+            .on_conflict_do_nothing(index_elements=['user_id', 'email'])\
+            .returning(Lead)
+        created_leads = session.scalars(stmt).all()
+        for lead in created_leads:
+            leads[lead.email] = lead
+            app.logger.info(f"Created new lead for {lead.email}")
+        # 一括INSERTではマッパーイベントが発火しないため集計へ直接反映する
+        record_bulk_inserts(session.connection(), created_leads)
+
+        # 並行して作成されたリードのみ再取得する
+        missing = sender_emails - set(leads)
+        if missing:
+            for lead in session.query(Lead)\
+                    .filter(Lead.user_id == user_id, Lead.email.in_(sorted(missing)))\
+                    .all():
+                leads[lead.email] = lead
+
+    # 一斉配信判定（リードのスパム化は同一ウィンドウ内の後続メールにも反映する）
+    spam_leads = set()
+    for c in new_messages:
+        lead = leads.get(c['sender_email'])
+        if not lead or not lead.id:
+            raise ValueError(f"Failed to create/retrieve lead for {c['sender_email']}")
+        c['lead'] = lead
+
+        with ingestion_metrics.time('classify', user_id):
+            is_mass_mail, spam_reason = check_established_bulk_sender(c['msg'], user_id, session, app)
+            if not is_mass_mail:
+                is_mass_mail, spam_reason = is_mass_email(c['msg'], c['content'], app)
+        c['is_mass_mail'] = is_mass_mail
+        c['spam_reason'] = spam_reason
+
+        if is_mass_mail:
+            spam_leads.add(lead.id)
+            c['ai_analysis_status'] = 'skipped'
+        elif lead.status == 'Spam' or lead.id in spam_leads:
+            c['ai_analysis_status'] = 'skipped'
+        else:
+            c['ai_analysis_status'] = 'pending'
+
+    # メールを1つの複数行INSERTで登録する
+    now = datetime.utcnow()
+    stmt = upsert_insert(Email)\
+        .values([
+            {
+                'message_id': c['message_id'],
+                'sender': c['sender_email'],
+                'sender_name': c['sender_name'],
+                'subject': c['subject'],
+                'content': c['content'],
+                'content_hash': c['content_hash'],
+                'lead_id': c['lead'].id,
+                'user_id': user_id,
+                'received_date': c['received_date'],
+                'ai_analysis_status': c['ai_analysis_status'],
+                'created_at': now
+            }
+            for c in new_messages
+        ])\
+        .on_conflict_do_nothing(index_elements=['message_id'])\
+        .returning(Email.id, Email.message_id)
+    inserted = {row.message_id: row.id for row in session.execute(stmt)}
+
+    pending_ids = []
+    for c in new_messages:
+        email_id = inserted.get(c['message_id'])
+        if email_id is None:
+            # 並行して登録済みのメール
+            stats['duplicates'] += 1
+            continue
+
+        record_sender_verdict(c['msg'], user_id, c['is_mass_mail'], session, app)
+        if c['is_mass_mail']:
+            update_lead_status_for_mass_email(c['lead'], True, c['spam_reason'], session, app)
+            stats['spam'] += 1
+        elif c['ai_analysis_status'] == 'pending':
+            pending_ids.append(email_id)
+
+        if processed_ids is not None:
+            processed_ids.add(c['message_id'])
+        stats['message_ids'].append(c['message_id'])
+        stats['processed'] += 1
+
+    # AI分析はキューに登録し、取り込みトランザクションの外で実行する
+    enqueue_analysis_bulk(pending_ids, user_id, session)
+
+    app.logger.debug(
+        f"Bulk ingested {stats['processed']} emails for user {user_id}, "
+        f"duplicates: {stats['duplicates']}, spam: {stats['spam']}"
+    )
+    return stats
+
+def store_email_window(window, user_id, app, processed_ids):
+    """
+    Store a window of (uid, msg) pairs, falling back to per-message processing
+
+    The window is ingested in one transaction with ingest_email_batch. If that
+    fails (or the database has no ON CONFLICT support), nothing has been
+    committed and every message is retried on its own savepoint.
+
+    Returns:
+        dict: 'processed', 'duplicates', 'spam' and 'errors' counts
+    """
+    counts = {'processed': 0, 'duplicates': 0, 'spam': 0, 'errors': 0}
+    if not window:
+        return counts
+
+    try:
+        # フォールバック時に再処理できるよう、処理済みIDはコミット後に反映する
+        batch_ids = set(processed_ids)
+        with ingestion_metrics.time('db_write', user_id), session_scope(app) as batch_session:
+            stats = ingest_email_batch(
+                [msg for _, msg in window], user_id, batch_session, app, batch_ids
+            )
+
+        if stats is not None:
+            processed_ids.update(stats['message_ids'])
+            for message_id in stats['message_ids']:
+                known_message_ids.add(message_id)
+            for key in ('processed', 'duplicates', 'spam'):
+                counts[key] = stats[key]
+            return counts
+
+    except Exception as e:
+        app.logger.warning(
+            f"Bulk ingestion failed for user {user_id}, "
+            f"falling back to per-message processing: {str(e)}"
+        )
+
+    for uid, msg in window:
+        try:
+            with ingestion_metrics.time('db_write', user_id), session_scope(app) as processing_session:
+                result = process_email_message(
+                    msg=msg,
+                    user_id=user_id,
+                    session=processing_session,
+                    app=app,
+                    processed_ids=processed_ids
+                )
+
+                if not result:
+                    counts['duplicates'] += 1
+                    continue
+
+                email_record, lead = result
+                stored_message_id = email_record.message_id
+
+                if process_email_analysis(msg, email_record, lead, processing_session, app):
+                    counts['spam'] += 1
+
+                counts['processed'] += 1
+
+            known_message_ids.add(stored_message_id)
+
+        except Exception as e:
+            counts['errors'] += 1
+            app.logger.error(f"Error processing email UID {int(uid)}: {str(e)}", exc_info=True)
+
+    return counts
+
+def ingest_uid_batches(mail, message_uids, user_id, app, counts, processed_ids, deadline=None,
+                       seen_uid=None):
+    """
+    Prefilter, fetch and store messages in header-sized batches
+
+    Args:
+        mail: IMAP connection with INBOX selected
+        message_uids: UID bytestrings in ascending order
+        user_id: User ID from UserSettings
+        app: Flask application instance
+        counts: Dict of 'processed', 'duplicates', 'spam' and 'errors' counts, updated in place
+        processed_ids: Set of message IDs already stored in this run
+        deadline: Optional time.monotonic() value after which processing stops
+        seen_uid: Highest UID handled by earlier cycles (see prefilter_message_headers)
+
+    Returns:
+        tuple: (highest handled UID or None, timed_out). Every UID up to the
+        returned one has been stored, skipped or recorded as an error; it
+        stays below the first UID whose body could not be fetched.
+
+    Raises:
+        imaplib.IMAP4.abort, OSError: The connection failed
+    """
+    header_batch_size = max(1, int(app.config.get('EMAIL_HEADER_FETCH_BATCH', DEFAULT_HEADER_FETCH_BATCH)))
+    use_header_prefilter = app.config.get('EMAIL_HEADER_PREFILTER', True)
+    use_bulk_insert = app.config.get('EMAIL_BULK_INSERT', True)
+    bulk_window_size = max(1, int(app.config.get('EMAIL_BULK_INSERT_BATCH', DEFAULT_BULK_INSERT_BATCH)))
+    # ヘッダー・本文のデコードはプロセスプールで行い、このスレッドはDB書き込みのみ行う
+    parse_pool = get_mime_decoding_pool(app)
+
+    def add_counts(window_counts):
+        for key in ('processed', 'duplicates', 'spam', 'errors'):
+            counts[key] += window_counts[key]
+
+    highest_uid = None
+    first_unfetched_uid = None
+    timed_out = False
+    for batch_start in range(0, len(message_uids), header_batch_size):
+        uid_batch = message_uids[batch_start:batch_start + header_batch_size]
+        batch_uids = [int(uid) for uid in uid_batch]
+
+        if deadline is not None and time.monotonic() > deadline:
+            timed_out = True
+            break
+
+        # ヘッダーのみを一括取得し、重複・一斉配信メールを本文取得前に除外する
+        survivors = uid_batch
+        sizes = {}
+        if use_header_prefilter:
+            with ingestion_metrics.time('imap_fetch_headers', user_id):
+                headers = fetch_email_headers(mail, uid_batch, app)
+            if headers is not None:
+                with ingestion_metrics.time('prefilter', user_id), session_scope(app) as prefilter_session:
+                    survivors, sizes, skipped = prefilter_message_headers(
+                        headers, user_id, prefilter_session, app, seen_uid
+                    )
+                # ヘッダーを取得できなかったメッセージは本文の取得を試み、取得失敗として扱う
+                handled = {int(uid) for uid, _, _ in headers}
+                kept = {int(uid) for uid in survivors}
+                survivors = [uid for uid in uid_batch if int(uid) in kept or int(uid) not in handled]
+                counts['duplicates'] += skipped['duplicates']
+                counts['spam'] += skipped['spam']
+                counts['processed'] += skipped['spam']
+                # コミット後に既知のMessage-IDとして登録
+                processed_ids.update(skipped['message_ids'])
+                for message_id in skipped['message_ids']:
+                    known_message_ids.add(message_id)
+
+        window = []
+        for uid_bytes, msg in fetch_email_messages(mail, survivors, sizes, app, parse_pool, user_id):
+            uid = int(uid_bytes)
+            if deadline is not None and time.monotonic() > deadline:
+                timed_out = True
+                # このUIDより前のメッセージは処理済みまたは除外済み
+                highest_uid = max([u for u in batch_uids if u < uid] + [highest_uid or 0]) or None
+                break
+
+            if msg is None:
+                # 本文を取得できなかったメッセージは次回のサイクルで再取得する
+                counts['errors'] += 1
+                if first_unfetched_uid is None:
+                    first_unfetched_uid = uid
+                continue
+
+            if use_bulk_insert:
+                # 一定件数のメッセージをまとめて一括登録する
+                window.append((uid_bytes, msg))
+                if len(window) >= bulk_window_size:
+                    add_counts(store_email_window(window, user_id, app, processed_ids))
+                    highest_uid = max(highest_uid or 0, uid)
+                    window = []
+                continue
+
+            try:
+                with ingestion_metrics.time('db_write', user_id), session_scope(app) as processing_session:
+                    result = process_email_message(
+                        msg=msg,
+                        user_id=user_id,
+                        session=processing_session,
+                        app=app,
+                        processed_ids=processed_ids
+                    )
+
+                    if not result:
+                        counts['duplicates'] += 1
+                        continue
+
+                    email_record, lead = result
+                    stored_message_id = email_record.message_id
+
+                    is_spam = process_email_analysis(msg, email_record, lead, processing_session, app)
+                    if is_spam:
+                        counts['spam'] += 1
+
+                    counts['processed'] += 1
+
+                # コミット後に既知のMessage-IDとして登録
+                known_message_ids.add(stored_message_id)
+
+            except Exception as e:
+                counts['errors'] += 1
+                app.logger.error(f"Error processing email UID {uid}: {str(e)}", exc_info=True)
+
+            finally:
+                highest_uid = max(highest_uid or 0, uid)
+
+        if window:
+            add_counts(store_email_window(window, user_id, app, processed_ids))
+            highest_uid = max(highest_uid or 0, max(int(uid) for uid, _ in window))
+
+        # コミット済みの分析ジョブをワーカーに通知
+        if counts['processed']:
+            notify_analysis_workers()
+
+        if timed_out:
+            break
+
+        highest_uid = max(highest_uid or 0, max(batch_uids))
+
+    if first_unfetched_uid is not None and highest_uid is not None and highest_uid >= first_unfetched_uid:
+        # 取得できなかったUIDをチェックポイントが越えないようにする
+        highest_uid = first_unfetched_uid - 1 or None
+    return highest_uid, timed_out
+
+def split_catchup_backlog(message_uids, app):
+    """
+    Split a large set of new UIDs into the newest messages and a backlog range
+
+    Returns:
+        tuple: (UIDs to process now, (backlog_next_uid, backlog_end_uid) or None)
+    """
+    if not app.config.get('EMAIL_CATCHUP_ENABLED', True):
+        return message_uids, None
+
+    live_limit = max(1, int(app.config.get('EMAIL_CATCHUP_LIVE_LIMIT', DEFAULT_CATCHUP_LIVE_LIMIT)))
+    if len(message_uids) <= live_limit:
+        return message_uids, None
+
+    # 新着メールを先に処理し、古いメールはUID範囲としてチェックポイントに残す
+    live = message_uids[-live_limit:]
+    return live, (int(message_uids[0]), int(message_uids[-live_limit - 1]))
+
+def merge_backlog_range(current, new_range):
+    """Merge a new backlog range into the tracker's (next, end) range"""
+    if not new_range:
+        return current
+    if not current or current[0] is None or current[1] is None or current[0] > current[1]:
+        return new_range
+    # 範囲間の処理済みUIDはヘッダー段階の重複除外でスキップされる
+    return min(current[0], new_range[0]), max(current[1], new_range[1])
+
+def drain_catchup_backlog(mail, tracker_id, backlog, user_id, app, counts, processed_ids, deadline=None):
+    """
+    Process the catch-up backlog in UID chunks, checkpointing after each chunk
+
+    Each chunk searches at most EMAIL_CATCHUP_CHUNK_SIZE consecutive UIDs, so
+    memory stays bounded regardless of the gap, and at most
+    EMAIL_CATCHUP_CHUNKS_PER_CYCLE chunks run per cycle so new mail keeps
+    its regular polling interval.
+
+    Args:
+        backlog: (backlog_next_uid, backlog_end_uid)
+
+    Returns:
+        tuple: Remaining (backlog_next_uid, backlog_end_uid), or (None, None) when drained
+    """
+    next_uid, end_uid = backlog
+    chunk_size = max(1, int(app.config.get('EMAIL_CATCHUP_CHUNK_SIZE', DEFAULT_CATCHUP_CHUNK_SIZE)))
+    max_chunks = max(1, int(app.config.get('EMAIL_CATCHUP_CHUNKS_PER_CYCLE', DEFAULT_CATCHUP_CHUNKS_PER_CYCLE)))
+
+    for _ in range(max_chunks):
+        if next_uid > end_uid:
+            break
+        if deadline is not None and time.monotonic() > deadline:
+            break
+
+        chunk_end = min(next_uid + chunk_size - 1, end_uid)
+        with ingestion_metrics.time('imap_search', user_id):
+            chunk_uids = search_uid_range(mail, next_uid, chunk_end, app)
+        if chunk_uids is None:
+            break
+
+        highest_uid, timed_out = ingest_uid_batches(
+            mail, chunk_uids, user_id, app, counts, processed_ids, deadline
+        )
+        # 取得できなかったUIDがあれば、そこから次回に再開する
+        completed = not timed_out and (not chunk_uids or highest_uid == int(chunk_uids[-1]))
+        if completed:
+            next_uid = chunk_end + 1
+        elif highest_uid:
+            next_uid = max(next_uid, highest_uid + 1)
+
+        save_fetch_checkpoint(
+            app, tracker_id,
+            backlog_next_uid=next_uid if next_uid <= end_uid else None,
+            backlog_end_uid=end_uid if next_uid <= end_uid else None
+        )
+        if not completed:
+            break
+
+    if next_uid > end_uid:
+        app.logger.info(f"Catch-up backlog drained for user {user_id}")
+        return None, None
+
+    app.logger.info(
+        f"Catch-up backlog for user {user_id}: UIDs {next_uid}-{end_uid} remaining"
+    )
+    return next_uid, end_uid
+
+def process_emails_for_user(settings, parent_session, app, deadline=None):
     """
     Process emails for a user with comprehensive error handling and session management.
+
+    New mail is processed first. When more new UIDs are found than
+    EMAIL_CATCHUP_LIVE_LIMIT (e.g. after an outage), the older ones are kept
+    as a UID backlog range on the fetch tracker and drained in bounded
+    chunks over the following cycles.
+
+    Args:
+        settings: UserSettings object for the mailbox
+        parent_session: Database session owning the settings object
+        app: Flask application instance
+        deadline: Optional time.monotonic() value after which processing stops
     """
-    mail = None
     processed_messages = set()
-    processed_count = 0
-    error_count = 0
-    duplicate_count = 0
-    spam_count = 0
-    max_retries = RETRY_MAX_ATTEMPTS
+    counts = {'processed': 0, 'duplicates': 0, 'spam': 0, 'errors': 0}
+    user_id = None
+    started = time.perf_counter()
 
     try:
         current_settings = parent_session.merge(settings)
+        settings_id = current_settings.id
         user_id = current_settings.user_id
 
         with session_scope(app) as tracker_session:
-            tracker = tracker_session.query(EmailFetchTracker).filter_by(user_id=user_id).with_for_update().first()
+            tracker = tracker_session.query(EmailFetchTracker)\
+                .filter_by(user_id=user_id, folder=INBOX_FOLDER)\
+                .first()
             last_fetch_time = get_fetch_window(tracker, app)
 
             if not tracker:
-                tracker = EmailFetchTracker(user_id=user_id, last_fetch_time=last_fetch_time)
+                tracker = EmailFetchTracker(
+                    user_id=user_id,
+                    folder=INBOX_FOLDER,
+                    last_fetch_time=last_fetch_time
+                )
                 tracker_session.add(tracker)
-                tracker_session.commit()
+                tracker_session.flush()
                 app.logger.info(f"Created new fetch tracker for user {user_id}")
 
-            mail = connect_to_email_server_with_retry(app, current_settings, max_retries)
+            tracker_id = tracker.id
+            known_uid_validity = tracker.uid_validity
+            last_seen_uid = tracker.last_seen_uid
+            checkpoint_uid = last_seen_uid
+            backlog = (tracker.backlog_next_uid, tracker.backlog_end_uid)
+
+        # トラッカーのコミットで期限切れになった設定を再読み込みする
+        current_settings = parent_session.get(UserSettings, settings_id)
+
+        with connection_pool.connection(app, current_settings, INBOX_FOLDER) as mail:
             if not mail:
                 return
 
-            message_numbers = search_emails(mail, last_fetch_time, app)
-            if not message_numbers:
-                return
+            with ingestion_metrics.time('imap_search', user_id):
+                uid_validity, uid_next = get_mailbox_uid_state(mail, app)
 
-            for num_bytes in message_numbers:  # バイト文字列を反復処理します
-                try:
-                    num_str = num_bytes.decode('ascii')  # ログ記録や整数変換に必要な場合のみデコードします
-                    num = int(num_str)  # 整数表現が必要な場合
-                    msg = fetch_email_message(mail, num_bytes, app) # バイト文字列を直接渡します
-                    if not msg:
-                        continue
-
-                    with session_scope(app) as processing_session:
-                        result = process_email_message(
-                            msg=msg,
-                            user_id=user_id,
-                            session=processing_session,
-                            app=app,
-                            processed_ids=processed_messages
+                if uid_validity is not None and uid_validity == known_uid_validity and last_seen_uid:
+                    # 差分同期: 前回の最大UID以降のメッセージのみ取得
+                    message_uids = search_new_uids(mail, last_seen_uid, app)
+                else:
+                    if known_uid_validity is not None and uid_validity != known_uid_validity:
+                        app.logger.warning(
+                            f"UIDVALIDITY changed for user {user_id} "
+                            f"({known_uid_validity} -> {uid_validity}), resyncing by date"
                         )
+                    # UIDが変わった場合、以前のバックログ範囲は無効
+                    backlog = (None, None)
+                    last_seen_uid = None
+                    message_uids = search_emails(mail, last_fetch_time, app)
 
-                        if not result:
-                            duplicate_count += 1
-                            continue
-
-                        email_record, lead = result
-
-                        is_spam = process_email_analysis(msg, email_record, lead, processing_session, app)
-                        if is_spam:
-                           spam_count += 1
-
-                        processed_count += 1
+            if message_uids is None:
+                # 検索失敗を新着なしとして扱うと、UIDのチェックポイントが未取得のメールを越えてしまう
+                app.logger.warning(
+                    f"Mailbox search failed for user {user_id}, keeping the checkpoint for the next cycle"
+                )
+                counts['errors'] += 1
+                return
 
-                except Exception as e:
-                    error_count += 1
-                    app.logger.error(f"Error processing email {num_bytes.decode()}: {str(e)}", exc_info=True) # Decode num_bytes for logging
+            message_uids, new_backlog = split_catchup_backlog(message_uids, app)
+            if new_backlog:
+                backlog = merge_backlog_range(backlog, new_backlog)
+                app.logger.warning(
+                    f"Catch-up mode for user {user_id}: processing the newest "
+                    f"{len(message_uids)} messages first, UIDs {backlog[0]}-{backlog[1]} queued"
+                )
 
+            highest_uid = last_seen_uid
+            timed_out = False
+            fetch_incomplete = False
+            if message_uids:
+                # 日付検索ではチェックポイント以下のUIDも再走査されるため、UIDVALIDITYが同じなら境界として渡す
+                seen_uid = checkpoint_uid if uid_validity == known_uid_validity else None
+                batch_highest, timed_out = ingest_uid_batches(
+                    mail, message_uids, user_id, app, counts, processed_messages, deadline,
+                    seen_uid=seen_uid
+                )
+                if batch_highest:
+                    highest_uid = max(highest_uid or 0, batch_highest)
+                fetch_incomplete = not timed_out and batch_highest != int(message_uids[-1])
+            elif last_seen_uid is None and uid_next:
+                # 新着なし: UIDNEXTから最大UIDを確定し、次回以降は差分同期を行う
+                highest_uid = uid_next - 1
+
+            if timed_out:
+                app.logger.warning(
+                    f"Mailbox timeout reached for user {user_id}, "
+                    f"remaining messages will be processed in the next cycle"
+                )
 
-            tracker.last_fetch_time = datetime.utcnow()
-            tracker_session.commit()
+            # タイムアウト時もUIDは処理済みの位置まで進め、取得時刻は次回サイクルで更新する
+            backlog_active = backlog[0] is not None and backlog[1] is not None and backlog[0] <= backlog[1]
+            checkpoint = {
+                'uid_validity': uid_validity,
+                'last_seen_uid': highest_uid,
+                'backlog_next_uid': backlog[0] if backlog_active else None,
+                'backlog_end_uid': backlog[1] if backlog_active else None,
+            }
+            if not timed_out and not fetch_incomplete:
+                # 取得できなかったメールが日付検索の範囲から外れないよう、その場合は取得時刻を進めない
+                checkpoint['last_fetch_time'] = datetime.utcnow()
+            save_fetch_checkpoint(app, tracker_id, **checkpoint)
+
+            # 新着の処理が完了した後、残り時間でバックログを処理する
+            if backlog_active and not timed_out:
+                backlog = drain_catchup_backlog(
+                    mail, tracker_id, backlog, user_id, app,
+                    counts, processed_messages, deadline
+                )
 
             app.logger.info(
                 f"Completed processing for user {user_id}. "
-                f"Processed: {processed_count}, "
-                f"Duplicates: {duplicate_count}, "
-                f"Spam: {spam_count}, "
-                f"Errors: {error_count}"
+                f"Processed: {counts['processed']}, "
+                f"Duplicates: {counts['duplicates']}, "
+                f"Spam: {counts['spam']}, "
+                f"Errors: {counts['errors']}, "
+                f"Last seen UID: {highest_uid}"
+                + (f", Backlog: {backlog[0]}-{backlog[1]}" if backlog[0] is not None else "")
             )
 
     except Exception as e:
@@ -1204,39 +1842,19 @@ def process_emails_for_user(settings, parent_session, app):
         raise
 
     finally:
-        if mail:
-            try:
-                mail.close()
-                mail.logout()
-            except Exception as e:
-                app.logger.warning(f"Error closing mail connection: {str(e)}")
-
-def connect_to_email_server_with_retry(app, settings, max_retries):
-    """Separate function for email server connection with retry logic"""
-    retry_count = 0
-    while retry_count < max_retries:
-        try:
-            mail = connect_to_email_server(app, settings)
-            if mail:
-                app.logger.debug(f"Successfully connected to email server for user {settings.id}")
-                return mail
-        except Exception as e:
-            app.logger.error(f"Connection attempt {retry_count + 1} failed: {str(e)}")
-
-        retry_count += 1
-        if retry_count < max_retries:
-            sleep_time = RETRY_BASE_DELAY * (2 ** retry_count)
-            time.sleep(sleep_time)
-
-    app.logger.error(f"Failed to connect after {max_retries} attempts")
-    return None
-
-def fetch_email_message(mail, num_bytes, app):
-    """提供されたバイト文字列を使用してメールメッセージを取得します。"""
+        if user_id is not None:
+            ingestion_metrics.observe('mailbox_total', user_id, time.perf_counter() - started)
+            ingestion_metrics.inc('processed', user_id, counts['processed'])
+            ingestion_metrics.inc('duplicate', user_id, counts['duplicates'])
+            ingestion_metrics.inc('spam', user_id, counts['spam'])
+            ingestion_metrics.inc('error', user_id, counts['errors'])
+
+def fetch_email_message(mail, uid_bytes, app):
+    """UIDを指定してメールメッセージを取得します。"""
     try:
-        _, msg_data = mail.fetch(num_bytes, '(RFC822)') # ここで num_bytes はバイトである必要があります
-        if not (msg_data and msg_data[0] and msg_data[0][1]):
-            app.logger.warning(f"Invalid message data for message {num}")
+        _, msg_data = mail.uid('fetch', uid_bytes, '(RFC822)')
+        if not (msg_data and msg_data[0] and isinstance(msg_data[0], tuple) and msg_data[0][1]):
+            app.logger.warning(f"Invalid message data for UID {uid_bytes!r}")
             return None
 
         email_body = msg_data[0][1]
@@ -1244,31 +1862,398 @@ def fetch_email_message(mail, num_bytes, app):
             app.logger.error(f"Unexpected type for email_body: {type(email_body)}. Skipping.")
             return None
 
-        return message_from_bytes(email_body)
+        return parse_email_body(email_body, app)
 
     except Exception as e:
-        app.logger.error(f"Error fetching message {num}: {str(e)}", exc_info=True)
+        app.logger.error(f"Error fetching message UID {uid_bytes!r}: {str(e)}", exc_info=True)
         return None
 
+def parse_email_body(raw, app):
+    """
+    Parse a raw RFC822 message
+
+    With EMAIL_STREAMING_PARSER enabled the message is streamed through
+    BytesFeedParser, attachment payloads are dropped (only their metadata
+    is kept) and text parts are capped at EMAIL_MAX_TEXT_PART_BYTES.
+    """
+    if not app.config.get('EMAIL_STREAMING_PARSER', True):
+        return message_from_bytes(raw)
+
+    msg = parse_message_streaming(
+        raw,
+        max_text_bytes=int(app.config.get('EMAIL_MAX_TEXT_PART_BYTES', DEFAULT_MAX_TEXT_PART_BYTES))
+    )
+    if msg.skipped_attachments:
+        app.logger.debug(
+            "Skipped attachments: " + ", ".join(
+                f"{a['filename'] or '(no name)'} ({a['content_type']}, {a['size']} bytes)"
+                for a in msg.skipped_attachments
+            )
+        )
+    return msg
+
+def decode_fetched_message(raw, app):
+    """Parse a fetched message and decode its stored fields up front"""
+    msg = parse_email_body(raw, app)
+    try:
+        msg.parsed_fields = extract_message_fields(msg)
+    except Exception as e:
+        # デコードは保存時に再試行され、失敗はそのメッセージのエラーとして記録される
+        app.logger.warning(f"Error decoding message fields: {str(e)}")
+    return msg
+
+def parse_fetch_response(data):
+    """
+    Parse an imaplib UID FETCH response into per-message entries
+
+    Args:
+        data: Response data list returned by mail.uid('fetch', ...)
+
+    Returns:
+        list: Dicts with 'uid', 'size' and 'literal' (bytes or None)
+    """
+    entries = []
+    current = None
+    for item in data or []:
+        if isinstance(item, tuple):
+            current = {
+                'meta': item[0].decode('ascii', errors='ignore'),
+                'literal': item[1]
+            }
+            entries.append(current)
+        elif isinstance(item, bytes):
+            text = item.decode('ascii', errors='ignore')
+            if re.match(r'^\d+ \(', text):
+                # リテラルを含まない応答（NILなど）
+                current = {'meta': text, 'literal': None}
+                entries.append(current)
+            elif current is not None:
+                # リテラルの後に続く属性（例: " RFC822.SIZE 1234)"）
+                current['meta'] += ' ' + text
+
+    parsed = []
+    for entry in entries:
+        uid_match = re.search(r'UID (\d+)', entry['meta'])
+        if not uid_match:
+            continue
+        size_match = re.search(r'RFC822\.SIZE (\d+)', entry['meta'])
+        parsed.append({
+            'uid': int(uid_match.group(1)),
+            'size': int(size_match.group(1)) if size_match else None,
+            'literal': entry['literal']
+        })
+    return parsed
+
+def fetch_email_headers(mail, uids, app):
+    """
+    Fetch headers and sizes for a set of UIDs with a single UID FETCH command
+
+    Args:
+        mail: IMAP connection
+        uids: List of UID bytestrings
+        app: Flask app object
+
+    Returns:
+        list: (uid_bytes, size, header_message) tuples, or None if the fetch failed
+    """
+    if not uids:
+        return []
+
+    try:
+        status, data = mail.uid('fetch', b','.join(uids), '(UID RFC822.SIZE BODY.PEEK[HEADER])')
+        if status != 'OK':
+            app.logger.warning(f"Header fetch failed: {status}")
+            return None
+
+        headers = []
+        for entry in parse_fetch_response(data):
+            if not entry['literal']:
+                continue
+            headers.append((
+                str(entry['uid']).encode('ascii'),
+                entry['size'],
+                message_from_bytes(entry['literal'])
+            ))
+
+        app.logger.debug(f"Fetched headers for {len(headers)} of {len(uids)} messages")
+        return headers
+
+    except (imaplib.IMAP4.abort, OSError):
+        # 接続エラーは呼び出し元に伝え、プールに接続を破棄させる
+        raise
+    except Exception as e:
+        app.logger.error(f"Error fetching message headers: {str(e)}", exc_info=True)
+        return None
+
+def fetch_email_messages(mail, uids, sizes, app, parse_pool=None, user_id=None):
+    """
+    Fetch full messages in batches bounded by message count and total size
+
+    Args:
+        mail: IMAP connection
+        uids: List of UID bytestrings to fetch
+        sizes: Dict of UID bytestring -> RFC822.SIZE (optional entries)
+        app: Flask app object
+        parse_pool: Optional MIME decoding pool; each fetched batch is then
+            decoded in worker processes and headers-only messages carrying
+            parsed_fields are yielded
+        user_id: User ID used to label the fetch/parse timings
+
+    Yields:
+        tuple: (uid_bytes, email.message.Message) in UID order. The message is
+        None when its body could not be fetched, so the caller can keep the
+        UID checkpoint below it.
+
+    Raises:
+        imaplib.IMAP4.abort, OSError: The connection failed; the pool then
+        drops it
+    """
+    batch_size = max(1, int(app.config.get('EMAIL_BODY_FETCH_BATCH', DEFAULT_BODY_FETCH_BATCH)))
+    max_bytes = int(app.config.get('EMAIL_BODY_FETCH_MAX_BYTES', DEFAULT_BODY_FETCH_MAX_BYTES))
+
+    batches = []
+    batch = []
+    batch_bytes = 0
+    for uid in uids:
+        size = sizes.get(uid) or 0
+        if batch and (len(batch) >= batch_size or batch_bytes + size > max_bytes):
+            batches.append(batch)
+            batch = []
+            batch_bytes = 0
+        batch.append(uid)
+        batch_bytes += size
+    if batch:
+        batches.append(batch)
+
+    for batch in batches:
+        try:
+            with ingestion_metrics.time('imap_fetch_bodies', user_id):
+                status, data = mail.uid('fetch', b','.join(batch), '(UID RFC822)')
+            if status != 'OK':
+                app.logger.warning(f"Body fetch failed for {len(batch)} messages: {status}")
+                bodies = {}
+            else:
+                bodies = {
+                    entry['uid']: entry['literal']
+                    for entry in parse_fetch_response(data)
+                    if isinstance(entry['literal'], bytes)
+                }
+            del data
+
+        except (imaplib.IMAP4.abort, OSError):
+            # 接続エラーは呼び出し元に伝え、プールに接続を破棄させる
+            raise
+        except Exception as e:
+            app.logger.error(f"Error fetching message bodies: {str(e)}", exc_info=True)
+            bodies = {}
+
+        if parse_pool is not None:
+            pending = []
+            for uid in batch:
+                body = bodies.pop(int(uid), None)
+                if not body:
+                    app.logger.warning(f"Invalid message data for UID {uid!r}")
+                pending.append((uid, body))
+
+            position = 0
+            try:
+                # 待ち時間（ワーカーでの解析時間）を解析ステージとして計測する
+                decoded = decode_messages(parse_pool, [entry for entry in pending if entry[1]], app)
+                for position, (uid, body) in enumerate(pending):
+                    if not body:
+                        # 本文を取得できなかったメッセージもUID順に通知する
+                        yield uid, None
+                        continue
+                    with ingestion_metrics.time('parse', user_id):
+                        _, msg = next(decoded)
+                    if msg is None:
+                        # ワーカーで解析できなかったメッセージはこのスレッドで再解析し、
+                        # 失敗した場合もインライン解析と同様にエラーとして記録させる
+                        with ingestion_metrics.time('parse', user_id):
+                            msg = decode_fetched_message(body, app)
+                    yield uid, msg
+            except (BrokenProcessPool, RuntimeError) as e:
+                # プールが利用できない場合は残りをこのスレッドで解析する
+                app.logger.warning(f"MIME decoding pool failed, decoding inline: {str(e)}")
+                parse_pool = None
+                for uid, body in pending[position:]:
+                    if not body:
+                        yield uid, None
+                        continue
+                    with ingestion_metrics.time('parse', user_id):
+                        msg = decode_fetched_message(body, app)
+                    yield uid, msg
+            del pending
+            continue
+
+        for uid in batch:
+            # 解析済みの生データは保持しない
+            body = bodies.pop(int(uid), None)
+            if not body:
+                app.logger.warning(f"Invalid message data for UID {uid!r}")
+                yield uid, None
+                continue
+            with ingestion_metrics.time('parse', user_id):
+                msg = decode_fetched_message(body, app)
+            del body
+            yield uid, msg
+
+def prefilter_message_headers(headers, user_id, session, app, seen_uid=None):
+    """
+    Drop duplicates and mass mail using headers only, before bodies are fetched
+
+    The header-only mass mail score is a lower bound of the full score (only the
+    unsubscribe phrase check needs the body), so a header-only hit is final.
+    Mass mail is still stored as a body-less Email row (status 'skipped') so the
+    lead keeps its message history and later scans see it as a duplicate.
+
+    Args:
+        headers: (uid_bytes, size, header_message) tuples from fetch_email_headers
+        user_id: User ID from UserSettings
+        session: Database session
+        app: Flask app object
+        seen_uid: Highest UID handled by earlier cycles; sender verdicts are
+            only recorded for UIDs above it
+
+    Returns:
+        tuple: (survivor UIDs, {uid: size}, {'duplicates': n, 'spam': n,
+        'message_ids': Message-IDs of the stored rows})
+    """
+    stats = {'duplicates': 0, 'spam': 0, 'message_ids': []}
+    survivors = []
+    sizes = {}
+
+    # Message-IDのないメッセージも、保存時と同じ決定的なIDで重複を判定する
+    header_ids = [header_message_id(header_msg) for _, _, header_msg in headers]
+
+    existing_ids = set()
+    if header_ids:
+        existing_ids = known_message_ids.filter_known(set(header_ids), session)
+
+    for (uid, size, header_msg), message_id in zip(headers, header_ids):
+        if message_id in existing_ids:
+            stats['duplicates'] += 1
+            continue
+
+        # 一斉配信の実績がある送信元ドメインは判定を省略する
+        is_spam, reason = check_established_bulk_sender(header_msg, user_id, session, app)
+        if not is_spam:
+            is_spam, reason = is_mass_email(header_msg, None, app)
+        if is_spam:
+            try:
+                stored_message_id = mark_sender_as_mass_mail(
+                    header_msg, user_id, reason, session, app, message_id
+                )
+                # 日付検索で同じUIDを再走査した場合に判定を二重に数えない
+                if seen_uid is None or int(uid) > seen_uid:
+                    record_sender_verdict(header_msg, user_id, True, session, app)
+                stats['message_ids'].append(stored_message_id)
+                stats['spam'] += 1
+                continue
+            except Exception as e:
+                app.logger.warning(
+                    f"Header prefilter could not mark sender of UID {uid!r}: {str(e)}"
+                )
+
+        survivors.append(uid)
+        if size:
+            sizes[uid] = size
+
+    app.logger.debug(
+        f"Header prefilter - Survivors: {len(survivors)}, "
+        f"Duplicates: {stats['duplicates']}, Spam: {stats['spam']}"
+    )
+    return survivors, sizes, stats
+
+def header_message_id(header_msg):
+    """
+    Return the Message-ID of a header-only message, or a deterministic substitute
+
+    Messages without a Message-ID get an ID hashed from all of their headers,
+    so a rescan of the same message maps to the same stored row.
+    """
+    message_id = clean_string(header_msg.get('Message-ID', ''))
+    if message_id:
+        return message_id
+
+    raw_headers = '\n'.join(f"{name}: {value}" for name, value in header_msg.items())
+    header_hash = hashlib.sha256(raw_headers.encode('utf-8', errors='replace')).hexdigest()[:32]
+    return f"<headers-{header_hash}@generated.local>"
+
+def mark_sender_as_mass_mail(header_msg, user_id, reason, session, app, message_id=None):
+    """
+    Store a message dropped by the header prefilter and mark its sender's lead as Spam
+
+    The body is not fetched, so the Email row keeps the header fields only and
+    is skipped by AI analysis.
+
+    Returns:
+        str: Message-ID of the stored row
+    """
+    message_id = message_id or header_message_id(header_msg)
+    sender = clean_string(decode_email_header(header_msg['from']))
+    sender_email = clean_string(extract_email_address(sender))
+    if not sender_email:
+        raise ValueError("Sender address not found in headers")
+    sender_name = clean_string(extract_sender_name(sender))
+    subject = clean_string(decode_email_header(header_msg['subject']))
+    received_date = parse_email_date(header_msg.get('date')) or datetime.utcnow()
+
+    with session.begin_nested():
+        lead = session.query(Lead)\
+            .filter_by(email=sender_email, user_id=user_id)\
+            .first()
+
+        if not lead:
+            lead = Lead(
+                name=sender_name or sender_email.split('@')[0],
+                email=sender_email,
+                status='New',
+                score=0.0,
+                user_id=user_id,
+                last_contact=received_date
+            )
+            session.add(lead)
+            session.flush()
+            app.logger.info(f"Created new lead for {sender_email}")
+
+        session.add(Email(
+            message_id=message_id,
+            sender=sender_email,
+            sender_name=sender_name,
+            subject=subject,
+            content='',
+            content_hash=generate_content_hash(subject, ''),
+            lead_id=lead.id,
+            user_id=user_id,
+            received_date=received_date,
+            ai_analysis_status='skipped'
+        ))
+        session.flush()
+
+        update_lead_status_for_mass_email(lead, True, reason, session, app)
+
+    return message_id
+
 def process_email_analysis(msg, email_record, lead, session, app):
-    """Separate function for handling spam check and AI analysis"""
+    """Separate function for handling spam check and queueing AI analysis"""
     try:
-        is_mass_mail, spam_reason = is_mass_email(msg, email_record.content, app)
+        with ingestion_metrics.time('classify', lead.user_id):
+            is_mass_mail, spam_reason = check_established_bulk_sender(msg, lead.user_id, session, app)
+            if not is_mass_mail:
+                is_mass_mail, spam_reason = is_mass_email(msg, email_record.content, app)
+        record_sender_verdict(msg, lead.user_id, is_mass_mail, session, app)
+
         if is_mass_mail:
             update_lead_status_for_mass_email(lead, is_mass_mail, spam_reason, session, app)
+            email_record.ai_analysis_status = 'skipped'
             return True
 
-        if lead.status != 'Spam':
-            ai_response = analyze_email(
-                email_record.subject,
-                email_record.content,
-                lead.user_id
-            )
-            if ai_response:
-                email_record.ai_analysis = ai_response
-                email_record.ai_analysis_date = datetime.utcnow()
-                email_record.ai_model_used = "claude-3-haiku-20240307"
-                process_ai_response(ai_response, email_record, app)
+        if lead.status == 'Spam':
+            email_record.ai_analysis_status = 'skipped'
+        else:
+            # AI分析はキューに登録し、取り込みトランザクションの外で実行する
+            enqueue_analysis(email_record, session)
 
         return False
 
@@ -1590,6 +2575,14 @@ def parse_email_date(date_str):
 def setup_email_scheduler(app):
     """
     Setup scheduler for periodic email checking with improved error handling and monitoring
+
+    The scheduler runs in every process that calls this, but the ingestion
+    jobs (polling, IDLE watchers, analysis queue) only run in the process
+    holding the scheduler lease, so several web workers never poll the same
+    mailboxes.
+
+    Returns:
+        BackgroundScheduler: The started scheduler
     """
     scheduler = BackgroundScheduler()
 
@@ -1597,6 +2590,12 @@ def setup_email_scheduler(app):
         """Run initial email check with error handling"""
         try:
             with app.app_context():
+                try:
+                    with session_scope(app) as session:
+                        warm_message_id_cache(app, session)
+                except Exception as e:
+                    app.logger.error(f"Failed to warm Message-ID cache: {str(e)}", exc_info=True)
+
                 app.logger.info("Running initial email check on startup")
                 check_emails_task(app)
         except Exception as e:
@@ -1626,13 +2625,51 @@ def setup_email_scheduler(app):
 
     def email_check_wrapper():
         """Wrapper for email check task with error handling"""
+        if not is_ingestion_leader():
+            return
         try:
             with app.app_context():
                 check_emails_task(app)
         except Exception as e:
             app.logger.error(f"Scheduled email check failed: {str(e)}", exc_info=True)
 
+    def connection_keepalive():
+        """Keep pooled IMAP connections alive between email checks"""
+        if not is_ingestion_leader():
+            return
+        try:
+            connection_pool.keepalive(app)
+        except Exception as e:
+            app.logger.error(f"IMAP keepalive failed: {str(e)}", exc_info=True)
+
+    def on_elected():
+        """Start the ingestion jobs once this process holds the lease"""
+        # 初回チェックの実行
+        Thread(
+            target=run_initial_check,
+            name="InitialEmailCheck",
+            daemon=True
+        ).start()
+
+        # IDLEモード（プッシュ受信）の開始
+        if app.config.get('EMAIL_IDLE_ENABLED'):
+            start_idle_watchers(app)
+
+        # AI分析キューのワーカー起動
+        start_analysis_worker(app)
+
+    def on_demoted():
+        """Stop the ingestion jobs after the lease has been lost"""
+        stop_idle_watchers()
+        stop_analysis_worker()
+        connection_pool.close_all()
+
     try:
+        keepalive_interval = app.config.get('EMAIL_KEEPALIVE_INTERVAL')
+        if keepalive_interval:
+            connection_pool.keepalive_interval = keepalive_interval
+
+
         # スケジューラーの設定
         scheduler.add_job(
             email_check_wrapper,
@@ -1652,25 +2689,119 @@ def setup_email_scheduler(app):
             id='scheduler_monitor'
         )
 
+        # 永続IMAP接続のキープアライブ
+        scheduler.add_job(
+            connection_keepalive,
+            'interval',
+            seconds=connection_pool.keepalive_interval,
+            id='imap_keepalive',
+            max_instances=1,
+            coalesce=True
+        )
+
         # スケジューラーの起動
         scheduler.start()
         app.logger.info("Email scheduler started successfully")
 
-        # 初回チェックの実行
-        Thread(
-            target=run_initial_check,
-            name="InitialEmailCheck",
-            daemon=True
-        ).start()
+        # リースを取得したプロセスのみが取り込み処理を実行する
+        start_leader_election(app, on_elected=on_elected, on_demoted=on_demoted)
+        return scheduler
 
     except Exception as e:
         app.logger.error(f"Failed to setup email scheduler: {str(e)}", exc_info=True)
         raise
 
+def process_mailbox(app, settings_id, timeout=None):
+    """
+    Process a single mailbox in its own app context, session and IMAP connection
+
+    Args:
+        app: Flask application instance
+        settings_id: UserSettings ID of the mailbox
+        timeout: Optional per-mailbox time budget in seconds
+    """
+    with _active_mailboxes_lock:
+        if settings_id in _active_mailboxes:
+            app.logger.warning(
+                f"Mailbox {settings_id} is still being processed by a previous cycle, skipping"
+            )
+            return False
+        _active_mailboxes.add(settings_id)
+
+    try:
+        deadline = time.monotonic() + timeout if timeout else None
+
+        # スレッドごとにアプリケーションコンテキストを作成し、独立したセッションを使用する
+        with app.app_context():
+            with session_scope(app) as session:
+                settings = session.get(UserSettings, settings_id)
+                if not settings:
+                    app.logger.warning(f"User settings {settings_id} not found")
+                    return False
+
+                process_emails_for_user(settings, session, app, deadline=deadline)
+                return True
+
+    finally:
+        with _active_mailboxes_lock:
+            _active_mailboxes.discard(settings_id)
+
+def load_mailbox_settings(settings_id):
+    """Load UserSettings for a mailbox in the current app context"""
+    return db.session.get(UserSettings, settings_id)
+
+def start_idle_watchers(app):
+    """
+    Start an IMAP IDLE watcher for every configured mailbox
+
+    New mail is ingested as soon as the server reports it; the periodic
+    check keeps running as a fallback.
+    """
+    idle_timeout = app.config.get('EMAIL_IDLE_TIMEOUT')
+    mailbox_timeout = app.config.get('EMAIL_MAILBOX_TIMEOUT', DEFAULT_MAILBOX_TIMEOUT)
+
+    def on_new_mail(app, settings_id):
+        process_mailbox(app, settings_id, mailbox_timeout)
+
+    with app.app_context():
+        settings_ids = [
+            row.id for row in db.session.query(UserSettings.id)
+            .filter(UserSettings.mail_server.isnot(None))
+            .all()
+        ]
+
+    for settings_id in settings_ids:
+        watcher = _idle_watchers.get(settings_id)
+        if watcher and watcher.is_alive():
+            continue
+
+        watcher = IdleWatcher(
+            app,
+            settings_id,
+            load_settings=load_mailbox_settings,
+            connect_func=connect_to_email_server,
+            on_new_mail=on_new_mail,
+            folder=INBOX_FOLDER,
+            **({'idle_timeout': idle_timeout} if idle_timeout else {})
+        )
+        watcher.start()
+        _idle_watchers[settings_id] = watcher
+
+    app.logger.info(f"IMAP IDLE watchers running: {len(_idle_watchers)}")
+
+def stop_idle_watchers():
+    """Stop all IMAP IDLE watchers"""
+    for watcher in _idle_watchers.values():
+        watcher.stop()
+    _idle_watchers.clear()
+
 def check_emails_task(app):
     """
     Task to check for new emails with improved error handling, monitoring,
     and resource management.
+
+    Mailboxes are processed in parallel by a bounded worker pool so the cycle
+    duration tracks the slowest mailbox rather than the sum of all mailboxes.
     """
     start_time = datetime.now()
 
@@ -1680,32 +2811,68 @@ def check_emails_task(app):
             process = psutil.Process()
             initial_memory = process.memory_info().rss / 1024 / 1024  # MB
 
-            with session_scope(app) as session:  # Single session scope for all users
-                settings_list = session.query(UserSettings).all()
+            with session_scope(app) as session:
+                mailboxes = [
+                    (row.id, row.user_id)
+                    for row in session.query(UserSettings.id, UserSettings.user_id).all()
+                ]
+
+            if not mailboxes:
+                app.logger.info("No user settings found for email checking")
+                return
+
+            max_workers = max(1, int(app.config.get('EMAIL_CHECK_MAX_WORKERS', DEFAULT_MAX_WORKERS)))
+            mailbox_timeout = app.config.get('EMAIL_MAILBOX_TIMEOUT', DEFAULT_MAILBOX_TIMEOUT)
 
-                if not settings_list:
-                    app.logger.info("No user settings found for email checking")
-                    return
+            processed_count = 0
+            error_count = 0
+            timeout_count = 0
 
-                processed_count = 0
-                error_count = 0
+            executor = ThreadPoolExecutor(
+                max_workers=min(max_workers, len(mailboxes)),
+                thread_name_prefix="EmailCheck"
+            )
+            try:
+                futures = {
+                    executor.submit(process_mailbox, app, settings_id, mailbox_timeout): user_id
+                    for settings_id, user_id in mailboxes
+                }
 
-                for settings in settings_list:
+                # 全メールボックスの待機時間の上限（ワーカー数に応じた処理の段数 + 猶予）
+                wait_timeout = None
+                if mailbox_timeout:
+                    waves = -(-len(mailboxes) // max_workers)
+                    wait_timeout = mailbox_timeout * waves + DEFAULT_TIMEOUT
+
+                done, not_done = wait(futures, timeout=wait_timeout)
+
+                for future in done:
+                    user_id = futures[future]
                     try:
-                        process_emails_for_user(settings, session, app)  # Pass the session
-                        processed_count += 1
+                        if future.result():
+                            processed_count += 1
                     except Exception as e:
                         error_count += 1
                         app.logger.error(
-                            f"Error processing emails for user {settings.user_id}: {str(e)}",
+                            f"Error processing emails for user {user_id}: {str(e)}",
                             exc_info=True
                         )
-                        # Consider adding a retry mechanism here if desired.
-                        continue  # Continue to the next user
+
+                for future in not_done:
+                    timeout_count += 1
+                    app.logger.error(
+                        f"Email processing for user {futures[future]} did not finish "
+                        f"within {mailbox_timeout}s"
+                    )
+
+            finally:
+                # 未完了のワーカーは待たずにサイクルを終了する
+                executor.shutdown(wait=False, cancel_futures=True)
 
             # Performance statistics logging *outside* session scope
             end_time = datetime.now()
             duration = (end_time - start_time).total_seconds()
+            ingestion_metrics.observe('check_cycle', 'all', duration)
             final_memory = process.memory_info().rss / 1024 / 1024  # MB
             memory_diff = final_memory - initial_memory
 
@@ -1713,6 +2880,8 @@ def check_emails_task(app):
                 f"Email check completed - "
                 f"Processed users: {processed_count}, "
                 f"Errors: {error_count}, "
+                f"Timeouts: {timeout_count}, "
+                f"Workers: {min(max_workers, len(mailboxes))}, "
                 f"Duration: {duration:.2f}s, "
                 f"Memory diff: {memory_diff:.2f}MB"
             )
@@ -1748,21 +2917,110 @@ def notify_admin_error(task_name, error_message):
         current_app.logger.error(f"Error in notify_admin_error: {str(e)}")
 
 
+def save_fetch_checkpoint(app, tracker_id, **fields):
+    """
+    Persist fetch tracker checkpoint fields in a short transaction of its own
+
+    Args:
+        app: Flask app object
+        tracker_id: EmailFetchTracker ID
+        **fields: Column values to update (uid_validity, last_seen_uid, last_fetch_time,
+            backlog_next_uid, backlog_end_uid)
+    """
+    try:
+        with session_scope(app) as session:
+            tracker = session.get(EmailFetchTracker, tracker_id)
+            if not tracker:
+                app.logger.warning(f"Fetch tracker {tracker_id} not found")
+                return
+            for key, value in fields.items():
+                setattr(tracker, key, value)
+
+    except Exception as e:
+        app.logger.error(f"Error saving fetch checkpoint: {str(e)}", exc_info=True)
+
+def get_mailbox_uid_state(mail, app):
+    """
+    Get UIDVALIDITY and UIDNEXT of the selected mailbox
+
+    Returns:
+        tuple: (uid_validity, uid_next), either may be None if not reported
+    """
+    state = {}
+    try:
+        for key in ('UIDVALIDITY', 'UIDNEXT'):
+            _, data = mail.response(key)
+            if data and data[-1]:
+                state[key] = int(data[-1])
+
+        if len(state) < 2:
+            # SELECTの応答に含まれない場合はSTATUSで問い合わせる
+            _, data = mail.status(INBOX_FOLDER, '(UIDVALIDITY UIDNEXT)')
+            if data and data[0]:
+                raw = data[0].decode('ascii', errors='ignore') if isinstance(data[0], bytes) else str(data[0])
+                for key in ('UIDVALIDITY', 'UIDNEXT'):
+                    match = re.search(rf'{key} (\d+)', raw)
+                    if match:
+                        state.setdefault(key, int(match.group(1)))
+
+    except (imaplib.IMAP4.error, ValueError) as e:
+        app.logger.warning(f"Failed to get mailbox UID state: {str(e)}")
+
+    return state.get('UIDVALIDITY'), state.get('UIDNEXT')
+
+def search_new_uids(mail, last_seen_uid, app):
+    """前回の最大UIDより大きいUIDのメールを検索します（検索に失敗した場合は None）。"""
+    try:
+        search_criteria = f'UID {last_seen_uid + 1}:*'
+        app.logger.debug(f"Searching emails with criteria: {search_criteria}")
+        _, data = mail.uid('search', None, search_criteria)
+
+        if not (data and data[0]):
+            return []
+
+        # "n:*" は新着がない場合も最大UIDを返すため、既読分を除外する
+        uids = [uid for uid in data[0].split() if int(uid) > last_seen_uid]
+        return sorted(uids, key=int)
+
+    except imaplib.IMAP4.error as e:
+        app.logger.error(f"Error searching emails by UID: {str(e)}", exc_info=True)
+        return None
+
+def search_uid_range(mail, first_uid, last_uid, app):
+    """
+    Search the UIDs of a bounded range (inclusive)
+
+    Returns:
+        list: UID bytestrings in ascending order, or None if the search failed
+    """
+    try:
+        _, data = mail.uid('search', None, f'UID {first_uid}:{last_uid}')
+        if not (data and data[0]):
+            return []
+        return sorted(
+            (uid for uid in data[0].split() if first_uid <= int(uid) <= last_uid),
+            key=int
+        )
+
+    except imaplib.IMAP4.error as e:
+        app.logger.error(f"Error searching UID range {first_uid}:{last_uid}: {str(e)}", exc_info=True)
+        return None
+
 def search_emails(mail, last_fetch_time, app):
-    """最後の取得時刻以降に受信したメールを検索します。"""
+    """最後の取得時刻以降に受信したメールをUIDで検索します（検索に失敗した場合は None）。"""
     try:
         search_criteria = f'(SINCE "{last_fetch_time.strftime("%d-%b-%Y")}")'
         app.logger.debug(f"Searching emails with criteria: {search_criteria}")
-        _, data = mail.search(None, search_criteria)
+        _, data = mail.uid('search', None, search_criteria)
 
         if data and data[0]:
-            message_numbers_raw = data[0]
-            # Return list of bytestrings (each representing a message number)
-            return message_numbers_raw.split()  
+            # Return list of bytestrings (each representing a message UID)
+            return sorted(data[0].split(), key=int)
         else:
             app.logger.debug("No new emails found.")
             return []
 
     except imaplib.IMAP4.error as e:  # Catch specific IMAP errors
         app.logger.error(f"Error searching emails: {str(e)}", exc_info=True)
-        return []
\ No newline at end of file
+        # 「新着なし」と区別し、呼び出し側でチェックポイントを進めないようにする
+        return None
@@ -0,0 +1,344 @@
+"""
+Long-lived IMAP connections per mailbox with NOOP keepalive, non-blocking
+reconnect backoff and an optional IMAP IDLE push mode.
+"""
+import time
+import select
+import hashlib
+import imaplib
+import logging
+from contextlib import contextmanager
+from threading import Thread, Lock, Event
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_KEEPALIVE_INTERVAL = 120  # seconds
+DEFAULT_IDLE_TIMEOUT = 25 * 60  # RFC 2177: re-issue IDLE at least every 29 minutes
+RECONNECT_BASE_DELAY = 5  # seconds
+RECONNECT_MAX_DELAY = 15 * 60  # seconds
+
+
+def _settings_fingerprint(settings):
+    """接続設定の変更を検出するためのフィンガープリント"""
+    raw = f"{settings.mail_server}|{settings.mail_port}|{settings.mail_username}|{settings._mail_password}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _has_buffered_input(mail):
+    """
+    Whether imaplib has already read data that select() cannot see
+
+    readline() reads the socket in chunks, so several untagged responses can
+    sit in mail.file's buffer (and, for SSL, in the decrypted record buffer)
+    while the socket itself has nothing left to read.
+    """
+    sock = mail.sock
+    if hasattr(sock, 'pending') and sock.pending():
+        return True
+
+    file = getattr(mail, 'file', None)
+    if file is None or not hasattr(file, 'peek'):
+        return False
+
+    # peek() はバッファが空だとソケットを読むため、待機しないようにタイムアウトを0にする
+    timeout = sock.gettimeout()
+    sock.settimeout(0)
+    try:
+        return bool(file.peek(1))
+    except OSError:
+        return False
+    finally:
+        sock.settimeout(timeout)
+
+
+class MailboxConnection:
+    """A pooled connection and its reconnect state for one mailbox"""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.mail = None
+        self.fingerprint = None
+        self.last_used = 0.0
+        self.failures = 0
+        self.next_retry_at = 0.0
+
+    def close(self):
+        if not self.mail:
+            return
+        try:
+            self.mail.logout()
+        except Exception:
+            pass
+        self.mail = None
+
+
+class IMAPConnectionPool:
+    """
+    Per-mailbox IMAP connection manager
+
+    Connections are kept open between polling cycles. On checkout the folder
+    is re-selected, which doubles as a liveness check, and a dead connection
+    is transparently re-established. keepalive() pings idle connections with
+    NOOP. Failed connection attempts schedule the next attempt with
+    exponential backoff instead of sleeping in the caller's thread.
+    """
+
+    def __init__(self, connect_func: Callable, keepalive_interval: int = DEFAULT_KEEPALIVE_INTERVAL):
+        self.connect_func = connect_func
+        self.keepalive_interval = keepalive_interval
+        self._entries: Dict[int, MailboxConnection] = {}
+        self._lock = Lock()
+
+    def _get_entry(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = MailboxConnection()
+                self._entries[key] = entry
+            return entry
+
+    def _is_alive(self, mail):
+        try:
+            status, _ = mail.noop()
+            return status == 'OK'
+        except Exception:
+            return False
+
+    def _connect(self, app, settings, entry):
+        now = time.monotonic()
+        if now < entry.next_retry_at:
+            app.logger.info(
+                f"Skipping connection for user {settings.user_id}, "
+                f"next retry in {entry.next_retry_at - now:.0f}s"
+            )
+            return None
+
+        mail = None
+        try:
+            mail = self.connect_func(app, settings)
+        except Exception as e:
+            app.logger.error(f"Connection attempt failed for user {settings.user_id}: {str(e)}")
+
+        if not mail:
+            entry.failures += 1
+            delay = min(RECONNECT_BASE_DELAY * (2 ** entry.failures), RECONNECT_MAX_DELAY)
+            entry.next_retry_at = now + delay
+            app.logger.error(
+                f"Failed to connect for user {settings.user_id} "
+                f"({entry.failures} consecutive failures), retrying in {delay}s"
+            )
+            return None
+
+        entry.failures = 0
+        entry.next_retry_at = 0.0
+        entry.mail = mail
+        entry.fingerprint = _settings_fingerprint(settings)
+        return mail
+
+    @contextmanager
+    def connection(self, app, settings, folder='INBOX'):
+        """
+        Check out the mailbox connection for the duration of the block
+
+        Yields:
+            imaplib.IMAP4_SSL object, or None if no connection is available
+        """
+        entry = self._get_entry(settings.user_id)
+        with entry.lock:
+            mail = entry.mail
+            if mail and entry.fingerprint != _settings_fingerprint(settings):
+                app.logger.info(f"Mail settings changed for user {settings.user_id}, reconnecting")
+                entry.close()
+                mail = None
+
+            if mail:
+                # 再利用時はフォルダを再選択して UIDVALIDITY/UIDNEXT を更新する
+                try:
+                    status, _ = mail.select(folder)
+                    if status != 'OK':
+                        raise imaplib.IMAP4.error(f"SELECT {folder} failed")
+                    app.logger.debug(f"Reusing IMAP connection for user {settings.user_id}")
+                except Exception as e:
+                    app.logger.info(f"Pooled connection for user {settings.user_id} is stale: {str(e)}")
+                    entry.close()
+                    mail = None
+
+            if not mail:
+                mail = self._connect(app, settings, entry)
+
+            failed = False
+            try:
+                yield mail
+            except (imaplib.IMAP4.abort, OSError):
+                failed = True
+                raise
+            finally:
+                entry.last_used = time.monotonic()
+                if failed:
+                    entry.close()
+
+    def keepalive(self, app=None):
+        """Send NOOP on idle connections and drop the ones that are dead"""
+        log = app.logger if app else logger
+        now = time.monotonic()
+        with self._lock:
+            entries = list(self._entries.items())
+
+        for key, entry in entries:
+            if not entry.mail or now - entry.last_used < self.keepalive_interval:
+                continue
+            # 使用中の接続はスキップ
+            if not entry.lock.acquire(blocking=False):
+                continue
+            try:
+                if entry.mail and not self._is_alive(entry.mail):
+                    log.info(f"Dropping dead IMAP connection for user {key}")
+                    entry.close()
+                elif entry.mail:
+                    entry.last_used = time.monotonic()
+            finally:
+                entry.lock.release()
+
+    def discard(self, user_id):
+        """Close and forget the connection of a mailbox"""
+        with self._lock:
+            entry = self._entries.pop(user_id, None)
+        if entry:
+            with entry.lock:
+                entry.close()
+
+    def close_all(self):
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            with entry.lock:
+                entry.close()
+
+
+class IdleWatcher(Thread):
+    """
+    Hold a dedicated connection in IMAP IDLE and invoke a callback when the
+    server reports new mail, so ingestion starts within seconds.
+    """
+
+    def __init__(self, app, settings_id: int, load_settings: Callable, connect_func: Callable,
+                 on_new_mail: Callable, folder: str = 'INBOX', idle_timeout: int = DEFAULT_IDLE_TIMEOUT):
+        super().__init__(name=f"IMAPIdle-{settings_id}", daemon=True)
+        self.app = app
+        self.settings_id = settings_id
+        self.load_settings = load_settings
+        self.connect_func = connect_func
+        self.on_new_mail = on_new_mail
+        self.folder = folder
+        self.idle_timeout = idle_timeout
+        self._stop_event = Event()
+        self._failures = 0
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            mail = None
+            try:
+                with self.app.app_context():
+                    settings = self.load_settings(self.settings_id)
+                    if not settings:
+                        self.app.logger.info(f"IDLE watcher {self.settings_id}: settings removed, stopping")
+                        return
+                    mail = self.connect_func(self.app, settings)
+
+                if not mail:
+                    raise ConnectionError("connection failed")
+
+                if self.folder.upper() != 'INBOX':
+                    mail.select(self.folder)
+
+                if 'IDLE' not in mail.capabilities:
+                    # 認証後にのみIDLEを通知するサーバーがあるため、ログイン後のCAPABILITYで確認し直す
+                    status, data = mail.capability()
+                    if status == 'OK' and data and data[0]:
+                        mail.capabilities = tuple(data[0].decode('ascii', errors='ignore').upper().split())
+
+                if 'IDLE' not in mail.capabilities:
+                    self.app.logger.warning(
+                        f"IDLE watcher {self.settings_id}: server does not support IDLE, stopping"
+                    )
+                    return
+
+                self._failures = 0
+                while not self._stop_event.is_set():
+                    if self._idle_once(mail):
+                        self.app.logger.info(f"IDLE watcher {self.settings_id}: new mail notification")
+                        self.on_new_mail(self.app, self.settings_id)
+
+            except Exception as e:
+                self._failures += 1
+                delay = min(RECONNECT_BASE_DELAY * (2 ** self._failures), RECONNECT_MAX_DELAY)
+                self.app.logger.warning(
+                    f"IDLE watcher {self.settings_id} error: {str(e)}, reconnecting in {delay}s"
+                )
+                self._stop_event.wait(delay)
+
+            finally:
+                if mail:
+                    try:
+                        mail.logout()
+                    except Exception:
+                        pass
+
+    def _idle_once(self, mail) -> bool:
+        """
+        Run one IDLE round until new mail arrives, the timeout expires or the
+        watcher is stopped
+
+        Returns:
+            bool: True if the server reported new messages
+        """
+        has_new_mail = False
+        tag = mail._new_tag()
+        mail.send(tag + b' IDLE\r\n')
+        while True:
+            # IDLE開始前に保留されていた未タグ応答（EXISTSなど）が先に届く場合がある
+            line = mail.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("connection closed before IDLE")
+            if line.startswith(b'+'):
+                break
+            if line.startswith(tag):
+                raise imaplib.IMAP4.error(f"IDLE rejected: {line!r}")
+            if line.startswith(b'*') and b'EXISTS' in line:
+                has_new_mail = True
+
+        deadline = time.monotonic() + self.idle_timeout
+        while not has_new_mail and not self._stop_event.is_set() and time.monotonic() < deadline:
+            # 読み込み済みのバッファに残っているデータを優先し、なければソケットを待機する
+            ready = _has_buffered_input(mail)
+            if not ready:
+                ready, _, _ = select.select([mail.sock], [], [], 1.0)
+            if not ready:
+                continue
+
+            line = mail.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("connection closed during IDLE")
+            if line.startswith(b'*') and (b'EXISTS' in line or b'RECENT' in line):
+                has_new_mail = True
+                break
+
+        mail.send(b'DONE\r\n')
+        while True:
+            line = mail.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("connection closed after IDLE")
+            if line.startswith(tag):
+                if b' OK' not in line:
+                    raise imaplib.IMAP4.error(f"IDLE terminated with error: {line!r}")
+                break
+            if line.startswith(b'*') and b'EXISTS' in line:
+                has_new_mail = True
+
+        return has_new_mail
@@ -0,0 +1,190 @@
+"""
+In-process metrics for email ingestion.
+
+Each stage of a mailbox run (IMAP search and fetch, parsing, duplicate
+checks, classification, DB writes, Claude calls) records its latency in a
+per-(stage, user) histogram, and message outcomes are counted per user.
+The registry renders the Prometheus text exposition format, so no client
+library is required, and a JSON snapshot for the system management API.
+A standalone ingestion worker can serve the same text on its own port.
+"""
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+
+# Constants
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+STAGES = (
+    'mailbox_total', 'imap_search', 'imap_fetch_headers', 'prefilter',
+    'imap_fetch_bodies', 'parse', 'duplicate_check', 'classify', 'db_write',
+    'claude_api', 'check_cycle'
+)
+OUTCOMES = ('processed', 'duplicate', 'spam', 'error')
+
+STAGE_METRIC = 'email_ingest_stage_seconds'
+MESSAGE_METRIC = 'email_ingest_messages_total'
+
+
+class _Histogram:
+    """Cumulative-bucket histogram (count per upper bound, plus sum and count)"""
+
+    def __init__(self, buckets):
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, buckets, value):
+        index = bisect_left(buckets, value)
+        if index < len(buckets):
+            self.bucket_counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_bound(bound):
+    return repr(float(bound))
+
+
+class IngestionMetrics:
+    """Thread-safe registry of stage histograms and message counters"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = Lock()
+        self._histograms = {}
+        self._counters = defaultdict(int)
+
+    def observe(self, stage, user_id, seconds):
+        """Record one stage duration in seconds"""
+        key = (stage, str(user_id))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            histogram.observe(self.buckets, seconds)
+
+    @contextmanager
+    def time(self, stage, user_id):
+        """Time the enclosed block as one observation of a stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, user_id, time.perf_counter() - start)
+
+    def inc(self, outcome, user_id, amount=1):
+        """Count messages with an outcome (processed / duplicate / spam / error)"""
+        if amount:
+            with self._lock:
+                self._counters[(outcome, str(user_id))] += amount
+
+    def snapshot(self, user_id=None):
+        """
+        Return the current values as plain dicts
+
+        Args:
+            user_id: Only include this user's metrics (all users when None)
+
+        Returns:
+            dict: {'stages': {stage: {user_id: {...}}}, 'messages': {user_id: {outcome: n}}}
+        """
+        only_user = str(user_id) if user_id is not None else None
+        with self._lock:
+            stages = {}
+            for (stage, user_id), histogram in self._histograms.items():
+                if only_user is not None and user_id != only_user:
+                    continue
+                stages.setdefault(stage, {})[user_id] = {
+                    'count': histogram.count,
+                    'sum': round(histogram.sum, 6),
+                    'avg': round(histogram.sum / histogram.count, 6) if histogram.count else 0,
+                    'buckets': {
+                        _format_bound(bound): count
+                        for bound, count in zip(self.buckets, self._cumulative(histogram))
+                    }
+                }
+
+            messages = {}
+            for (outcome, user_id), value in self._counters.items():
+                if only_user is not None and user_id != only_user:
+                    continue
+                messages.setdefault(user_id, {name: 0 for name in OUTCOMES})[outcome] = value
+
+            return {'stages': stages, 'messages': messages}
+
+    def _cumulative(self, histogram):
+        total = 0
+        for count in histogram.bucket_counts:
+            total += count
+            yield total
+
+    def render_prometheus(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = [
+            f'# HELP {STAGE_METRIC} Latency of each email ingestion stage.',
+            f'# TYPE {STAGE_METRIC} histogram',
+        ]
+        with self._lock:
+            for (stage, user_id), histogram in sorted(self._histograms.items()):
+                labels = f'stage="{_label(stage)}",user_id="{_label(user_id)}"'
+                for bound, count in zip(self.buckets, self._cumulative(histogram)):
+                    lines.append(f'{STAGE_METRIC}_bucket{{{labels},le="{_format_bound(bound)}"}} {count}')
+                lines.append(f'{STAGE_METRIC}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f'{STAGE_METRIC}_sum{{{labels}}} {histogram.sum}')
+                lines.append(f'{STAGE_METRIC}_count{{{labels}}} {histogram.count}')
+
+            lines.append(f'# HELP {MESSAGE_METRIC} Messages handled by email ingestion, by outcome.')
+            lines.append(f'# TYPE {MESSAGE_METRIC} counter')
+            for (outcome, user_id), value in sorted(self._counters.items()):
+                lines.append(
+                    f'{MESSAGE_METRIC}{{outcome="{_label(outcome)}",user_id="{_label(user_id)}"}} {value}'
+                )
+
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+ingestion_metrics = IngestionMetrics()
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = ingestion_metrics.render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # スクレイプごとのアクセスログは出力しない
+        pass
+
+
+def start_metrics_server(port, host='0.0.0.0'):
+    """
+    Serve /metrics in Prometheus text format from a background thread
+
+    Used by the ingestion worker process, whose metrics are not visible to
+    the web processes.
+
+    Returns:
+        ThreadingHTTPServer: The running server
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+    Thread(target=server.serve_forever, name="MetricsServer", daemon=True).start()
+    return server
@@ -0,0 +1,239 @@
+"""
+Keyset (cursor) pagination for the list views.
+
+Query.paginate() issues a COUNT(*) over the whole filtered set and pages with
+OFFSET, so page N costs as much as scanning the N-1 pages before it. Here a
+page is addressed by the (sort value, id) of its boundary row instead: the
+next page is "rows after this key" in the list order, which the database
+answers from the sort index no matter how deep the page is. The total count
+is opt-in and, where possible, estimated rather than counted.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_, select, func
+
+from extensions import db
+
+# Constants
+DEFAULT_COUNT_CAP = 1000  # PostgreSQL 以外で件数を数える上限
+
+
+def encode_cursor(value, row_id, backward=False):
+    """
+    Encode a page boundary as an opaque URL-safe cursor
+
+    Args:
+        value: Sort column value of the boundary row (may be None)
+        row_id: Primary key of the boundary row
+        backward: True for a cursor pointing at the previous page
+
+    Returns:
+        str: Cursor string
+    """
+    payload = {'id': row_id, 'b': int(backward)}
+    if isinstance(value, datetime):
+        payload['dt'] = value.isoformat()
+    else:
+        payload['v'] = value
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor from encode_cursor
+
+    Returns:
+        tuple: (value, row_id, backward), or None for a missing or invalid cursor
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        value = datetime.fromisoformat(payload['dt']) if 'dt' in payload else payload.get('v')
+        return value, int(payload['id']), bool(payload.get('b'))
+    except (binascii.Error, ValueError, TypeError, KeyError, AttributeError):
+        return None
+
+
+def _after_key(sort_column, id_column, value, row_id, descending, nulls_last):
+    """Condition for rows strictly after (value, row_id) in the given ordering"""
+    if descending:
+        past_value = sort_column < value if value is not None else None
+        past_id = id_column < row_id
+    else:
+        past_value = sort_column > value if value is not None else None
+        past_id = id_column > row_id
+
+    if value is None:
+        # NULL 同士は id で順序付けする
+        same_null = and_(sort_column.is_(None), past_id)
+        return same_null if nulls_last else or_(sort_column.isnot(None), same_null)
+
+    condition = or_(past_value, and_(sort_column == value, past_id))
+    if nulls_last:
+        condition = or_(condition, sort_column.is_(None))
+    return condition
+
+
+def _ordering(sort_column, id_column, descending, nulls_last):
+    sort_order = sort_column.desc() if descending else sort_column.asc()
+    id_order = id_column.desc() if descending else id_column.asc()
+    sort_order = sort_order.nullslast() if nulls_last else sort_order.nullsfirst()
+    return sort_order, id_order
+
+
+def estimate_count(query, cap=DEFAULT_COUNT_CAP):
+    """
+    Return an approximate number of rows matched by a query
+
+    On PostgreSQL the planner's row estimate is used, which costs no scan.
+    Elsewhere the rows are counted up to `cap`.
+
+    Args:
+        query: Filtered query (ordering and eager loads are ignored)
+        cap: Maximum number of rows to count on other databases
+
+    Returns:
+        tuple: (count, exact, capped)
+    """
+    statement = query.enable_eagerloads(False).order_by(None)
+    connection = db.session.connection()
+
+    if connection.dialect.name == 'postgresql':
+        # IN (...) の展開パラメータは実行時にしか展開されないため、コンパイル時に展開しておく
+        compiled = statement.statement.compile(
+            dialect=connection.dialect, compile_kwargs={'render_postcompile': True}
+        )
+        plan = connection.exec_driver_sql(
+            f'EXPLAIN (FORMAT JSON) {compiled}', compiled.params
+        ).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows']), False, False
+
+    count = db.session.execute(
+        select(func.count()).select_from(statement.limit(cap + 1).subquery())
+    ).scalar()
+    if count > cap:
+        return cap, False, True
+    return count, True, False
+
+
+class KeysetPage:
+    """
+    One page of a keyset-paginated query
+
+    Attributes:
+        items: Rows on this page, in list order
+        per_page: Page size
+        has_prev / has_next: Whether neighbouring pages exist
+        prev_cursor / next_cursor: Cursors for the neighbouring pages
+        total: Row count when requested, otherwise None
+        total_exact: False when total is an estimate
+        total_capped: True when there are more than `total` rows
+    """
+
+    def __init__(self, items, per_page, prev_cursor=None, next_cursor=None,
+                 total=None, total_exact=False, total_capped=False):
+        self.items = items
+        self.per_page = per_page
+        self.prev_cursor = prev_cursor
+        self.next_cursor = next_cursor
+        self.total = total
+        self.total_exact = total_exact
+        self.total_capped = total_capped
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def pages_available(self):
+        return self.has_prev or self.has_next
+
+
+def keyset_paginate(query, sort_column, id_column, descending=True, cursor=None,
+                    per_page=10, nulls_last=True, with_count=False,
+                    count_cap=DEFAULT_COUNT_CAP):
+    """
+    Fetch one page of a query ordered by (sort_column, id_column)
+
+    The query must not be ordered yet. NULL sort values are placed last by
+    default. Only per_page + 1 rows are read, whatever the page depth.
+
+    Args:
+        query: Filtered query
+        sort_column: Column to sort by
+        id_column: Primary key column used as the tie-breaker
+        descending: Sort direction
+        cursor: Cursor from a previous page, or None for the first page
+        per_page: Page size
+        nulls_last: Place rows with a NULL sort value at the end
+        with_count: Also compute an approximate total (see estimate_count)
+        count_cap: Counting limit passed to estimate_count
+
+    Returns:
+        KeysetPage: The requested page
+    """
+    key = decode_cursor(cursor)
+    backward = bool(key and key[2])
+
+    # 前ページは逆順に読み、取得後に並べ直す
+    scan_descending = descending != backward
+    scan_nulls_last = nulls_last != backward
+
+    page_query = query
+    if key:
+        value, row_id, _ = key
+        page_query = page_query.filter(
+            _after_key(sort_column, id_column, value, row_id, scan_descending, scan_nulls_last)
+        )
+
+    rows = page_query.order_by(
+        *_ordering(sort_column, id_column, scan_descending, scan_nulls_last)
+    ).limit(per_page + 1).all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backward:
+        rows.reverse()
+
+    sort_key = sort_column.key
+    id_key = id_column.key
+
+    def boundary(row, to_previous):
+        return encode_cursor(getattr(row, sort_key), getattr(row, id_key), backward=to_previous)
+
+    prev_cursor = next_cursor = None
+    if rows:
+        if backward:
+            if has_more:
+                prev_cursor = boundary(rows[0], True)
+            next_cursor = boundary(rows[-1], False)
+        else:
+            if key:
+                prev_cursor = boundary(rows[0], True)
+            if has_more:
+                next_cursor = boundary(rows[-1], False)
+
+    total, total_exact, total_capped = None, False, False
+    if with_count:
+        total, total_exact, total_capped = estimate_count(query, count_cap)
+
+    return KeysetPage(
+        rows, per_page,
+        prev_cursor=prev_cursor,
+        next_cursor=next_cursor,
+        total=total,
+        total_exact=total_exact,
+        total_capped=total_capped
+    )
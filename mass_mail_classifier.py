@@ -0,0 +1,279 @@
+"""
+Precompiled mass mail / newsletter classifier.
+
+The rule lists are compiled once into combined regular expressions and a
+header lookup table, so a message is scanned once per field instead of once
+per pattern. Scores and reasons are identical to the original list-based
+checks.
+"""
+import re
+from collections import Counter
+from email.utils import parsedate_tz
+from threading import Lock
+
+# スコアリング閾値
+SPAM_THRESHOLD = 2
+
+# ドメインチェック（重み: 1）。送信者ヘッダー内の部分一致で判定する
+SPAM_DOMAINS = [
+    # メール配信サービス
+    'mailout.', 'mailchimp.', 'sendgrid.', 'marketo.', 'salesforce.',
+    'campaign-', 'newsletter.', 'info.', 'amazonses.com', 'bounce.',
+    'mailer.', 'mta.', 'spark.',
+
+    # 日本のサービス
+    'mail.rakuten.com', 'cuenote.jp', 'mpse.jp', 'itmedia.co.jp',
+    'bizmkt.jp', 'hansoku.jp',
+
+    # 中国系サービス
+    '.qq.com', '.163.com', '.sina.com', '.sohu.com', 'edm.',
+    'mail.hk', '.alibaba.com', '.taobao.com', '.tmall.com',
+
+    # 一般的なメールサービス（追加の確認が必要）
+    'noreply', 'no-reply', 'donotreply', 'notifications.'
+]
+
+# ヘッダーチェック（重み: 1）。リスト順で最初に見つかったヘッダーを理由に記録する
+BULK_HEADERS = [
+    # 標準的なリストメールヘッダー
+    'List-Unsubscribe', 'List-Id', 'List-Post', 'List-Owner',
+    'List-Subscribe', 'List-Help', 'Precedence', 'X-Campaign',
+
+    # マーケティングメール関連
+    'X-Marketing', 'X-Campaign-ID', 'X-Newsletter',
+    'X-Mailer', 'Bulk-Sender', 'X-Report-Abuse',
+
+    # 自動送信関連
+    'Auto-Submitted', 'X-Auto-Response-Suppress',
+
+    # その他の判定用ヘッダー
+    'X-MC-User', 'Feedback-ID', 'X-SES-Outgoing',
+    'X-CSA-Complaints', 'X-EDM-Key', 'X-CNDM', 'X-CN-List'
+]
+
+BULK_PRECEDENCE_VALUES = {'bulk', 'list', 'junk'}
+
+# コンテンツ内のキーフレーズチェック（重み: 1）
+UNSUBSCRIBE_PHRASES = [
+    # 英語
+    'unsubscribe', 'opt-out', 'opt out', 'email preferences',
+    'notification settings', 'manage subscriptions',
+    'you received this email because',
+    'this is an automated message',
+    'do not reply to this email',
+
+    # 日本語
+    '配信停止', 'メール配信を停止', '退会',
+    'このメールの配信を停止',
+    '※本メールは自動送信されています',
+    'このメールに返信されても回答できません',
+    'このアドレスは送信専用です',
+    'お問い合わせはこちら',
+    'メールの変更・停止',
+    'メールマガジン',
+    'ニュースレター',
+
+    # 中国語（簡体字）
+    '取消订阅', '退订', '停止订阅',
+    '系统自动发送', '请勿直接回复',
+
+    # 中国語（繁体字）
+    '取消訂閱', '退訂', '停止訂閱',
+    '系統自動發送', '請勿直接回覆'
+]
+
+# 件名のパターンチェック（重み: 1）
+NEWSLETTER_SUBJECT_PATTERNS = [
+    # 英語
+    'newsletter', 'bulletin', 'update', 'digest',
+    'notification', 'subscription', 'campaign',
+    'special offer', 'announcement', 'weekly',
+    'monthly', 'breaking news', 'alert',
+
+    # 日本語
+    'ニュース', 'マガジン', '配信', 'special',
+    'キャンペーン', 'セール', '[pr]', '(pr)',
+    'お知らせ', 'ご案内', 'まとめ', 'レポート',
+    '速報',
+
+    # 中国語
+    '电子报', '通讯', '快讯', '周报', '月报',
+    '公告', '通知', '优惠', '促销', '限时',
+    '電子報', '通訊', '快訊', '週報', '優惠'
+]
+
+RULES = (
+    'mass_domain', 'bulk_header', 'bulk_precedence', 'unsubscribe_phrase',
+    'multiple_recipients', 'html_content', 'newsletter_subject', 'off_hours'
+)
+
+
+def _compile_any(patterns):
+    """Compile substring patterns into one alternation regex"""
+    return re.compile('|'.join(re.escape(p) for p in sorted(set(patterns), key=len, reverse=True)))
+
+
+class MassMailClassifier:
+    """
+    Score-based bulk mail classifier compiled once from the rule lists
+
+    Unsubscribe phrases are found with a single lookahead alternation
+    ordered longest first, so at each position the longest matching phrase
+    is reported; every phrase that is a substring of a reported phrase is
+    added from a precomputed implication table. The result is the exact set
+    of phrases contained in the content, reported in list order.
+    """
+
+    def __init__(self):
+        self.domain_pattern = _compile_any(SPAM_DOMAINS)
+        self.subject_pattern = _compile_any(NEWSLETTER_SUBJECT_PATTERNS)
+
+        self.header_rank = {}
+        for rank, header in enumerate(BULK_HEADERS):
+            self.header_rank.setdefault(header.lower(), (rank, header))
+
+        self.phrases = [phrase.lower() for phrase in UNSUBSCRIBE_PHRASES]
+        self.phrase_order = {}
+        for index, phrase in enumerate(self.phrases):
+            self.phrase_order.setdefault(phrase, index)
+        unique_phrases = sorted(self.phrase_order, key=len, reverse=True)
+        self.phrase_pattern = re.compile(
+            '(?=(' + '|'.join(re.escape(p) for p in unique_phrases) + '))'
+        )
+        # フレーズを含む場合に必ず含まれる他のフレーズ（部分文字列）
+        self.implied_phrases = {
+            phrase: frozenset(other for other in unique_phrases if other in phrase)
+            for phrase in unique_phrases
+        }
+
+        self._lock = Lock()
+        self._hits = Counter()
+
+    def _find_bulk_header(self, msg):
+        candidates = sorted(
+            self.header_rank[key.lower()]
+            for key in set(msg.keys())
+            if key.lower() in self.header_rank
+        )
+        for _, header in candidates:
+            if msg.get(header):
+                return header
+        return None
+
+    def _find_phrases(self, content_lower):
+        matched = set()
+        for match in self.phrase_pattern.finditer(content_lower):
+            phrase = match.group(1)
+            if phrase not in matched:
+                matched |= self.implied_phrases[phrase]
+        return sorted(matched, key=self.phrase_order.__getitem__)
+
+    def classify(self, msg, content, app):
+        """
+        Classify a message as mass mail
+
+        Args:
+            msg: Email message object (headers only is allowed)
+            content: Processed email content, or None to skip the phrase check
+            app: Flask app for logging
+
+        Returns:
+            tuple: (is_spam: bool, reason: str)
+        """
+        spam_score = 0
+        spam_indicators = []
+        hits = []
+        try:
+            sender = msg.get('from', '').lower()
+            if self.domain_pattern.search(sender):
+                spam_score += 1
+                spam_indicators.append(f'Mass mail domain detected: {sender}')
+                hits.append('mass_domain')
+
+            header = self._find_bulk_header(msg)
+            if header:
+                spam_score += 1
+                spam_indicators.append(f'Bulk mail header found: {header}')
+                hits.append('bulk_header')
+
+            # Precedenceヘッダーの特別チェック（重み: 1）
+            precedence = msg.get('Precedence', '').lower()
+            if precedence in BULK_PRECEDENCE_VALUES:
+                spam_score += 1
+                spam_indicators.append(f'Bulk mail precedence: {precedence}')
+                hits.append('bulk_precedence')
+
+            if content:
+                found_phrases = self._find_phrases(content.lower())
+                if found_phrases:
+                    spam_score += 1
+                    spam_indicators.append(
+                        f'Unsubscribe phrases found: {", ".join(found_phrases[:3])}'
+                    )
+                    hits.append('unsubscribe_phrase')
+
+            # 宛先数のチェック（重み: 1）
+            recipient_count = sum(
+                len(msg.get_all(field, []))
+                for field in ['to', 'cc', 'bcc']
+            )
+            if recipient_count > 2:
+                spam_score += 1
+                spam_indicators.append(f'Multiple recipients: {recipient_count}')
+                hits.append('multiple_recipients')
+
+            # HTMLコンテンツのチェック（重み: 0.5）
+            if msg.get_content_type() == 'text/html':
+                spam_score += 0.5
+                spam_indicators.append('HTML formatted email')
+                hits.append('html_content')
+
+            subject = msg.get('subject', '').lower()
+            if self.subject_pattern.search(subject):
+                spam_score += 1
+                spam_indicators.append(f'Newsletter-like subject: {subject[:50]}')
+                hits.append('newsletter_subject')
+
+            # 送信時刻のチェック（深夜は自動送信の可能性が高い）
+            try:
+                date_tuple = parsedate_tz(msg.get('date'))
+                if date_tuple:
+                    hour = date_tuple[3]
+                    if 0 <= hour < 6:
+                        spam_score += 0.5
+                        spam_indicators.append(f'Sent during off-hours: {hour}:00')
+                        hits.append('off_hours')
+            except Exception as e:
+                app.logger.debug(f"Error checking send time: {str(e)}")
+
+            # 最終判定
+            is_spam = spam_score >= SPAM_THRESHOLD
+            reason = ' | '.join(spam_indicators) if spam_indicators else 'No spam indicators found'
+
+            with self._lock:
+                self._hits['checked'] += 1
+                if is_spam:
+                    self._hits['spam'] += 1
+                self._hits.update(hits)
+
+            app.logger.debug(
+                f"Spam check result - Score: {spam_score}, "
+                f"Is spam: {is_spam}, Indicators: {len(spam_indicators)}"
+            )
+
+            return is_spam, reason
+
+        except Exception as e:
+            app.logger.error(f"Error in spam detection: {str(e)}", exc_info=True)
+            return False, "Error in spam detection"
+
+    def get_rule_hits(self):
+        """Return per-rule hit counters"""
+        with self._lock:
+            stats = {rule: self._hits.get(rule, 0) for rule in RULES}
+            stats['checked'] = self._hits.get('checked', 0)
+            stats['spam'] = self._hits.get('spam', 0)
+            return stats
+
+
+mass_mail_classifier = MassMailClassifier()
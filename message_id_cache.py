@@ -0,0 +1,214 @@
+"""
+Process-wide cache of Message-IDs that are already stored in the database.
+
+A Bloom filter answers "definitely new" without a query. Positive hits are
+confirmed against the database in one IN query and then kept in a bounded
+LRU, so re-polling an overlapping window costs almost no queries.
+"""
+import math
+import hashlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from threading import Lock
+
+from models import Email
+
+# Constants
+DEFAULT_BLOOM_CAPACITY = 200000
+DEFAULT_BLOOM_ERROR_RATE = 0.001
+DEFAULT_CONFIRMED_LRU_SIZE = 50000
+DEFAULT_WARM_DAYS = 30
+WARM_BATCH_SIZE = 5000
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over a single BLAKE2b digest"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(1, capacity)
+        self.size = max(64, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+    def is_full(self):
+        return self.count >= self.capacity
+
+
+class KnownMessageIdCache:
+    """
+    Bounded-memory membership cache for stored Message-IDs
+
+    Two Bloom filter generations are kept: when the current one reaches its
+    capacity it becomes the previous generation and a fresh one is started,
+    so memory stays bounded and the oldest IDs age out. A negative answer is
+    exact for the IDs this process has seen; the UNIQUE constraint on
+    emails.message_id remains the backstop for IDs inserted elsewhere.
+    """
+
+    def __init__(self, capacity=DEFAULT_BLOOM_CAPACITY, error_rate=DEFAULT_BLOOM_ERROR_RATE,
+                 lru_size=DEFAULT_CONFIRMED_LRU_SIZE):
+        self._lock = Lock()
+        self.configure(capacity, error_rate, lru_size)
+
+    def configure(self, capacity=DEFAULT_BLOOM_CAPACITY, error_rate=DEFAULT_BLOOM_ERROR_RATE,
+                  lru_size=DEFAULT_CONFIRMED_LRU_SIZE):
+        """Reset the cache with new sizing parameters"""
+        with self._lock:
+            self.capacity = capacity
+            self.error_rate = error_rate
+            self.lru_size = lru_size
+            self._current = BloomFilter(capacity, error_rate)
+            self._previous = None
+            self._confirmed = OrderedDict()
+            self.warmed = False
+            self.stats = {
+                'bloom_negatives': 0,
+                'confirmed_hits': 0,
+                'db_lookups': 0,
+                'db_confirmed': 0,
+                'false_positives': 0,
+            }
+
+    def _bloom_add(self, message_id):
+        if self._current.is_full():
+            self._previous = self._current
+            self._current = BloomFilter(self.capacity, self.error_rate)
+        self._current.add(message_id)
+
+    def _might_contain(self, message_id):
+        return message_id in self._current or (
+            self._previous is not None and message_id in self._previous
+        )
+
+    def _confirm(self, message_id):
+        self._confirmed[message_id] = True
+        self._confirmed.move_to_end(message_id)
+        while len(self._confirmed) > self.lru_size:
+            self._confirmed.popitem(last=False)
+
+    def add(self, message_id):
+        """Record a Message-ID whose email row has been committed"""
+        if not message_id:
+            return
+        with self._lock:
+            self._bloom_add(message_id)
+            self._confirm(message_id)
+
+    def filter_known(self, message_ids, session):
+        """
+        Return the subset of message_ids that already exist in the database
+
+        Args:
+            message_ids: Iterable of Message-ID strings
+            session: Database session used to confirm Bloom filter hits
+
+        Returns:
+            set: Message-IDs that are stored
+        """
+        known = set()
+        candidates = set()
+        with self._lock:
+            for message_id in message_ids:
+                if not message_id:
+                    continue
+                if message_id in self._confirmed:
+                    self._confirmed.move_to_end(message_id)
+                    self.stats['confirmed_hits'] += 1
+                    known.add(message_id)
+                elif not self.warmed or self._might_contain(message_id):
+                    # ウォームアップ前はBloom filterの陰性を信用しない
+                    candidates.add(message_id)
+                else:
+                    self.stats['bloom_negatives'] += 1
+
+        if not candidates:
+            return known
+
+        # Bloom filterの陽性はDBで確認する
+        found = {
+            row.message_id for row in session.query(Email.message_id)
+            .filter(Email.message_id.in_(candidates))
+            .all()
+        }
+
+        with self._lock:
+            self.stats['db_lookups'] += 1
+            self.stats['db_confirmed'] += len(found)
+            self.stats['false_positives'] += len(candidates) - len(found)
+            for message_id in found:
+                self._confirm(message_id)
+
+        return known | found
+
+    def is_known(self, message_id, session):
+        """Check a single Message-ID, querying the database only on a Bloom filter hit"""
+        return bool(message_id) and message_id in self.filter_known([message_id], session)
+
+    def warm(self, session, days=DEFAULT_WARM_DAYS):
+        """
+        Load Message-IDs of recently received emails into the Bloom filter
+
+        Returns:
+            int: Number of Message-IDs loaded
+        """
+        since = datetime.utcnow() - timedelta(days=days)
+        query = session.query(Email.message_id)\
+            .filter(
+                Email.received_date >= since,
+                Email.message_id.isnot(None)
+            )\
+            .order_by(Email.received_date)\
+            .yield_per(WARM_BATCH_SIZE)
+
+        loaded = 0
+        for row in query:
+            with self._lock:
+                self._bloom_add(row.message_id)
+            loaded += 1
+
+        self.warmed = True
+        return loaded
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats['bloom_entries'] = self._current.count + (self._previous.count if self._previous else 0)
+            stats['confirmed_entries'] = len(self._confirmed)
+            stats['warmed'] = self.warmed
+            return stats
+
+
+known_message_ids = KnownMessageIdCache()
+
+
+def warm_message_id_cache(app, session):
+    """Configure the process-wide cache from app config and warm it from the database"""
+    known_message_ids.configure(
+        capacity=int(app.config.get('MESSAGE_ID_CACHE_CAPACITY', DEFAULT_BLOOM_CAPACITY)),
+        error_rate=float(app.config.get('MESSAGE_ID_CACHE_ERROR_RATE', DEFAULT_BLOOM_ERROR_RATE)),
+        lru_size=int(app.config.get('MESSAGE_ID_CACHE_LRU_SIZE', DEFAULT_CONFIRMED_LRU_SIZE))
+    )
+    loaded = known_message_ids.warm(
+        session,
+        days=int(app.config.get('MESSAGE_ID_CACHE_WARM_DAYS', DEFAULT_WARM_DAYS))
+    )
+    app.logger.info(f"Message-ID cache warmed with {loaded} entries")
+    return loaded
@@ -0,0 +1,249 @@
+"""
+Per-user, per-day rollup of the report metrics.
+
+Each lead, opportunity and task adds a fixed contribution to the rollup row
+of its owner and day (leads and tasks by creation date, opportunities by
+close date, falling back to creation date). Mapper events apply the
+difference between a row's old and new contribution in the flushing
+transaction, so analytics only sums a few rollup rows per user instead of
+scanning the raw tables. Rows inserted with bulk statements, which bypass
+the unit of work, are reported through record_bulk_inserts;
+rebuild_metrics_rollup recomputes everything from the raw tables.
+"""
+from datetime import datetime
+
+from sqlalchemy import event, inspect, update, insert, delete, text
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import MetricsRollup, Lead, Opportunity, Task
+from extensions import db
+
+# Constants
+PIPELINE_STAGES = ('Initial Contact', 'Qualification', 'Proposal', 'Negotiation')
+TASK_STATUS_COLUMNS = {
+    'New': 'task_new_count',
+    'In Progress': 'task_in_progress_count',
+    'Completed': 'task_completed_count'
+}
+
+# 集計に影響する属性（変更前の値を必ず読み込む）
+TRACKED_ATTRIBUTES = {
+    Lead: ('user_id', 'created_at'),
+    Opportunity: ('user_id', 'created_at', 'stage', 'amount', 'close_date'),
+    Task: ('user_id', 'created_at', 'status'),
+}
+
+# 生データからの再集計（DATE() は SQLite と PostgreSQL の両方で使用できる）
+REBUILD_SQL = """
+INSERT INTO metrics_rollups (
+    user_id, day, lead_count, won_count, won_amount, won_amount_count, revenue,
+    pipeline_amount, task_new_count, task_in_progress_count, task_completed_count, updated_at
+)
+SELECT user_id, day, SUM(lead_count), SUM(won_count), SUM(won_amount), SUM(won_amount_count),
+       SUM(revenue), SUM(pipeline_amount), SUM(task_new_count), SUM(task_in_progress_count),
+       SUM(task_completed_count), CURRENT_TIMESTAMP
+FROM (
+    SELECT user_id, DATE(COALESCE(created_at, CURRENT_TIMESTAMP)) AS day,
+           1 AS lead_count, 0 AS won_count, 0.0 AS won_amount, 0 AS won_amount_count,
+           0.0 AS revenue, 0.0 AS pipeline_amount,
+           0 AS task_new_count, 0 AS task_in_progress_count, 0 AS task_completed_count
+    FROM leads {where}
+    UNION ALL
+    SELECT user_id, DATE(COALESCE(close_date, created_at, CURRENT_TIMESTAMP)),
+           0,
+           CASE WHEN stage = 'Closed Won' THEN 1 ELSE 0 END,
+           CASE WHEN stage = 'Closed Won' AND amount IS NOT NULL THEN amount ELSE 0.0 END,
+           CASE WHEN stage = 'Closed Won' AND amount IS NOT NULL THEN 1 ELSE 0 END,
+           CASE WHEN stage = 'Closed Won' AND amount IS NOT NULL AND close_date IS NOT NULL
+                THEN amount ELSE 0.0 END,
+           CASE WHEN stage IN ('Initial Contact', 'Qualification', 'Proposal', 'Negotiation')
+                THEN COALESCE(amount, 0.0) ELSE 0.0 END,
+           0, 0, 0
+    FROM opportunities {where}
+    UNION ALL
+    SELECT user_id, DATE(COALESCE(created_at, CURRENT_TIMESTAMP)),
+           0, 0, 0.0, 0, 0.0, 0.0,
+           CASE WHEN status = 'New' THEN 1 ELSE 0 END,
+           CASE WHEN status = 'In Progress' THEN 1 ELSE 0 END,
+           CASE WHEN status = 'Completed' THEN 1 ELSE 0 END
+    FROM tasks {where}
+) contributions
+GROUP BY user_id, day
+"""
+
+
+def _day(value):
+    value = value or datetime.utcnow()
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _lead_contribution(get):
+    return get('user_id'), _day(get('created_at')), {'lead_count': 1}
+
+
+def _opportunity_contribution(get):
+    stage = get('stage')
+    amount = get('amount')
+    close_date = get('close_date')
+
+    deltas = {}
+    if stage == 'Closed Won':
+        deltas['won_count'] = 1
+        if amount is not None:
+            deltas['won_amount'] = amount
+            deltas['won_amount_count'] = 1
+            if close_date is not None:
+                deltas['revenue'] = amount
+    elif stage in PIPELINE_STAGES:
+        deltas['pipeline_amount'] = amount or 0.0
+    return get('user_id'), _day(close_date or get('created_at')), deltas
+
+
+def _task_contribution(get):
+    column = TASK_STATUS_COLUMNS.get(get('status'))
+    return get('user_id'), _day(get('created_at')), ({column: 1} if column else {})
+
+
+CONTRIBUTIONS = {
+    Lead: _lead_contribution,
+    Opportunity: _opportunity_contribution,
+    Task: _task_contribution,
+}
+
+
+def apply_rollup_delta(connection, user_id, day, deltas):
+    """
+    Add deltas to one rollup row, creating it if needed
+
+    Args:
+        connection: Connection of the current transaction
+        user_id: Owner of the rollup row
+        day: Rollup date
+        deltas: {column: amount to add}
+    """
+    deltas = {column: value for column, value in deltas.items() if value}
+    if user_id is None or not deltas:
+        return
+
+    table = MetricsRollup.__table__
+    now = datetime.utcnow()
+    dialect_name = connection.dialect.name
+
+    if dialect_name in ('postgresql', 'sqlite'):
+        dialect_insert = postgresql.insert if dialect_name == 'postgresql' else sqlite.insert
+        stmt = dialect_insert(table).values(user_id=user_id, day=day, updated_at=now, **deltas)
+        set_ = {column: table.c[column] + stmt.excluded[column] for column in deltas}
+        set_['updated_at'] = now
+        connection.execute(stmt.on_conflict_do_update(index_elements=['user_id', 'day'], set_=set_))
+        return
+
+    result = connection.execute(
+        update(table)
+        .where(table.c.user_id == user_id, table.c.day == day)
+        .values(updated_at=now, **{column: table.c[column] + value for column, value in deltas.items()})
+    )
+    if not result.rowcount:
+        connection.execute(insert(table).values(user_id=user_id, day=day, updated_at=now, **deltas))
+
+
+def record_bulk_inserts(connection, instances):
+    """
+    Add the contributions of rows inserted with a bulk INSERT ... RETURNING
+
+    Mapper events do not fire for bulk statements, so their callers report
+    the returned objects here.
+
+    Args:
+        connection: Connection of the inserting transaction
+        instances: Lead, Opportunity or Task objects that were inserted
+    """
+    for instance in instances:
+        _apply_contribution(connection, CONTRIBUTIONS[type(instance)](_current_getter(instance)), 1)
+
+
+def _apply_contribution(connection, contribution, sign):
+    user_id, day, deltas = contribution
+    apply_rollup_delta(connection, user_id, day, {column: sign * value for column, value in deltas.items()})
+
+
+def _previous_getter(target):
+    state = inspect(target)
+
+    def get(name):
+        history = state.attrs[name].history
+        if history.deleted:
+            return history.deleted[0]
+        return getattr(target, name)
+    return get
+
+
+def _current_getter(target):
+    return lambda name: getattr(target, name)
+
+
+def _after_insert(mapper, connection, target):
+    _apply_contribution(connection, CONTRIBUTIONS[mapper.class_](_current_getter(target)), 1)
+
+
+def _after_update(mapper, connection, target):
+    state = inspect(target)
+    if not any(state.attrs[name].history.has_changes() for name in TRACKED_ATTRIBUTES[mapper.class_]):
+        return
+    contribute = CONTRIBUTIONS[mapper.class_]
+    old = contribute(_previous_getter(target))
+    new = contribute(_current_getter(target))
+    if old[:2] == new[:2]:
+        # 同じ行への変更は差分を1回で適用する
+        user_id, day, deltas = new
+        merged = dict(deltas)
+        for column, value in old[2].items():
+            merged[column] = merged.get(column, 0) - value
+        apply_rollup_delta(connection, user_id, day, merged)
+    else:
+        _apply_contribution(connection, old, -1)
+        _apply_contribution(connection, new, 1)
+
+
+def _before_delete(mapper, connection, target):
+    # 削除後は期限切れの属性を読み込めないため、行が残っているうちに差し引く
+    _apply_contribution(connection, CONTRIBUTIONS[mapper.class_](_previous_getter(target)), -1)
+
+
+def _load_previous_value(target, value, oldvalue, initiator):
+    pass
+
+
+for _model, _attributes in TRACKED_ATTRIBUTES.items():
+    event.listen(_model, 'after_insert', _after_insert)
+    event.listen(_model, 'after_update', _after_update)
+    event.listen(_model, 'before_delete', _before_delete)
+    for _name in _attributes:
+        # 未読み込みの属性を変更した場合も変更前の値を履歴に残す
+        event.listen(getattr(_model, _name), 'set', _load_previous_value, active_history=True)
+
+
+def rebuild_metrics_rollup(user_id=None):
+    """
+    Recompute the rollup from the leads, opportunities and tasks tables
+
+    Args:
+        user_id: Only rebuild this user's rows (all users when None)
+
+    Returns:
+        int: Number of rollup rows written
+    """
+    table = MetricsRollup.__table__
+    params = {}
+    where = ''
+    clear = delete(table)
+    if user_id is not None:
+        where = 'WHERE user_id = :user_id'
+        params['user_id'] = user_id
+        clear = clear.where(table.c.user_id == user_id)
+
+    db.session.execute(clear)
+    db.session.execute(text(REBUILD_SQL.format(where=where)), params)
+    count_query = db.session.query(MetricsRollup)
+    if user_id is not None:
+        count_query = count_query.filter(MetricsRollup.user_id == user_id)
+    return count_query.count()
@@ -0,0 +1,32 @@
+"""Add UID checkpoints to email fetch tracker
+
+Revision ID: 3f1d8a6c2b90
+Revises: 66c91956c1a2
+Create Date: 2024-11-28 14:20:11.402318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1d8a6c2b90'
+down_revision = '66c91956c1a2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('email_fetch_tracker', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('folder', sa.String(length=100), server_default='INBOX', nullable=False))
+        batch_op.add_column(sa.Column('uid_validity', sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column('last_seen_uid', sa.BigInteger(), nullable=True))
+        batch_op.create_index('ix_email_fetch_tracker_user_folder', ['user_id', 'folder'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('email_fetch_tracker', schema=None) as batch_op:
+        batch_op.drop_index('ix_email_fetch_tracker_user_folder')
+        batch_op.drop_column('last_seen_uid')
+        batch_op.drop_column('uid_validity')
+        batch_op.drop_column('folder')
@@ -0,0 +1,35 @@
+"""Add per-user sender domain reputation table
+
+Revision ID: 4d6f0c2a8e57
+Revises: e7b3d90a5c14
+Create Date: 2024-12-02 11:26:51.093144
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d6f0c2a8e57'
+down_revision = 'e7b3d90a5c14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sender_domain_reputation',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('domain', sa.String(length=255), nullable=False),
+        sa.Column('spam_count', sa.Integer(), nullable=False),
+        sa.Column('ham_count', sa.Integer(), nullable=False),
+        sa.Column('last_seen_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'domain', name='uq_sender_domain_reputation_user_domain')
+    )
+
+
+def downgrade():
+    op.drop_table('sender_domain_reputation')
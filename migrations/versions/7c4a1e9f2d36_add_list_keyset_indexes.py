@@ -0,0 +1,36 @@
+"""Add indexes for keyset pagination of list views
+
+Revision ID: 7c4a1e9f2d36
+Revises: 5e8f2b6d0c71
+Create Date: 2024-12-06 09:14:37.208415
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c4a1e9f2d36'
+down_revision = '5e8f2b6d0c71'
+branch_labels = None
+depends_on = None
+
+# 一覧画面の既定の並び順（ユーザー + ソート列 + id）
+KEYSET_INDEXES = [
+    ('leads', 'ix_leads_user_last_contact_id', ['user_id', 'last_contact', 'id']),
+    ('tasks', 'ix_tasks_user_due_date_id', ['user_id', 'due_date', 'id']),
+    ('schedules', 'ix_schedules_user_start_time_id', ['user_id', 'start_time', 'id']),
+    ('opportunities', 'ix_opportunities_user_close_date_id', ['user_id', 'close_date', 'id']),
+]
+
+
+def upgrade():
+    for table, index_name, columns in KEYSET_INDEXES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_index(index_name, columns, unique=False)
+
+
+def downgrade():
+    for table, index_name, columns in reversed(KEYSET_INDEXES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(index_name)
@@ -0,0 +1,50 @@
+"""Add analysis job queue and email analysis status
+
+Revision ID: 8a4e2c7d91f3
+Revises: 3f1d8a6c2b90
+Create Date: 2024-11-28 16:05:42.118904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a4e2c7d91f3'
+down_revision = '3f1d8a6c2b90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('analysis_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['email_id'], ['emails.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('analysis_jobs', schema=None) as batch_op:
+        batch_op.create_index('ix_analysis_jobs_status_next_attempt', ['status', 'next_attempt_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_analysis_jobs_email_id'), ['email_id'], unique=False)
+
+    with op.batch_alter_table('emails', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('ai_analysis_status', sa.String(length=20), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('emails', schema=None) as batch_op:
+        batch_op.drop_column('ai_analysis_status')
+
+    with op.batch_alter_table('analysis_jobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_analysis_jobs_email_id'))
+        batch_op.drop_index('ix_analysis_jobs_status_next_attempt')
+
+    op.drop_table('analysis_jobs')
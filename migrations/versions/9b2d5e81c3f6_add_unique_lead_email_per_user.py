@@ -0,0 +1,80 @@
+"""Add unique (user_id, email) index on leads for bulk lead upserts
+
+Duplicate leads of a user with the same email are merged into the lead with
+the lowest id before the index is created. This is a one-way data migration:
+downgrade only drops the index and does not restore the merged leads.
+
+Revision ID: 9b2d5e81c3f6
+Revises: 4d6f0c2a8e57
+Create Date: 2024-12-03 09:42:17.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b2d5e81c3f6'
+down_revision = '4d6f0c2a8e57'
+branch_labels = None
+depends_on = None
+
+LEAD_REFERENCING_TABLES = ['emails', 'tasks', 'schedules', 'opportunities', 'behavior_patterns']
+
+# 同一ユーザー・同一メールアドレスの重複リード（最小ID以外）
+DUPLICATE_LEADS = (
+    "SELECT l.id FROM leads l WHERE l.email IS NOT NULL AND EXISTS ("
+    "SELECT 1 FROM leads k WHERE k.user_id = l.user_id AND k.email = l.email AND k.id < l.id)"
+)
+
+# 重複を持つ最小IDのリード（統合先）
+SURVIVING_LEADS = (
+    "SELECT k.id FROM leads k WHERE k.email IS NOT NULL AND EXISTS ("
+    "SELECT 1 FROM leads l WHERE l.user_id = k.user_id AND l.email = k.email AND l.id > k.id) "
+    "AND NOT EXISTS ("
+    "SELECT 1 FROM leads l WHERE l.user_id = k.user_id AND l.email = k.email AND l.id < k.id)"
+)
+
+SAME_LEAD_GROUP = "d.user_id = leads.user_id AND d.email = leads.email"
+
+# 統合先に重複リードの項目を反映する: 空の名前・電話番号は補完し、スコアと日時は最大値、
+# ステータスは最後に更新されたリードのものを使用する
+MERGE_DUPLICATE_COLUMNS = (
+    "UPDATE leads SET "
+    "name = COALESCE(NULLIF(name, ''), (SELECT d.name FROM leads d WHERE " + SAME_LEAD_GROUP +
+    " AND d.name <> '' ORDER BY d.id LIMIT 1), name), "
+    "phone = COALESCE(NULLIF(phone, ''), (SELECT d.phone FROM leads d WHERE " + SAME_LEAD_GROUP +
+    " AND d.phone <> '' ORDER BY d.id LIMIT 1)), "
+    "score = (SELECT MAX(d.score) FROM leads d WHERE " + SAME_LEAD_GROUP + "), "
+    "status = (SELECT d.status FROM leads d WHERE " + SAME_LEAD_GROUP +
+    " ORDER BY d.updated_at DESC, d.id DESC LIMIT 1), "
+    "last_contact = (SELECT MAX(d.last_contact) FROM leads d WHERE " + SAME_LEAD_GROUP + "), "
+    "last_followup_email = (SELECT MAX(d.last_followup_email) FROM leads d WHERE " + SAME_LEAD_GROUP + "), "
+    "last_email_opened = (SELECT MAX(d.last_email_opened) FROM leads d WHERE " + SAME_LEAD_GROUP + ") "
+    "WHERE id IN (" + SURVIVING_LEADS + ")"
+)
+
+
+def upgrade():
+    # 重複リードで入力・更新された項目が失われないよう、削除前に統合先へ反映する
+    op.execute(sa.text(MERGE_DUPLICATE_COLUMNS))
+
+    # 取り込み処理は常に最初のリードを使用していたため、重複リードの関連データを最小IDのリードに統合する
+    for table in LEAD_REFERENCING_TABLES:
+        op.execute(sa.text(
+            f"UPDATE {table} SET lead_id = ("
+            f"SELECT MIN(k.id) FROM leads k JOIN leads l "
+            f"ON k.user_id = l.user_id AND k.email = l.email "
+            f"WHERE l.id = {table}.lead_id) "
+            f"WHERE lead_id IN ({DUPLICATE_LEADS})"
+        ))
+    op.execute(sa.text(f"DELETE FROM leads WHERE id IN ({DUPLICATE_LEADS})"))
+
+    with op.batch_alter_table('leads', schema=None) as batch_op:
+        batch_op.create_index('uq_leads_user_email', ['user_id', 'email'], unique=True)
+
+
+def downgrade():
+    # 統合・削除した重複リードは復元しない（インデックスのみ削除する）
+    with op.batch_alter_table('leads', schema=None) as batch_op:
+        batch_op.drop_index('uq_leads_user_email')
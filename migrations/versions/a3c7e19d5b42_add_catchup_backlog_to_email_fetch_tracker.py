@@ -0,0 +1,28 @@
+"""Add catch-up backlog UID range to email fetch tracker
+
+Revision ID: a3c7e19d5b42
+Revises: 9b2d5e81c3f6
+Create Date: 2024-12-04 16:08:33.217640
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c7e19d5b42'
+down_revision = '9b2d5e81c3f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('email_fetch_tracker', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('backlog_next_uid', sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column('backlog_end_uid', sa.BigInteger(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('email_fetch_tracker', schema=None) as batch_op:
+        batch_op.drop_column('backlog_end_uid')
+        batch_op.drop_column('backlog_next_uid')
@@ -0,0 +1,78 @@
+"""Add per-user daily metrics rollup table
+
+Revision ID: b81d4f6a9e23
+Revises: 7c4a1e9f2d36
+Create Date: 2024-12-06 15:42:18.517230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b81d4f6a9e23'
+down_revision = '7c4a1e9f2d36'
+branch_labels = None
+depends_on = None
+
+# 既存データからの初期集計（metrics_rollup.REBUILD_SQL と同じ内容）
+BACKFILL_SQL = """
+INSERT INTO metrics_rollups (
+    user_id, day, lead_count, won_count, won_amount, won_amount_count, revenue,
+    pipeline_amount, task_new_count, task_in_progress_count, task_completed_count, updated_at
+)
+SELECT user_id, day, SUM(lead_count), SUM(won_count), SUM(won_amount), SUM(won_amount_count),
+       SUM(revenue), SUM(pipeline_amount), SUM(task_new_count), SUM(task_in_progress_count),
+       SUM(task_completed_count), CURRENT_TIMESTAMP
+FROM (
+    SELECT user_id, DATE(COALESCE(created_at, CURRENT_TIMESTAMP)) AS day,
+           1 AS lead_count, 0 AS won_count, 0.0 AS won_amount, 0 AS won_amount_count,
+           0.0 AS revenue, 0.0 AS pipeline_amount,
+           0 AS task_new_count, 0 AS task_in_progress_count, 0 AS task_completed_count
+    FROM leads
+    UNION ALL
+    SELECT user_id, DATE(COALESCE(close_date, created_at, CURRENT_TIMESTAMP)),
+           0,
+           CASE WHEN stage = 'Closed Won' THEN 1 ELSE 0 END,
+           CASE WHEN stage = 'Closed Won' AND amount IS NOT NULL THEN amount ELSE 0.0 END,
+           CASE WHEN stage = 'Closed Won' AND amount IS NOT NULL THEN 1 ELSE 0 END,
+           CASE WHEN stage = 'Closed Won' AND amount IS NOT NULL AND close_date IS NOT NULL
+                THEN amount ELSE 0.0 END,
+           CASE WHEN stage IN ('Initial Contact', 'Qualification', 'Proposal', 'Negotiation')
+                THEN COALESCE(amount, 0.0) ELSE 0.0 END,
+           0, 0, 0
+    FROM opportunities
+    UNION ALL
+    SELECT user_id, DATE(COALESCE(created_at, CURRENT_TIMESTAMP)),
+           0, 0, 0.0, 0, 0.0, 0.0,
+           CASE WHEN status = 'New' THEN 1 ELSE 0 END,
+           CASE WHEN status = 'In Progress' THEN 1 ELSE 0 END,
+           CASE WHEN status = 'Completed' THEN 1 ELSE 0 END
+    FROM tasks
+) contributions
+GROUP BY user_id, day
+"""
+
+
+def upgrade():
+    op.create_table('metrics_rollups',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('lead_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('won_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('won_amount', sa.Float(), server_default=sa.text('0'), nullable=False),
+        sa.Column('won_amount_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('revenue', sa.Float(), server_default=sa.text('0'), nullable=False),
+        sa.Column('pipeline_amount', sa.Float(), server_default=sa.text('0'), nullable=False),
+        sa.Column('task_new_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('task_in_progress_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('task_completed_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('user_id', 'day')
+    )
+    op.execute(sa.text(BACKFILL_SQL))
+
+
+def downgrade():
+    op.drop_table('metrics_rollups')
@@ -0,0 +1,28 @@
+"""Add content hash column and duplicate lookup index to emails
+
+Revision ID: c52e9b1f47a8
+Revises: 8a4e2c7d91f3
+Create Date: 2024-11-29 10:12:37.402815
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c52e9b1f47a8'
+down_revision = '8a4e2c7d91f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('emails', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.create_index('ix_emails_user_sender_content_hash', ['user_id', 'sender', 'content_hash'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('emails', schema=None) as batch_op:
+        batch_op.drop_index('ix_emails_user_sender_content_hash')
+        batch_op.drop_column('content_hash')
@@ -0,0 +1,68 @@
+"""Backfill content hashes of emails stored before c52e9b1f47a8
+
+Messages without a Message-ID are matched by content hash, so rows stored
+before the column existed would be ingested again by a catch-up rescan.
+Rows inserted while this runs can be filled in later with
+`flask backfill-email-content-hash`.
+
+Revision ID: d4a7f2c9e815
+Revises: b81d4f6a9e23
+Create Date: 2024-12-09 10:27:51.304618
+
+"""
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a7f2c9e815'
+down_revision = 'b81d4f6a9e23'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+emails = sa.table(
+    'emails',
+    sa.column('id', sa.Integer),
+    sa.column('subject', sa.String),
+    sa.column('content', sa.Text),
+    sa.column('content_hash', sa.String),
+)
+
+
+def _content_hash(subject, content):
+    # email_receiver.generate_content_hash と同じ計算（保存済みの件名・本文は文字列）
+    normalized_subject = (subject or '').replace('\x00', '').strip().lower()
+    normalized_content = (content or '').replace('\x00', '').strip().lower()
+    combined = f"{normalized_subject}\n{normalized_content}"
+    return hashlib.sha256(combined.encode('utf-8')).hexdigest()[:12]
+
+
+def upgrade():
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(emails.c.id, emails.c.subject, emails.c.content)
+            .where(emails.c.content_hash.is_(None), emails.c.id > last_id)
+            .order_by(emails.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+
+        connection.execute(
+            emails.update()
+            .where(emails.c.id == sa.bindparam('row_id'))
+            .values(content_hash=sa.bindparam('hash')),
+            [{'row_id': row.id, 'hash': _content_hash(row.subject, row.content)} for row in rows]
+        )
+        last_id = rows[-1].id
+
+
+def downgrade():
+    # ハッシュは c52e9b1f47a8 の列に格納されており、残しても問題ないため何もしない
+    pass
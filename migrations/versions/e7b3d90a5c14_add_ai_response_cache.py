@@ -0,0 +1,44 @@
+"""Add persistent AI response cache
+
+Revision ID: e7b3d90a5c14
+Revises: c52e9b1f47a8
+Create Date: 2024-11-29 15:40:08.631297
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b3d90a5c14'
+down_revision = 'c52e9b1f47a8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ai_response_cache',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('cache_key', sa.String(length=64), nullable=False),
+        sa.Column('function', sa.String(length=50), nullable=False),
+        sa.Column('model', sa.String(length=50), nullable=False),
+        sa.Column('prompt_version', sa.String(length=20), nullable=False),
+        sa.Column('response', sa.Text(), nullable=False),
+        sa.Column('hit_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('last_accessed_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('cache_key')
+    )
+    with op.batch_alter_table('ai_response_cache', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ai_response_cache_expires_at'), ['expires_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_ai_response_cache_last_accessed_at'), ['last_accessed_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ai_response_cache', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ai_response_cache_last_accessed_at'))
+        batch_op.drop_index(batch_op.f('ix_ai_response_cache_expires_at'))
+
+    op.drop_table('ai_response_cache')
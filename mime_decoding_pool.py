@@ -0,0 +1,129 @@
+"""
+Process pool for CPU-bound MIME decoding during email ingestion.
+
+Raw RFC822 bytes are sent to worker processes, which parse the message,
+decode headers and body (charset detection, ISO-2022-JP normalization,
+clean_string) and return a headers-only message carrying the decoded
+fields. The ingesting thread is left with the duplicate checks and DB
+writes, so a large backlog is decoded on all cores.
+"""
+import atexit
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from email.message import Message
+from threading import Lock
+
+from flask import Flask, current_app
+
+# 親プロセスから引き継ぐ設定（解析に必要なもののみ）
+WORKER_CONFIG_KEYS = ('EMAIL_STREAMING_PARSER', 'EMAIL_MAX_TEXT_PART_BYTES')
+
+_pool = None
+_pool_lock = Lock()
+
+
+def _init_worker(config):
+    """Push a bare app context so the decoders can use current_app.logger/config"""
+    worker_app = Flask('mime_decoding_worker')
+    worker_app.config.update(config)
+    worker_app.app_context().push()
+
+
+def decode_raw_message(raw):
+    """
+    Parse and decode a raw message in a worker process
+
+    Args:
+        raw: Raw message bytes
+
+    Returns:
+        Message: Headers-only message whose parsed_fields attribute holds the
+        fields returned by email_receiver.extract_message_fields
+    """
+    from email_receiver import parse_email_body, extract_message_fields
+
+    msg = parse_email_body(raw, current_app)
+    header_msg = Message()
+    for name, value in msg.items():
+        header_msg[name] = value
+    header_msg.parsed_fields = extract_message_fields(msg)
+    return header_msg
+
+
+def get_mime_decoding_pool(app):
+    """
+    Return the shared decoding pool, or None when EMAIL_PARSE_PROCESSES is 0
+
+    Args:
+        app: Flask app object
+
+    Returns:
+        ProcessPoolExecutor or None
+    """
+    global _pool
+    processes = int(app.config.get('EMAIL_PARSE_PROCESSES', 0))
+    if processes < 0:
+        processes = os.cpu_count() or 1
+    if not processes:
+        return None
+
+    with _pool_lock:
+        if _pool is None:
+            config = {key: app.config.get(key) for key in WORKER_CONFIG_KEYS if key in app.config}
+            # スケジューラーのスレッドが保持するロックを引き継がないよう、fork ではなく spawn で起動する
+            _pool = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(config,)
+            )
+            app.logger.info(f"Started MIME decoding pool with {processes} processes")
+        return _pool
+
+
+def reset_mime_decoding_pool(pool):
+    """Discard a broken pool so the next call starts a fresh one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def decode_messages(pool, bodies, app):
+    """
+    Decode raw messages on the pool, in order
+
+    Args:
+        pool: ProcessPoolExecutor from get_mime_decoding_pool
+        bodies: List of (uid_bytes, raw bytes)
+        app: Flask app object
+
+    Yields:
+        tuple: (uid_bytes, Message or None); None when decoding failed
+    """
+    try:
+        futures = [(uid, pool.submit(decode_raw_message, raw)) for uid, raw in bodies]
+    except (BrokenProcessPool, RuntimeError) as e:
+        app.logger.error(f"MIME decoding pool unavailable: {str(e)}")
+        reset_mime_decoding_pool(pool)
+        raise
+
+    for uid, future in futures:
+        try:
+            yield uid, future.result()
+        except BrokenProcessPool:
+            reset_mime_decoding_pool(pool)
+            raise
+        except Exception as e:
+            app.logger.error(f"Error decoding message UID {uid!r}: {str(e)}", exc_info=True)
+            yield uid, None
+
+
+@atexit.register
+def _shutdown_pool():
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
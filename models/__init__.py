@@ -12,6 +12,11 @@ from .subscription import SubscriptionPlan, Subscription
 from .email_fetch_tracker import EmailFetchTracker
 from .system_changes import SystemChange, RollbackHistory
 from .unknown_email import UnknownEmail
+from .analysis_job import AnalysisJob
+from .ai_response_cache import AIResponseCache
+from .sender_domain_reputation import SenderDomainReputation
+from .scheduler_lease import SchedulerLease
+from .metrics_rollup import MetricsRollup
 
 __all__ = [
     'User',
@@ -28,5 +33,10 @@ __all__ = [
     'EmailFetchTracker',
     'SystemChange',
     'RollbackHistory',
-    'UnknownEmail'
+    'UnknownEmail',
+    'AnalysisJob',
+    'AIResponseCache',
+    'SenderDomainReputation',
+    'SchedulerLease',
+    'MetricsRollup'
 ]
@@ -0,0 +1,22 @@
+from datetime import datetime
+from extensions import db
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, String, Text, DateTime
+
+
+class AIResponseCache(db.Model):
+    __tablename__ = 'ai_response_cache'
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # モデル・プロンプトバージョン・正規化済み入力から計算したキー
+    cache_key: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    function: Mapped[str] = mapped_column(String(50), nullable=False)
+    model: Mapped[str] = mapped_column(String(50), nullable=False)
+    prompt_version: Mapped[str] = mapped_column(String(20), nullable=False)
+    response: Mapped[str] = mapped_column(Text, nullable=False)
+    hit_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    last_accessed_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<AIResponseCache {self.function} {self.cache_key[:12]}>'
@@ -0,0 +1,30 @@
+from datetime import datetime
+from extensions import db
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import Integer, String, Text, DateTime, ForeignKey, Index
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .email import Email
+
+class AnalysisJob(db.Model):
+    __tablename__ = 'analysis_jobs'
+    __table_args__ = (
+        Index('ix_analysis_jobs_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    email_id: Mapped[int] = mapped_column(Integer, ForeignKey('emails.id'), nullable=False, index=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'), nullable=False)
+    # pending / processing / completed / failed
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default='pending')
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # リレーションシップ
+    email: Mapped["Email"] = relationship("Email")
+
+    def __repr__(self):
+        return f'<AnalysisJob {self.id} email={self.email_id} {self.status}>'
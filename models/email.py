@@ -1,7 +1,7 @@
 from datetime import datetime
 from extensions import db
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import Integer, String, Text, DateTime, ForeignKey, Boolean, Index
 from typing import Optional, List, TYPE_CHECKING
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -13,18 +13,25 @@ if TYPE_CHECKING:
 
 class Email(db.Model):
     __tablename__ = 'emails'
+    __table_args__ = (
+        Index('ix_emails_user_sender_content_hash', 'user_id', 'sender', 'content_hash'),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     message_id: Mapped[str] = mapped_column(String(255), unique=True, nullable=True)
     sender: Mapped[str] = mapped_column(String(120), nullable=False)
     sender_name: Mapped[str] = mapped_column(String(255))
     subject: Mapped[str] = mapped_column(String(200))
     content: Mapped[str] = mapped_column(Text)
+    # 重複検出用の正規化済みコンテンツハッシュ（generate_content_hash）
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
     received_date: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     lead_id: Mapped[int] = mapped_column(Integer, ForeignKey('leads.id'), nullable=False)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'), nullable=False)
     ai_analysis: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     ai_analysis_date: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     ai_model_used: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
+    # AI分析の状態: pending / processing / completed / failed / skipped
+    ai_analysis_status: Mapped[Optional[str]] = mapped_column(String(20), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
 
     # リレーションシップ
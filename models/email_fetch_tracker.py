@@ -1,12 +1,23 @@
 from datetime import datetime
 from extensions import db
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import Integer, DateTime, ForeignKey
+from sqlalchemy import Integer, BigInteger, String, DateTime, ForeignKey, Index
+from typing import Optional
 
 class EmailFetchTracker(db.Model):
     __tablename__ = 'email_fetch_tracker'
+    __table_args__ = (
+        Index('ix_email_fetch_tracker_user_folder', 'user_id', 'folder'),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     last_fetch_time: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'), nullable=False)
+    # UIDベースの差分同期用チェックポイント（メールボックス・フォルダ単位）
+    folder: Mapped[str] = mapped_column(String(100), nullable=False, default='INBOX', server_default='INBOX')
+    uid_validity: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    last_seen_uid: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    # キャッチアップ中のバックログUID範囲（両端を含む）。処理済みのチャンクごとに進める
+    backlog_next_uid: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    backlog_end_uid: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
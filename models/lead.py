@@ -1,7 +1,7 @@
 from datetime import datetime
 from extensions import db
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, Float, DateTime, ForeignKey, text
+from sqlalchemy import Integer, String, Float, DateTime, ForeignKey, Index, text
 from typing import Optional, List, TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -14,6 +14,12 @@ if TYPE_CHECKING:
 
 class Lead(db.Model):
     __tablename__ = 'leads'
+    __table_args__ = (
+        # メール取り込みの一括アップサート（ON CONFLICT）の競合判定に使用する
+        Index('uq_leads_user_email', 'user_id', 'email', unique=True),
+        # 一覧のキーセットページネーション（既定の並び順）に使用する
+        Index('ix_leads_user_last_contact_id', 'user_id', 'last_contact', 'id'),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     email: Mapped[Optional[str]] = mapped_column(String(120), nullable=True)
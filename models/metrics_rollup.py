@@ -0,0 +1,28 @@
+from datetime import datetime, date
+from extensions import db
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, Float, Date, DateTime, ForeignKey, text
+
+class MetricsRollup(db.Model):
+    __tablename__ = 'metrics_rollups'
+    # ユーザー・日付ごとの集計値（各行の寄与を加算したもの）
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    lead_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default=text('0'))
+    won_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default=text('0'))
+    won_amount: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default=text('0'))
+    won_amount_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default=text('0'))
+    revenue: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default=text('0'))
+    pipeline_amount: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default=text('0'))
+    task_new_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default=text('0'))
+    task_in_progress_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default=text('0'))
+    task_completed_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default=text('0'))
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        nullable=False,
+        default=datetime.utcnow,
+        server_default=text('CURRENT_TIMESTAMP')
+    )
+
+    def __repr__(self):
+        return f'<MetricsRollup user={self.user_id} day={self.day}>'
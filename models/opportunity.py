@@ -1,7 +1,7 @@
 from datetime import datetime
 from extensions import db
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, Float, DateTime, ForeignKey, Boolean
+from sqlalchemy import Integer, String, Float, DateTime, ForeignKey, Boolean, Index
 from typing import Optional
 from typing import TYPE_CHECKING
 
@@ -12,6 +12,10 @@ if TYPE_CHECKING:
 
 class Opportunity(db.Model):
     __tablename__ = 'opportunities'
+    __table_args__ = (
+        # 一覧のキーセットページネーション（既定の並び順）に使用する
+        Index('ix_opportunities_user_close_date_id', 'user_id', 'close_date', 'id'),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(100), nullable=False)
     stage: Mapped[str] = mapped_column(String(20), nullable=False)
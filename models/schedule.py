@@ -1,11 +1,15 @@
 from datetime import datetime
 from extensions import db
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import Integer, String, Text, DateTime, ForeignKey, Boolean, Index
 from typing import Optional
 
 class Schedule(db.Model):
     __tablename__ = 'schedules'
+    __table_args__ = (
+        # 一覧のキーセットページネーション（既定の並び順）に使用する
+        Index('ix_schedules_user_start_time_id', 'user_id', 'start_time', 'id'),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     title: Mapped[str] = mapped_column(String(100), nullable=False)
     description: Mapped[str] = mapped_column(Text)
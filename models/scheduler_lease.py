@@ -0,0 +1,17 @@
+from datetime import datetime
+from extensions import db
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, DateTime
+
+class SchedulerLease(db.Model):
+    __tablename__ = 'scheduler_leases'
+    # リース名（例: email_ingestion）ごとに1行
+    name: Mapped[str] = mapped_column(String(100), primary_key=True)
+    # 保持しているプロセス（ホスト名:PID:ランダム値）
+    holder: Mapped[str] = mapped_column(String(255), nullable=False)
+    acquired_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    renewed_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<SchedulerLease {self.name} holder={self.holder} expires={self.expires_at}>'
@@ -0,0 +1,21 @@
+from datetime import datetime
+from extensions import db
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, String, DateTime, ForeignKey, UniqueConstraint
+
+class SenderDomainReputation(db.Model):
+    __tablename__ = 'sender_domain_reputation'
+    __table_args__ = (
+        UniqueConstraint('user_id', 'domain', name='uq_sender_domain_reputation_user_domain'),
+    )
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'), nullable=False)
+    domain: Mapped[str] = mapped_column(String(255), nullable=False)
+    # 一斉配信メール判定の累積結果
+    spam_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    ham_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_seen_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<SenderDomainReputation {self.domain} spam={self.spam_count} ham={self.ham_count}>'
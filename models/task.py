@@ -1,7 +1,7 @@
 from datetime import datetime
 from extensions import db
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, Text, DateTime, ForeignKey, Boolean, text
+from sqlalchemy import Integer, String, Text, DateTime, ForeignKey, Boolean, Index, text
 from typing import Optional, TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -10,6 +10,10 @@ if TYPE_CHECKING:
 
 class Task(db.Model):
     __tablename__ = 'tasks'
+    __table_args__ = (
+        # 一覧のキーセットページネーション（既定の並び順）に使用する
+        Index('ix_tasks_user_due_date_id', 'user_id', 'due_date', 'id'),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     title: Mapped[str] = mapped_column(String(100), nullable=False)
     description: Mapped[str] = mapped_column(Text)
@@ -1,4 +1,5 @@
 from datetime import datetime
+from functools import lru_cache
 import json
 from cryptography.fernet import Fernet
 import base64
@@ -11,6 +12,12 @@ from typing import Optional, TYPE_CHECKING
 if TYPE_CHECKING:
     from .user import User
 
+
+@lru_cache(maxsize=1024)
+def _decrypt_cached(encryption_key, data):
+    """Fernet復号の結果を暗号文ごとにキャッシュする（暗号文は暗号化のたびに変わる）"""
+    return Fernet(encryption_key).decrypt(data.encode()).decode()
+
 class UserSettings(db.Model):
     __tablename__ = 'user_settings'
     
@@ -42,8 +49,7 @@ class UserSettings(db.Model):
     def _decrypt(self, data):
         if not data:
             return None
-        f = Fernet(self._get_encryption_key())
-        return f.decrypt(data.encode()).decode()
+        return _decrypt_cached(self._get_encryption_key(), data)
 
     @property
     def mail_password(self):
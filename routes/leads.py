@@ -6,8 +6,10 @@ from services.analysis import ComprehensiveAnalysisService
 import json
 from datetime import datetime
 from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from ai_analysis import analyze_leads
 from forms import LeadForm
+from keyset_pagination import keyset_paginate, DEFAULT_COUNT_CAP
 
 bp = Blueprint('leads', __name__)
 
@@ -204,15 +206,16 @@ def list_leads():
     else:
         sort_field = Lead.last_contact
 
-    if sort_order == 'asc':
-        query = query.order_by(sort_field.asc().nullslast())
-    else:
-        query = query.order_by(sort_field.desc().nullslast())
-
-    # Apply pagination
-    page = request.args.get('page', 1, type=int)
+    # Apply keyset pagination (sort column + id, no OFFSET / COUNT)
     per_page = 10  # Number of leads per page
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    pagination = keyset_paginate(
+        query, sort_field, Lead.id,
+        descending=(sort_order != 'asc'),
+        cursor=request.args.get('cursor'),
+        per_page=per_page,
+        with_count=request.args.get('count') == 'approx',
+        count_cap=current_app.config.get('LIST_COUNT_CAP', DEFAULT_COUNT_CAP)
+    )
     leads = pagination.items
 
     return render_template('leads/list_leads.html', leads=leads, saved_filters=saved_filters, pagination=pagination)
@@ -271,11 +274,21 @@ def bulk_action():
     
     return redirect(url_for('leads.list_leads'))
 
+def _email_in_use(email, user_id, exclude_id=None):
+    """Whether another lead of the user already has this email address"""
+    query = Lead.query.filter(Lead.user_id == user_id, Lead.email == email)
+    if exclude_id is not None:
+        query = query.filter(Lead.id != exclude_id)
+    return db.session.query(query.exists()).scalar()
+
 @bp.route('/add', methods=['GET', 'POST'])
 @login_required
 def add_lead():
     form = LeadForm()  # フォームのインスタンスを作成
     if form.validate_on_submit():  # POSTリクエストとバリデーションチェック
+        if _email_in_use(form.email.data, current_user.id):
+            flash('このメールアドレスのリードは既に登録されています。', 'error')
+            return render_template('leads/create.html', form=form)
         lead = Lead(
             name=form.name.data,  # request.form[] の代わりに form.name.data を使用
             email=form.email.data,
@@ -285,7 +298,13 @@ def add_lead():
             user_id=current_user.id
         )
         db.session.add(lead)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # 同時に同じメールアドレスのリードが登録された場合
+            db.session.rollback()
+            flash('このメールアドレスのリードは既に登録されています。', 'error')
+            return render_template('leads/create.html', form=form)
         flash('リードが追加されました。', 'success')
         return redirect(url_for('leads.list_leads'))
     return render_template('leads/create.html', form=form)
@@ -299,12 +318,22 @@ def edit_lead(id):
         return redirect(url_for('leads.list_leads'))
     
     if request.method == 'POST':
+        # (user_id, email) は一意のため、他のリードと重複するアドレスには変更できない
+        if _email_in_use(request.form['email'], current_user.id, exclude_id=lead.id):
+            flash('このメールアドレスのリードは既に登録されています。', 'error')
+            return render_template('leads/edit_lead.html', lead=lead)
+
         lead.name = request.form['name']
         lead.email = request.form['email']
         lead.phone = request.form['phone']
         lead.status = request.form['status']
         lead.score = float(request.form['score']) if request.form['score'] else 0.0
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            flash('このメールアドレスのリードは既に登録されています。', 'error')
+            return render_template('leads/edit_lead.html', lead=Lead.query.get_or_404(id))
         flash('リードが更新されました。', 'success')
         return redirect(url_for('leads.list_leads'))
     return render_template('leads/edit_lead.html', lead=lead)
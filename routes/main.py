@@ -3,15 +3,163 @@ from flask_login import login_required, current_user
 from models import Lead, Opportunity, Task, Schedule, Email
 from extensions import db
 from datetime import datetime, timedelta
-from sqlalchemy import func, desc, and_
+from sqlalchemy import func, desc, and_, case
 from sqlalchemy.exc import SQLAlchemyError
 from ai_analysis import analyze_email, process_ai_response, summarize_email_content
 import html
 import re
 from email_encoding import convert_encoding, clean_email_content, analyze_iso2022jp_text
+from dashboard_cache import dashboard_cache, DEFAULT_TTL as DEFAULT_DASHBOARD_CACHE_TTL
 
 bp = Blueprint('main', __name__)
 
+PIPELINE_STAGES = ['Initial Contact', 'Qualification', 'Proposal', 'Negotiation']
+
+
+class DashboardPage:
+    """Page of dashboard list rows with the Pagination attributes the template uses"""
+
+    def __init__(self, items, page, per_page, total):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+
+    @property
+    def pages(self):
+        return -(-self.total // self.per_page) if self.per_page else 0
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+    @property
+    def has_next(self):
+        return self.page < self.pages
+
+    @property
+    def prev_num(self):
+        return self.page - 1 if self.has_prev else None
+
+    @property
+    def next_num(self):
+        return self.page + 1 if self.has_next else None
+
+
+def _fetch_dashboard_page(columns, filters, order_by, page, per_page):
+    """
+    Fetch one page of plain rows together with the total in a single query
+
+    The total comes from COUNT(*) OVER (), so no separate count query is
+    issued unless the page is past the end and returns no rows. Rows are
+    plain tuples and can be cached across requests.
+    """
+    page = max(page, 1)
+    rows = db.session.query(*columns, func.count().over().label('total_rows'))\
+        .filter(*filters)\
+        .order_by(*order_by)\
+        .limit(per_page)\
+        .offset((page - 1) * per_page)\
+        .all()
+    if rows:
+        total = rows[0].total_rows
+    elif page > 1:
+        # 範囲外のページでは行がなく件数を取得できないため、件数のみ別途数える
+        total = db.session.query(*columns).filter(*filters).order_by(None).count()
+    else:
+        total = 0
+    return DashboardPage(rows, page, per_page, total)
+
+
+def _opportunity_metrics(user_id, today):
+    """
+    Compute the dashboard opportunity metrics with one conditional aggregation
+
+    Returns:
+        tuple: (stage rows of (stage, count, total_amount), this month revenue,
+                previous month revenue, open pipeline total)
+    """
+    first_day_of_month = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    first_day_prev_month = (first_day_of_month - timedelta(days=1)).replace(day=1)
+    last_day_prev_month = first_day_of_month - timedelta(microseconds=1)
+
+    amount = func.coalesce(Opportunity.amount, 0.0)
+    closed_won = Opportunity.stage == 'Closed Won'
+    rows = db.session.query(
+        Opportunity.stage,
+        func.count(Opportunity.id).label('count'),
+        func.coalesce(func.sum(Opportunity.amount), 0.0).label('total_amount'),
+        func.sum(case(
+            (and_(closed_won,
+                  Opportunity.close_date >= first_day_of_month,
+                  Opportunity.close_date <= today), amount),
+            else_=0.0
+        )).label('this_month'),
+        func.sum(case(
+            (and_(closed_won,
+                  Opportunity.close_date >= first_day_prev_month,
+                  Opportunity.close_date <= last_day_prev_month), amount),
+            else_=0.0
+        )).label('previous_month'),
+        func.sum(case(
+            (Opportunity.stage.in_(PIPELINE_STAGES), amount),
+            else_=0.0
+        )).label('pipeline')
+    ).filter(
+        Opportunity.user_id == user_id
+    ).group_by(Opportunity.stage).all()
+
+    # ステージ別の行を合算して各指標を求める
+    stages = [(row.stage, row.count, float(row.total_amount or 0.0)) for row in rows]
+    this_month_revenue = sum(float(row.this_month or 0.0) for row in rows)
+    previous_month_revenue = sum(float(row.previous_month or 0.0) for row in rows)
+    total_pipeline = sum(float(row.pipeline or 0.0) for row in rows)
+    return stages, this_month_revenue, previous_month_revenue, total_pipeline
+
+
+def _build_dashboard_payload(user_id, leads_page, tasks_page, schedules_page, emails_page, per_page):
+    """Run the dashboard queries and return the template context"""
+    today = datetime.utcnow()
+    stages, this_month_revenue, previous_month_revenue, total_pipeline = \
+        _opportunity_metrics(user_id, today)
+
+    leads = _fetch_dashboard_page(
+        (Lead.id, Lead.name, Lead.email, Lead.score, Lead.status),
+        (Lead.user_id == user_id,),
+        (Lead.created_at.desc(),),
+        leads_page, per_page
+    )
+    tasks = _fetch_dashboard_page(
+        (Task.id, Task.title, Task.due_date, Task.status),
+        (Task.user_id == user_id, Task.completed == False, Task.due_date >= today),
+        (Task.due_date,),
+        tasks_page, per_page
+    )
+    schedules = _fetch_dashboard_page(
+        (Schedule.id, Schedule.title, Schedule.start_time, Schedule.end_time),
+        (Schedule.user_id == user_id, Schedule.start_time >= today),
+        (Schedule.start_time,),
+        schedules_page, per_page
+    )
+    emails = _fetch_dashboard_page(
+        (Email.id, Email.subject, Email.sender, Email.sender_name, Email.received_date),
+        (Email.user_id == user_id,),
+        (Email.received_date.desc(),),
+        emails_page, 20
+    )
+
+    return {
+        'leads': leads,
+        'opportunities': stages,
+        'tasks': tasks,
+        'schedules': schedules,
+        'emails': emails,
+        'this_month_revenue': this_month_revenue,
+        'previous_month_revenue': previous_month_revenue,
+        'total_pipeline': total_pipeline
+    }
+
+
 @bp.route('/')
 @login_required
 def dashboard():
@@ -22,74 +170,19 @@ def dashboard():
         emails_page = request.args.get('emails_page', 1, type=int)
         per_page = 5
 
-        leads = Lead.query.filter_by(user_id=current_user.id)\
-            .order_by(Lead.created_at.desc())\
-            .paginate(page=leads_page, per_page=per_page, error_out=False)
-
-        today = datetime.utcnow()
-        first_day_of_month = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        this_month_revenue = db.session.query(
-            func.coalesce(func.sum(Opportunity.amount), 0.0)
-        ).filter(
-            Opportunity.user_id == current_user.id,
-            Opportunity.stage == 'Closed Won',
-            Opportunity.close_date >= first_day_of_month,
-            Opportunity.close_date <= today
-        ).scalar() or 0.0
-
-        first_day_prev_month = (first_day_of_month - timedelta(days=1)).replace(day=1)
-        last_day_prev_month = first_day_of_month - timedelta(microseconds=1)
-        previous_month_revenue = db.session.query(
-            func.coalesce(func.sum(Opportunity.amount), 0.0)
-        ).filter(
-            Opportunity.user_id == current_user.id,
-            Opportunity.stage == 'Closed Won',
-            Opportunity.close_date >= first_day_prev_month,
-            Opportunity.close_date <= last_day_prev_month
-        ).scalar() or 0.0
-
-        opportunities_by_stage = db.session.query(
-            Opportunity.stage,
-            func.count(Opportunity.id).label('count'),
-            func.coalesce(func.sum(Opportunity.amount), 0.0).label('total_amount')
-        ).filter(
-            Opportunity.user_id == current_user.id
-        ).group_by(Opportunity.stage).all() or []
-
-        total_pipeline = db.session.query(
-            func.coalesce(func.sum(Opportunity.amount), 0.0)
-        ).filter(
-            Opportunity.user_id == current_user.id,
-            Opportunity.stage.in_(['Initial Contact', 'Qualification', 'Proposal', 'Negotiation'])
-        ).scalar() or 0.0
-
-        tasks = Task.query.filter_by(
-            user_id=current_user.id,
-            completed=False
-        ).filter(
-            Task.due_date >= datetime.utcnow()
-        ).order_by(Task.due_date)\
-        .paginate(page=tasks_page, per_page=per_page, error_out=False)
-        
-        schedules = Schedule.query.filter_by(user_id=current_user.id)\
-            .filter(Schedule.start_time >= datetime.utcnow())\
-            .order_by(Schedule.start_time)\
-            .paginate(page=schedules_page, per_page=per_page, error_out=False)
-        
-        emails = Email.query.filter_by(user_id=current_user.id)\
-            .order_by(Email.received_date.desc())\
-            .paginate(page=emails_page, per_page=20, error_out=False)
+        # ページ番号の組み合わせごとにユーザー単位でキャッシュする
+        cache_key = (leads_page, tasks_page, schedules_page, emails_page)
+        payload = dashboard_cache.get(current_user.id, cache_key)
+        if payload is None:
+            payload = _build_dashboard_payload(
+                current_user.id, leads_page, tasks_page, schedules_page, emails_page, per_page
+            )
+            dashboard_cache.set(
+                current_user.id, cache_key, payload,
+                current_app.config.get('DASHBOARD_CACHE_TTL', DEFAULT_DASHBOARD_CACHE_TTL)
+            )
 
-        return render_template('dashboard.html',
-                            leads=leads,
-                            opportunities=opportunities_by_stage,
-                            tasks=tasks,
-                            schedules=schedules,
-                            emails=emails,
-                            this_month_revenue=float(this_month_revenue),
-                            previous_month_revenue=float(previous_month_revenue),
-                            total_pipeline=float(total_pipeline))
+        return render_template('dashboard.html', **payload)
 
     except SQLAlchemyError as e:
         current_app.logger.error(f"Database error in dashboard: {str(e)}")
@@ -201,6 +294,7 @@ def analyze_email_endpoint(email_id):
 
         email.ai_analysis = analysis_result
         email.ai_analysis_date = datetime.now()
+        email.ai_analysis_status = 'completed'
 
         process_ai_response(analysis_result, email, current_app)
         
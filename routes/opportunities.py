@@ -8,6 +8,7 @@ from datetime import datetime
 from sqlalchemy import func
 from ai_analysis import analyze_opportunities
 from forms import OpportunityForm
+from keyset_pagination import keyset_paginate, DEFAULT_COUNT_CAP
 
 bp = Blueprint('opportunities', __name__)
 
@@ -109,8 +110,6 @@ def list_opportunities():
     if not sort_order or sort_order not in ['asc', 'desc']:
         sort_order = 'asc'
 
-    # Get page number from request
-    page = request.args.get('page', 1, type=int)
     per_page = 10  # Number of items per page
 
     # Base query
@@ -139,14 +138,16 @@ def list_opportunities():
     # Add eager loading of lead data after all filters
     query = query.options(db.joinedload(Opportunity.lead))
 
-    # Apply sorting with safe column access
+    # Apply sorting with safe column access and paginate by cursor
     sort_column = getattr(Opportunity, sort_by, Opportunity.close_date)
-    if sort_order == 'desc':
-        sort_column = sort_column.desc()
-    query = query.order_by(sort_column)
-
-    # Paginate the results
-    opportunities = query.paginate(page=page, per_page=per_page, error_out=False)
+    opportunities = keyset_paginate(
+        query, sort_column, Opportunity.id,
+        descending=(sort_order == 'desc'),
+        cursor=request.args.get('cursor'),
+        per_page=per_page,
+        with_count=request.args.get('count') == 'approx',
+        count_cap=current_app.config.get('LIST_COUNT_CAP', DEFAULT_COUNT_CAP)
+    )
 
     return render_template('opportunities/list_opportunities.html',
                          opportunities=opportunities,
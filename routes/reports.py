@@ -1,6 +1,8 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, request, jsonify, current_app
 from flask_login import login_required, current_user
 from datetime import datetime, timedelta
+import hashlib
+import json
 from sqlalchemy import func
 from models import Lead, Opportunity, Task, Schedule
 from extensions import db
@@ -17,6 +19,11 @@ from analytics import (
 
 bp = Blueprint('reports', __name__)
 
+# Constants
+MAX_CALENDAR_WINDOW = timedelta(days=366)
+MAX_SCHEDULE_SPAN = timedelta(days=31)  # 期間の開始より前に始まった予定を探す範囲
+CALENDAR_COLORS = {'schedules': '#007bff', 'tasks': '#28a745'}
+
 def prepare_calendar_events(items, title_field='title', start_field='start_time', end_field='end_time', color=None):
     """Helper function to prepare events for FullCalendar"""
     events = []
@@ -64,19 +71,7 @@ def index():
     task_status_labels = list(task_statuses.keys())
     task_status_data = list(task_statuses.values())
 
-    # Get schedule events for calendar
-    schedules = Schedule.query.filter_by(user_id=current_user.id).all()
-    schedule_events = prepare_calendar_events(schedules, color='#007bff')
-
-    # Get task events for calendar
-    tasks = Task.query.filter_by(user_id=current_user.id).all()
-    task_events = prepare_calendar_events(
-        tasks,
-        title_field='title',
-        start_field='due_date',
-        end_field='due_date',
-        color='#28a745'
-    )
+    # Calendar events are loaded per visible range from calendar_events()
 
     return render_template('reports/index.html',
                          this_month_revenue=this_month_revenue,
@@ -90,6 +85,65 @@ def index():
                          lead_score_labels=lead_score_labels,
                          lead_score_data=lead_score_data,
                          task_status_labels=task_status_labels,
-                         task_status_data=task_status_data,
-                         schedule_events=schedule_events,
-                         task_events=task_events)
+                         task_status_data=task_status_data)
+
+
+def _parse_calendar_bound(value):
+    """Parse a FullCalendar start/end parameter into a naive datetime"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    # 予定の日時はタイムゾーンなしで保存・表示しているため、オフセットは除いてそのまま比較する
+    return parsed.replace(tzinfo=None)
+
+@bp.route('/api/calendar/<kind>')
+@login_required
+def calendar_events(kind):
+    """
+    FullCalendar JSON feed of the schedules or tasks within [start, end)
+
+    Supports conditional requests: the ETag is a hash of the returned
+    events, so an unchanged range is answered with 304 Not Modified.
+    """
+    if kind not in CALENDAR_COLORS:
+        return jsonify({'error': 'Unknown calendar'}), 404
+
+    try:
+        start = _parse_calendar_bound(request.args.get('start'))
+        end = _parse_calendar_bound(request.args.get('end'))
+    except ValueError:
+        return jsonify({'error': 'Invalid start or end'}), 400
+    if not start or not end or end <= start:
+        return jsonify({'error': 'start and end are required'}), 400
+    if end - start > MAX_CALENDAR_WINDOW:
+        return jsonify({'error': 'Requested range is too long'}), 400
+
+    if kind == 'schedules':
+        # (user_id, start_time) のインデックスで範囲を絞り、期間にかかる予定を返す
+        schedules = Schedule.query.filter(
+            Schedule.user_id == current_user.id,
+            Schedule.start_time >= start - MAX_SCHEDULE_SPAN,
+            Schedule.start_time < end,
+            Schedule.end_time > start
+        ).order_by(Schedule.start_time, Schedule.id).all()
+        events = prepare_calendar_events(schedules, color=CALENDAR_COLORS[kind])
+    else:
+        tasks = Task.query.filter(
+            Task.user_id == current_user.id,
+            Task.due_date >= start,
+            Task.due_date < end
+        ).order_by(Task.due_date, Task.id).all()
+        events = prepare_calendar_events(
+            tasks,
+            title_field='title',
+            start_field='due_date',
+            end_field='due_date',
+            color=CALENDAR_COLORS[kind]
+        )
+
+    body = json.dumps(events, ensure_ascii=False, separators=(',', ':'))
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(hashlib.sha256(body.encode('utf-8')).hexdigest())
+    # ブラウザに保存させ、表示のたびに ETag で再検証させる
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
@@ -9,6 +9,7 @@ from google.oauth2 import service_account
 from googleapiclient.discovery import build
 import os
 from forms import ScheduleForm
+from keyset_pagination import keyset_paginate, DEFAULT_COUNT_CAP
 
 bp = Blueprint('schedules', __name__)
 
@@ -27,8 +28,7 @@ def list_schedules():
         'sort_order': request.args.get('sort_order', 'desc')
     }
     
-    page = request.args.get('page', 1, type=int)
-    
+
     # Base query
     query = Schedule.query.filter_by(user_id=current_user.id)
 
@@ -73,20 +73,14 @@ def list_schedules():
             Lead.name.ilike(f'%{filters["lead_search"]}%')
         )
 
-    # Apply sorting
-    if filters['sort_order'] == 'desc':
-        query = query.order_by(Schedule.start_time.desc())
-    else:
-        query = query.order_by(Schedule.start_time.asc())
-
-    # Get total count before pagination
-    total_count = query.count()
-
-    # Apply pagination
-    paginated_schedules = query.options(db.joinedload(Schedule.lead)).paginate(
-        page=page,
+    # Apply sorting and keyset pagination; the total is only estimated on request
+    paginated_schedules = keyset_paginate(
+        query.options(db.joinedload(Schedule.lead)), Schedule.start_time, Schedule.id,
+        descending=(filters['sort_order'] == 'desc'),
+        cursor=request.args.get('cursor'),
         per_page=filters['page_size'],
-        error_out=False
+        with_count=request.args.get('count') == 'approx',
+        count_cap=current_app.config.get('LIST_COUNT_CAP', DEFAULT_COUNT_CAP)
     )
 
     # Calculate schedule status counts
@@ -100,7 +94,6 @@ def list_schedules():
                          schedules=paginated_schedules.items,
                          pagination=paginated_schedules,
                          filters=filters,
-                         total_count=total_count,
                          schedule_status_counts=schedule_status_counts,
                          now=datetime.utcnow,
                          timedelta=timedelta)
@@ -1,11 +1,16 @@
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, jsonify, request, current_app, Response
 from flask_login import login_required, current_user
 from models.system_changes import SystemChange, RollbackHistory
 from services.ai_rollback import AIRollbackService
 from models.user_settings import UserSettings
+from anthropic_client import get_client_stats
+from mass_mail_classifier import mass_mail_classifier
+from ingestion_metrics import ingestion_metrics
+from message_id_cache import known_message_ids
 from extensions import db
 from datetime import datetime
 from typing import Dict, Any, Optional
+import hmac
 import json
 
 bp = Blueprint('system_management', __name__)
@@ -113,6 +118,44 @@ def list_rollback_history():
         'ai_recommendation': entry.ai_recommendation
     } for entry in history])
 
+def _has_metrics_token() -> bool:
+    """METRICS_TOKEN によるBearer認証の確認（未設定の場合は常に拒否）"""
+    token = current_app.config.get('METRICS_TOKEN')
+    authorization = request.headers.get('Authorization', '')
+    return bool(token) and hmac.compare_digest(authorization, f'Bearer {token}')
+
+@bp.route('/api/ai-clients/stats', methods=['GET'])
+def ai_client_stats():
+    """Anthropicクライアントプールの利用状況を取得（全テナント共通のためMETRICS_TOKENのBearer認証のみ）"""
+    if not _has_metrics_token():
+        return jsonify({'error': 'Unauthorized'}), 401
+    return jsonify(get_client_stats())
+
+@bp.route('/api/mass-mail-classifier/stats', methods=['GET'])
+@login_required
+def mass_mail_classifier_stats():
+    """一斉配信メール判定ルールごとのヒット数を取得"""
+    return jsonify(mass_mail_classifier.get_rule_hits())
+
+@bp.route('/api/ingestion-metrics', methods=['GET'])
+@login_required
+def ingestion_metrics_json():
+    """ログイン中のユーザーのメール取り込みのステージ別処理時間とメッセージ件数を取得"""
+    metrics = ingestion_metrics.snapshot(user_id=current_user.id)
+    metrics['message_id_cache'] = known_message_ids.get_stats()
+    return jsonify(metrics)
+
+@bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus形式のメール取り込みメトリクス（全ユーザー分を含むため、METRICS_TOKENのBearer認証のみ）"""
+    if not _has_metrics_token():
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+
+    return Response(
+        ingestion_metrics.render_prometheus(),
+        mimetype='text/plain; version=0.0.4; charset=utf-8'
+    )
+
 @bp.route('/api/system-changes/track', methods=['POST'])
 @login_required
 def track_system_change():
@@ -7,6 +7,7 @@ from datetime import datetime, timedelta
 from sqlalchemy import func
 from ai_analysis import analyze_tasks
 from forms import TaskForm
+from keyset_pagination import keyset_paginate, DEFAULT_COUNT_CAP
 
 tasks_bp = Blueprint('tasks', __name__)
 
@@ -100,15 +101,20 @@ def list_tasks():
     if date_to:
         query = query.filter(Task.due_date <= datetime.strptime(date_to, '%Y-%m-%d'))
 
-    # Get page number from request
-    page = request.args.get('page', 1, type=int)
     per_page = 10  # Number of items per page
 
-    # Order by due date descending and eager load lead relationship
-    query = query.options(db.joinedload(Task.lead)).order_by(Task.due_date.desc())  # ここを変更
-
-    # Paginate the results
-    paginated_tasks = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Eager load lead relationship
+    query = query.options(db.joinedload(Task.lead))
+
+    # Paginate by due date descending with a cursor instead of OFFSET
+    paginated_tasks = keyset_paginate(
+        query, Task.due_date, Task.id,
+        descending=True,
+        cursor=request.args.get('cursor'),
+        per_page=per_page,
+        with_count=request.args.get('count') == 'approx',
+        count_cap=current_app.config.get('LIST_COUNT_CAP', DEFAULT_COUNT_CAP)
+    )
 
     # Get task status counts
     status_counts = db.session.query(
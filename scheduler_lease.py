@@ -0,0 +1,300 @@
+"""
+Leader election for the background ingestion jobs.
+
+Every web worker may set up the email scheduler, but only the process
+holding the 'email_ingestion' lease polls mailboxes, runs the IDLE watchers
+and drains the AI analysis queue. The lease is a row in scheduler_leases
+renewed by its holder with a conditional UPDATE, so it works on SQLite and
+PostgreSQL alike; another process takes over once the row has not been
+renewed for SCHEDULER_LEASE_TTL seconds. On PostgreSQL a session-level
+advisory lock can be used instead, which the server releases as soon as the
+holder's connection dies.
+"""
+import atexit
+import hashlib
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from threading import Thread, Event, Lock
+
+from sqlalchemy import update, or_, case, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import SchedulerLease
+from extensions import db
+
+# Constants
+LEASE_NAME = 'email_ingestion'
+DEFAULT_LEASE_TTL = 60  # seconds
+
+_elector = None
+_elector_lock = Lock()
+
+
+def _holder_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _advisory_lock_key(name):
+    """Map a lease name to a signed 64-bit advisory lock key"""
+    return int.from_bytes(hashlib.sha256(name.encode('utf-8')).digest()[:8], 'big', signed=True)
+
+
+class TableLease:
+    """Lease row renewed by its holder; taken over after it expires"""
+
+    def __init__(self, name, holder, ttl):
+        self.name = name
+        self.holder = holder
+        self.ttl = ttl
+
+    def acquire(self):
+        """
+        Acquire or renew the lease
+
+        Returns:
+            bool: True if this process holds the lease until now + ttl
+        """
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl)
+        with Session(db.engine) as session:
+            # 自分が保持中、または期限切れのリースのみ更新できる
+            result = session.execute(
+                update(SchedulerLease)
+                .where(
+                    SchedulerLease.name == self.name,
+                    or_(SchedulerLease.holder == self.holder, SchedulerLease.expires_at < now)
+                )
+                .values(
+                    acquired_at=case(
+                        (SchedulerLease.holder == self.holder, SchedulerLease.acquired_at),
+                        else_=now
+                    ),
+                    holder=self.holder,
+                    renewed_at=now,
+                    expires_at=expires_at
+                )
+            )
+            if result.rowcount:
+                session.commit()
+                return True
+
+            if session.get(SchedulerLease, self.name) is not None:
+                session.rollback()
+                return False
+
+            session.add(SchedulerLease(
+                name=self.name,
+                holder=self.holder,
+                acquired_at=now,
+                renewed_at=now,
+                expires_at=expires_at
+            ))
+            try:
+                session.commit()
+                return True
+            except IntegrityError:
+                # 他のプロセスが同時に作成した
+                session.rollback()
+                return False
+
+    def release(self):
+        """Expire the lease now so another process can take over immediately"""
+        with Session(db.engine) as session:
+            session.execute(
+                update(SchedulerLease)
+                .where(SchedulerLease.name == self.name, SchedulerLease.holder == self.holder)
+                .values(expires_at=datetime.utcnow())
+            )
+            session.commit()
+
+
+class AdvisoryLockLease:
+    """PostgreSQL session-level advisory lock held on a dedicated connection"""
+
+    def __init__(self, name):
+        self.name = name
+        self.key = _advisory_lock_key(name)
+        self._connection = None
+
+    def _close(self, invalidate=False):
+        """
+        Return the connection to the pool, or discard it with invalidate=True
+
+        A pooled connection keeps the session-level lock, so a connection that
+        may still hold it must be invalidated; closing the DBAPI connection
+        ends the server session and releases the lock.
+        """
+        try:
+            if invalidate:
+                self._connection.invalidate()
+            self._connection.close()
+        except Exception:
+            pass
+        self._connection = None
+
+    def acquire(self):
+        """
+        Acquire the lock, or verify that the holding connection is still alive
+
+        Returns:
+            bool: True if this process holds the lock
+        """
+        if self._connection is not None:
+            try:
+                self._connection.execute(text('SELECT 1'))
+                self._connection.commit()
+                return True
+            except Exception:
+                # 一時的なエラーでも接続がロックを保持したままプールに戻らないよう破棄する
+                self._close(invalidate=True)
+                return False
+
+        connection = db.engine.connect()
+        try:
+            acquired = connection.execute(
+                text('SELECT pg_try_advisory_lock(:key)'), {'key': self.key}
+            ).scalar()
+            # セッションレベルのロックはトランザクション終了後も保持される
+            connection.commit()
+        except Exception:
+            # ロックを取得済みの可能性があるため、プールには戻さない
+            connection.invalidate()
+            connection.close()
+            raise
+
+        if acquired:
+            self._connection = connection
+            return True
+        connection.close()
+        return False
+
+    def release(self):
+        if self._connection is None:
+            return
+        unlocked = False
+        try:
+            unlocked = self._connection.execute(
+                text('SELECT pg_advisory_unlock(:key)'), {'key': self.key}
+            ).scalar()
+            self._connection.commit()
+        finally:
+            # 解除できなかった場合は接続を破棄してサーバー側でロックを解放させる
+            self._close(invalidate=not unlocked)
+
+
+class LeaderElector:
+    """
+    Background thread that keeps trying to hold the lease
+
+    on_elected runs when this process becomes the leader and on_demoted when
+    it loses the lease (renewal failure, database error or shutdown).
+    """
+
+    def __init__(self, app, name=LEASE_NAME, on_elected=None, on_demoted=None):
+        self.app = app
+        self.name = name
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.holder = _holder_id()
+        self.ttl = int(app.config.get('SCHEDULER_LEASE_TTL', DEFAULT_LEASE_TTL))
+        self.renew_interval = max(1, self.ttl // 3)
+        self.backend = self._build_backend()
+        self._leader = Event()
+        self._stop_event = Event()
+        self._thread = Thread(target=self._run, name="SchedulerLeader", daemon=True)
+
+    def _build_backend(self):
+        backend = self.app.config.get('SCHEDULER_LEASE_BACKEND', 'auto')
+        with self.app.app_context():
+            dialect_name = db.engine.dialect.name
+        if backend == 'advisory' or (backend == 'auto' and dialect_name == 'postgresql'):
+            return AdvisoryLockLease(self.name)
+        return TableLease(self.name, self.holder, self.ttl)
+
+    def is_leader(self):
+        return self._leader.is_set()
+
+    def start(self):
+        self._thread.start()
+        self.app.logger.info(
+            f"Leader election started for '{self.name}' as {self.holder} "
+            f"({type(self.backend).__name__})"
+        )
+
+    def stop(self):
+        """Stop campaigning and hand the lease over"""
+        self._stop_event.set()
+        if self._leader.is_set():
+            self._demote("shutting down")
+            try:
+                with self.app.app_context():
+                    self.backend.release()
+            except Exception as e:
+                self.app.logger.warning(f"Failed to release lease '{self.name}': {str(e)}")
+
+    def _demote(self, reason):
+        self._leader.clear()
+        self.app.logger.warning(f"Lost scheduler lease '{self.name}': {reason}")
+        if self.on_demoted:
+            try:
+                self.on_demoted()
+            except Exception as e:
+                self.app.logger.error(f"Error while stepping down: {str(e)}", exc_info=True)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                with self.app.app_context():
+                    acquired = self.backend.acquire()
+                error = None
+            except Exception as e:
+                acquired = False
+                error = str(e)
+                self.app.logger.error(f"Lease renewal for '{self.name}' failed: {error}")
+
+            if acquired and not self._leader.is_set():
+                self._leader.set()
+                self.app.logger.info(f"Acquired scheduler lease '{self.name}' as {self.holder}")
+                if self.on_elected:
+                    try:
+                        self.on_elected()
+                    except Exception as e:
+                        self.app.logger.error(f"Error while taking leadership: {str(e)}", exc_info=True)
+            elif not acquired and self._leader.is_set():
+                self._demote(error or "lease held by another process")
+
+            self._stop_event.wait(self.renew_interval)
+
+
+def start_leader_election(app, on_elected=None, on_demoted=None):
+    """
+    Start the process-wide leader elector for the ingestion jobs
+
+    With SCHEDULER_LEADER_ELECTION disabled the process is always the leader
+    and on_elected runs immediately.
+
+    Returns:
+        LeaderElector or None
+    """
+    global _elector
+    with _elector_lock:
+        if _elector is not None:
+            return _elector
+
+        if not app.config.get('SCHEDULER_LEADER_ELECTION', True):
+            if on_elected:
+                on_elected()
+            return None
+
+        _elector = LeaderElector(app, on_elected=on_elected, on_demoted=on_demoted)
+        _elector.start()
+        atexit.register(_elector.stop)
+        return _elector
+
+
+def is_ingestion_leader():
+    """Return True if this process should run the ingestion jobs"""
+    return _elector is None or _elector.is_leader()
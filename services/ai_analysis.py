@@ -1,4 +1,4 @@
-from anthropic import Anthropic
+from anthropic_client import get_anthropic_client
 from models import Lead, Email, SystemChange, BehaviorPattern
 from datetime import datetime
 import json
@@ -13,7 +13,7 @@ class AIAnalysisService:
         self.user_settings = user_settings
         if user_settings and user_settings.claude_api_key:
             try:
-                self.anthropic = Anthropic(api_key=user_settings.claude_api_key)
+                self.anthropic = get_anthropic_client(user_settings.claude_api_key)
                 self.logger.info("AIAnalysisService initialized successfully with Claude API")
             except Exception as e:
                 self.anthropic = None
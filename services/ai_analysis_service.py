@@ -1,4 +1,4 @@
-from anthropic import Anthropic
+from anthropic_client import get_anthropic_client
 from models import Lead, Email, SystemChange
 from datetime import datetime
 import json
@@ -8,7 +8,7 @@ from typing import Dict, Any, List, Optional
 
 class AIAnalysisService:
     def __init__(self, user_settings=None):
-        self.anthropic = Anthropic(api_key=user_settings.claude_api_key if user_settings else None)
+        self.anthropic = get_anthropic_client(user_settings.claude_api_key if user_settings else None)
         self.logger = logging.getLogger(__name__)
 
     def analyze_lead_behavior(self, lead_id: int) -> Dict[str, Any]:
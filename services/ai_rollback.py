@@ -3,7 +3,8 @@ import json
 import logging
 from typing import Optional, Dict, Any, Union
 from datetime import datetime
-from anthropic import Anthropic, HUMAN_PROMPT, AI_PROMPT
+from anthropic import HUMAN_PROMPT, AI_PROMPT
+from anthropic_client import get_anthropic_client
 from models.system_changes import SystemChange, RollbackHistory
 from extensions import db
 from flask import current_app
@@ -14,7 +15,7 @@ from sqlalchemy.orm import Session
 class AIRollbackService:
     def __init__(self, user_settings=None):
         """Initialize AIRollbackService with user settings"""
-        self.anthropic = Anthropic(api_key=user_settings.claude_api_key if user_settings else os.environ.get('CLAUDE_API_KEY'))
+        self.anthropic = get_anthropic_client(user_settings.claude_api_key if user_settings else os.environ.get('CLAUDE_API_KEY'))
 
     def analyze_system_change(self, change: SystemChange) -> Union[Dict[str, Any], str]:
         """AIを使用してシステム変更を分析し、リスク評価とロールバック推奨事項を提供"""
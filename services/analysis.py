@@ -1,13 +1,13 @@
 from models import Lead, Email, UserSettings
 from datetime import datetime, timedelta
 import json
-import anthropic
+from anthropic_client import get_anthropic_client
 import os
 
 class ComprehensiveAnalysisService:
     def __init__(self, user_settings):
         self.user_settings = user_settings
-        self.claude = anthropic.Anthropic(api_key=os.environ.get('CLAUDE_API_KEY'))
+        self.claude = get_anthropic_client(os.environ.get('CLAUDE_API_KEY'))
 
     def analyze_lead_data(self, lead_id, custom_params=None):
         """リードデータの総合的な分析を行う"""
@@ -4,7 +4,8 @@ from collections import Counter
 from models import Task, Opportunity, Schedule, Email
 from models import UserSettings
 from flask_login import current_user
-from anthropic import Anthropic, APIError, APIConnectionError, AuthenticationError
+from anthropic import APIError, APIConnectionError, AuthenticationError
+from anthropic_client import get_anthropic_client
 from flask import current_app
 
 class ComprehensiveAnalysisService:
@@ -45,8 +46,7 @@ class ComprehensiveAnalysisService:
 
         # カスタムプロンプトを使用した分析を追加
         try:
-            from anthropic import Anthropic
-            client = Anthropic(api_key=self.user_settings.claude_api_key)
+            client = get_anthropic_client(self.user_settings.claude_api_key)
 
             # データを文字列に変換
             data_str = f"""
@@ -272,7 +272,7 @@ def analyze_custom_prompt(custom_prompt):
             return '<p class="error-message">AI分析を実行するにはAPIキーの設定が必要です。</p>'
 
         # Anthropicクライアントの初期化
-        client = Anthropic(api_key=user_settings.claude_api_key)
+        client = get_anthropic_client(user_settings.claude_api_key)
 
         # ユーザーのカスタムプロンプトをそのまま使用
         prompt = custom_prompt
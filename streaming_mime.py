@@ -0,0 +1,92 @@
+"""
+Streaming MIME parsing for email ingestion.
+
+Raw messages are fed to email.parser.BytesFeedParser in chunks with a
+message factory that discards the payload of non-text leaf parts as soon as
+the parser completes them, keeping only their metadata (filename, content
+type, size), and truncates oversized text parts. Attachments are therefore
+never retained on the message tree nor base64-decoded.
+"""
+from email.message import Message
+from email.parser import BytesFeedParser
+from email._policybase import compat32
+from functools import partial
+
+# Constants
+DEFAULT_FEED_CHUNK_SIZE = 64 * 1024
+DEFAULT_MAX_TEXT_PART_BYTES = 1024 * 1024
+# ペイロードを保持するMIMEタイプ（multipart/messageはパーサーが子パートとして扱う）
+KEPT_MAINTYPES = {'text', 'multipart', 'message'}
+
+
+class StreamingMessage(Message):
+    """Message whose non-text payloads are dropped when the parser sets them"""
+
+    def __init__(self, policy=compat32, max_text_bytes=DEFAULT_MAX_TEXT_PART_BYTES):
+        super().__init__(policy)
+        self.max_text_bytes = max_text_bytes
+        self.skipped_size = None
+        self.truncated = False
+
+    def set_payload(self, payload, charset=None):
+        if isinstance(payload, str):
+            if self.get_content_maintype() not in KEPT_MAINTYPES:
+                # 添付ファイルの本体は保持せず、サイズ（改行を除く）のみ記録する
+                self.skipped_size = len(payload) - payload.count('\n') - payload.count('\r')
+                payload = ''
+            elif self.max_text_bytes and len(payload) > self.max_text_bytes:
+                # 転送エンコーディングを壊さないよう行単位で切り詰める
+                cut = payload.rfind('\n', 0, self.max_text_bytes)
+                payload = payload[:cut + 1 if cut > 0 else self.max_text_bytes]
+                self.truncated = True
+        super().set_payload(payload, charset)
+
+
+def _decoded_size(part):
+    """Estimate the decoded size of a skipped part from its encoded length"""
+    encoded_size = part.skipped_size or 0
+    if part.get('Content-Transfer-Encoding', '').strip().lower() == 'base64':
+        return encoded_size * 3 // 4
+    return encoded_size
+
+
+def get_skipped_attachments(msg):
+    """
+    Return metadata of the parts whose payload was dropped while parsing
+
+    Returns:
+        list: Dicts with 'filename', 'content_type' and 'size'
+    """
+    attachments = []
+    for part in msg.walk():
+        if getattr(part, 'skipped_size', None) is None:
+            continue
+        attachments.append({
+            'filename': part.get_filename(),
+            'content_type': part.get_content_type(),
+            'size': _decoded_size(part)
+        })
+    return attachments
+
+
+def parse_message_streaming(raw, max_text_bytes=DEFAULT_MAX_TEXT_PART_BYTES,
+                            chunk_size=DEFAULT_FEED_CHUNK_SIZE):
+    """
+    Parse a raw RFC822 message without retaining attachment payloads
+
+    Args:
+        raw: Raw message bytes
+        max_text_bytes: Maximum encoded size kept per text part (0 = unlimited)
+        chunk_size: Number of bytes fed to the parser at a time
+
+    Returns:
+        StreamingMessage: Parsed message; metadata of dropped parts is
+        available as msg.skipped_attachments
+    """
+    parser = BytesFeedParser(_factory=partial(StreamingMessage, max_text_bytes=max_text_bytes))
+    view = memoryview(raw)
+    for offset in range(0, len(view), chunk_size):
+        parser.feed(bytes(view[offset:offset + chunk_size]))
+    msg = parser.close()
+    msg.skipped_attachments = get_skipped_attachments(msg)
+    return msg
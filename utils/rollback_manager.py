@@ -2,7 +2,7 @@ from datetime import datetime
 from typing import Optional, Dict, Any
 from flask import current_app
 from models import SystemChange, RollbackHistory, db
-from anthropic import Anthropic
+from anthropic_client import get_anthropic_client
 from models import UserSettings
 import json
 import logging
@@ -22,7 +22,7 @@ class RollbackManager:
             if not self.user_settings.claude_api_key:
                 return "AI分析を実行するにはClaude APIキーが必要です。"
 
-            client = Anthropic(api_key=self.user_settings.claude_api_key)
+            client = get_anthropic_client(self.user_settings.claude_api_key)
             
             prompt = f"""
             以下のシステム変更に対するロールバックの推奨事項を分析してください: